@@ -0,0 +1,240 @@
+# Offline analytics: every match exported as Parquet, partitioned by league and season,
+# and the /team_trend, /head_to_head and /ranking computations run on those files with
+# pandas instead of Cypher (ANALYTICS_PARQUET). Analysts can then run report loops
+# against a local API, or import OfflineAnalytics directly, without touching Neo4j.
+#
+#   <dir>/league=1729/season=2008%2F2009/part-0.parquet   one row group per exported page
+#   <dir>/_export.json                                     version and rows per partition
+#
+# Each season is streamed out of the database in keyset-paginated pages, so no more than
+# one page is held in memory. The export is written next to the target directory and
+# swapped in when complete; readers reload when _export.json changes.
+#
+#   python analytics.py export analytics/ [--page-size 5000]
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import ratings
+from ranking import SeasonGraph, pagerank
+
+MANIFEST = "_export.json"
+PAGE_SIZE = 5000
+
+SCHEMA = pa.schema([
+    ("match_id", pa.int64()),
+    ("source_id", pa.int64()),
+    ("source_short_name", pa.string()),
+    ("source_long_name", pa.string()),
+    ("target_id", pa.int64()),
+    ("target_short_name", pa.string()),
+    ("target_long_name", pa.string()),
+    ("winner", pa.string()),
+    ("loser", pa.string()),
+    ("winner_goals", pa.int64()),
+    ("loser_goals", pa.int64()),
+    ("weight", pa.int64()),
+])
+
+# Hive-style directory names; season values contain "/" and are URI-encoded
+PARTITIONING = ds.partitioning(pa.schema([("league", pa.int64()), ("season", pa.string())]), flavor="hive")
+
+
+def partition_path(directory, league_id, season):
+    return os.path.join(directory, f"league={league_id}", f"season={urllib.parse.quote(season, safe='')}")
+
+
+# Writes one season's matches page by page. A full page is cut before its last match id,
+# which the next page starts with, so edges sharing a match id stay together.
+def export_season(conn, path, league_id, season, page_size=PAGE_SIZE):
+    os.makedirs(path, exist_ok=True)
+    after, rows = -1, 0
+    with pq.ParquetWriter(os.path.join(path, "part-0.parquet"), SCHEMA) as writer:
+        while True:
+            page = conn.run("season_edges_page", {"leagueID": league_id, "season": season,
+                                                  "after": after, "limit": page_size})
+            full = len(page) == page_size
+            if full and page[0]["match_id"] != page[-1]["match_id"]:
+                page = [row for row in page if row["match_id"] != page[-1]["match_id"]]
+            if page:
+                writer.write_table(pa.Table.from_pylist(page, schema=SCHEMA))
+                rows += len(page)
+                after = page[-1]["match_id"]
+            if not full:
+                return rows
+
+
+def export(conn, directory, page_size=PAGE_SIZE):
+    directory = directory.rstrip(os.sep)
+    partial, previous = f"{directory}.partial", f"{directory}.previous"
+    shutil.rmtree(partial, ignore_errors=True)
+
+    partitions = []
+    for row in conn.run("league_seasons"):
+        league_id, season = row["leagueID"], row["season"]
+        rows = export_season(conn, partition_path(partial, league_id, season), league_id, season, page_size)
+        partitions.append({"leagueID": league_id, "season": season, "rows": rows})
+
+    manifest = {"version": time.time_ns(), "rows": sum(p["rows"] for p in partitions), "partitions": partitions}
+    with open(os.path.join(partial, MANIFEST), "w") as f:
+        json.dump(manifest, f)
+
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(directory):
+        os.rename(directory, previous)
+    os.rename(partial, directory)
+    shutil.rmtree(previous, ignore_errors=True)
+    return manifest
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# Read side. A league's matches are read once (partition pruning skips the other
+# leagues' files) and kept as a DataFrame until the export changes.
+class OfflineAnalytics:
+    def __init__(self, directory):
+        self.directory = directory
+        self.version = None
+        self._frames = {}
+        self._manifest_mtime = None
+        self._lock = threading.Lock()
+
+    def available(self):
+        self._reload_if_changed()
+        return self.version is not None
+
+    def league(self, league_id):
+        self._reload_if_changed()
+        with self._lock:
+            version = self.version
+            frame = self._frames.get(int(league_id))
+        if frame is None:
+            dataset = ds.dataset(self.directory, format="parquet", partitioning=PARTITIONING)
+            table = dataset.to_table(filter=ds.field("league") == int(league_id))
+            frame = table.to_pandas()
+            for column in ("winner_goals", "loser_goals", "weight"):
+                frame[column] = frame[column].fillna(0).astype(np.int64)
+            with self._lock:
+                if self.version == version:
+                    self._frames[int(league_id)] = frame
+        return frame
+
+    def season(self, league_id, season):
+        frame = self.league(league_id)
+        return frame[frame["season"] == season]
+
+    # Same totals as the team_trend statement: the team's short name against the
+    # match's winner and loser, grouped by season
+    def team_trend(self, league_id, team_id):
+        frame = self.league(league_id)
+        is_source = frame["source_id"] == team_id
+        frame = frame[is_source | (frame["target_id"] == team_id)]
+        if frame.empty:
+            return []
+        short_name = np.where(is_source[frame.index], frame["source_short_name"], frame["target_short_name"])
+        won = frame["winner"].to_numpy() == short_name
+        lost = frame["loser"].to_numpy() == short_name
+        winner_goals, loser_goals = frame["winner_goals"].to_numpy(), frame["loser_goals"].to_numpy()
+        totals = pd.DataFrame({
+            "season": frame["season"].to_numpy(),
+            "wins": won.astype(np.int64),
+            "losses": lost.astype(np.int64),
+            "goals_for": np.where(won, winner_goals, np.where(lost, loser_goals, 0)),
+            "goals_against": np.where(won, loser_goals, np.where(lost, winner_goals, 0)),
+        }).groupby("season", sort=True).sum()
+        return [
+            {"season": season, "wins": int(row.wins), "losses": int(row.losses),
+             "goals_for": int(row.goals_for), "goals_against": int(row.goals_against)}
+            for season, row in totals.iterrows()
+        ]
+
+    # Same counts as HeadToHeadMatrix.pair ({} when the teams never met)
+    def head_to_head(self, league_id, team1_id, team2_id):
+        frame = self.league(league_id)
+        source, target = frame["source_id"], frame["target_id"]
+        frame = frame[((source == team1_id) & (target == team2_id)) | ((source == team2_id) & (target == team1_id))]
+        if frame.empty:
+            return {}
+        winner = frame["winner"].to_numpy()
+        source_won = winner == frame["source_short_name"].to_numpy()
+        target_won = (winner == frame["target_short_name"].to_numpy()) & ~source_won
+        team1_is_source = frame["source_id"].to_numpy() == team1_id
+        first = frame.iloc[0]
+        names = {first["source_id"]: first["source_short_name"], first["target_id"]: first["target_short_name"]}
+        return {
+            "team1": names[team1_id],
+            "team2": names[team2_id],
+            "team1_wins": int(np.sum(np.where(team1_is_source, source_won, target_won))),
+            "team2_wins": int(np.sum(np.where(team1_is_source, target_won, source_won))),
+            "ties": int(np.sum(winner == "tie")),
+        }
+
+    # PageRank over the season's beat edges, mirroring the GDS projection like
+    # SeasonGraph.from_records, or one of the ratings.py models
+    def rank(self, league_id, season, method="pagerank", weighted=False):
+        frame = self.season(league_id, season)
+        if method == "pagerank":
+            sources, team_ids = pd.factorize(frame["source_id"])
+            names = frame.drop_duplicates("source_id")["source_long_name"].tolist()
+            targets = pd.Index(team_ids).get_indexer(frame["target_id"])
+            kept = targets >= 0
+            graph = SeasonGraph(team_ids, names, sources[kept], targets[kept], frame["weight"].to_numpy()[kept])
+            scores, _ = pagerank(graph, weighted=weighted)
+        else:
+            matches = ratings.SeasonMatches.from_columns(
+                frame["source_id"], frame["source_long_name"], frame["target_id"], frame["target_long_name"],
+                frame["winner_goals"], frame["loser_goals"])
+            scores, names = ratings.RATINGS[method](matches), matches.team_names
+        order = np.argsort(-scores, kind="stable")
+        return [{"Team": names[i], "score": float(scores[i])} for i in order]
+
+    def stats(self):
+        with self._lock:
+            return {"directory": self.directory, "version": self.version, "leagues_loaded": len(self._frames)}
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.stat(os.path.join(self.directory, MANIFEST)).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._manifest_mtime:
+            return
+        manifest = read_manifest(self.directory) if mtime else None
+        with self._lock:
+            self._manifest_mtime = mtime
+            self.version = manifest["version"] if manifest else None
+            self._frames = {}
+
+
+if __name__ == "__main__":
+    from db import connect
+
+    parser = argparse.ArgumentParser(description="Export every match as partitioned Parquet")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("directory")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        manifest = export(conn, args.directory, args.page_size)
+        print(json.dumps({"version": manifest["version"], "rows": manifest["rows"],
+                          "partitions": len(manifest["partitions"])}, indent=2))
+    finally:
+        conn.close()
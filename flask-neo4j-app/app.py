@@ -1,243 +1,431 @@
-from flask import Flask, request, jsonify
-from neo4j import GraphDatabase
+import atexit
+import time
+
+from flask import Flask, Response, g, request, jsonify, send_file
 from flask_cors import CORS
 
+import config
+import metrics
+import mutations
+from analytics import OfflineAnalytics
+from cache import ResponseCache, ScopeVersions, create_backend
+from db import connect
+from headtohead import MatrixCache
+from ingest import format_for, ingest, text_stream
+from projections import ProjectionManager
+from queries import QueryParameterError, statement_stats
+from ranking import create_engine, ranked
+from ranking_batch import BatchRunner
+from ratings import RatingEngine
+import reference
+import routes
+from routes import RequestError, global_of, league_of, season_of
+from schema import check_schema
+from singleflight import SingleFlight
+import streaming
+from views import ViewBuilder
+from warmup import HotSeasons, WarmUp
+from write_queue import WriteQueue
+
 # Initialize the Flask app
 app = Flask(__name__)
 CORS(app)
 
-# Connect to Neo4j
-class Neo4jConnection:
-    def __init__(self, uri, user, password):
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
-
-    def close(self):
-        self.driver.close()
-
-    def query(self, query, parameters=None):
-        with self.driver.session() as session:
-            return session.run(query, parameters).data()
-
-# Replace these with your Neo4j credentials
-# neo4j_conn = Neo4jConnection(
-#     uri="bolt://localhost:7687",
-#     user="neo4j",
-#     password=""
-# )
-
-# Neo4j Aura
-neo4j_conn = Neo4jConnection(
-    uri="neo4j+s://2f4d6707.databases.neo4j.io",
-    user="neo4j",
-    password="ozkwISVE3JulnPCIvq23n0H1Bu5KEMgXQIpLXxONq3g"
+# Time every request, labelled by its route pattern rather than the raw URL
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    start = g.get("request_start")
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method,
+                                        route=route, status=response.status_code)
+    return response
+
+# Invalid query parameters or body (routes.py)
+@app.errorhandler(RequestError)
+def bad_request(e):
+    return jsonify({"error": str(e)}), 400
+
+# Connect to Neo4j (credentials in config.py), or the in-memory stand-in with DB_BACKEND=memory
+neo4j_conn = connect()
+
+# Make sure the indexes the endpoint queries rely on exist (schema.py, per DATA_MODEL)
+if config.DB_BACKEND == "neo4j":
+    check_schema(neo4j_conn, config.SCHEMA_CHECK)
+
+# Entries and league/season version counters of the response cache (per worker with
+# "memory", shared with "redis")
+cache_backend = create_backend(
+    config.CACHE_BACKEND,
+    max_entries=config.CACHE_MAX_ENTRIES,
+    ttl=config.CACHE_TTL_SECONDS,
+    redis_url=config.CACHE_REDIS_URL
+)
+
+# Projections, rankings, ratings and matrices cached in the worker follow the same
+# versions, so a write handled by another worker reaches them too (at the latest after
+# the TTL)
+scope_versions = ScopeVersions(cache_backend, ttl=config.CACHE_TTL_SECONDS)
+
+# GDS projections created by this worker, bounded and dropped again on exit
+projection_manager = ProjectionManager(
+    neo4j_conn,
+    max_projections=config.MAX_PROJECTIONS,
+    max_memory_bytes=config.MAX_PROJECTION_MEMORY_MB * 1024 * 1024 or None,
+    versions=scope_versions
+)
+atexit.register(projection_manager.drop_all)
+
+# PageRank backend selected by RANKING_BACKEND ("gds" or "local")
+ranking_engine = create_engine(
+    config.RANKING_BACKEND,
+    neo4j_conn,
+    projection_manager,
+    weighted=config.RANKING_WEIGHTED,
+    rebuild_on_write=config.PROJECTION_REBUILD_ON_WRITE,
+    precomputed=config.RANKING_PRECOMPUTED,
+    incremental=config.RANKING_INCREMENTAL,
+    warm_start_iterations=config.RANKING_WARM_START_ITERATIONS,
+    versions=scope_versions
+)
+
+# Elo/Massey/Colley ratings for /ranking?method=, computed in-process from the season's matches
+rating_engine = RatingEngine(neo4j_conn, versions=scope_versions)
+
+# Background batch ranking of every league/season (POST /ranking/batch)
+batch_runner = BatchRunner(neo4j_conn, config.RANKING_BACKEND, weighted=config.RANKING_WEIGHTED,
+                           workers=config.RANKING_BATCH_WORKERS)
+
+# Read endpoint responses, invalidated through per-league/season version counters
+response_cache = ResponseCache(cache_backend, enabled=config.CACHE_ENABLED)
+
+# Head-to-head matrices per league/season, built from one query per league
+matrix_cache = MatrixCache(versions=scope_versions)
+
+# Memory-mapped reference-data snapshot for /leagues, /seasons and /teams
+# (REFERENCE_SNAPSHOT), re-exported in the background after match writes
+reference_snapshot = reference.ReferenceSnapshot(config.REFERENCE_SNAPSHOT) if config.REFERENCE_SNAPSHOT else None
+snapshot_rebuilder = reference.SnapshotRebuilder(neo4j_conn, config.REFERENCE_SNAPSHOT,
+                                                 delay=config.REFERENCE_REBUILD_DELAY)
+if reference_snapshot and reference.read_manifest(config.REFERENCE_SNAPSHOT) is None:
+    snapshot_rebuilder.request()
+
+# Offline mode (ANALYTICS_PARQUET): trend, head-to-head and ranking computed from the
+# partitioned Parquet export instead of Neo4j
+offline_analytics = OfflineAnalytics(config.ANALYTICS_PARQUET) if config.ANALYTICS_PARQUET else None
+
+# Concurrent identical /ranking and /team_trend computations share one run, within the
+# worker and across the workers using SINGLE_FLIGHT_LOCK_DIR
+flights = SingleFlight(config.SINGLE_FLIGHT_LOCK_DIR, enabled=config.SINGLE_FLIGHT_ENABLED)
+
+# Composite /views/* responses for the dashboard pages
+view_builder = ViewBuilder(neo4j_conn, ranking_engine, matrix_cache, reference_snapshot,
+                           workers=config.VIEW_WORKERS)
+
+# Worker warm-up, run by gunicorn.conf.py before the worker accepts requests or in the
+# background (WARMUP_MODE), started at the end of this module; /ranking request counts
+# pick the seasons it ranks
+hot_seasons = HotSeasons(config.WARMUP_STATS_FILE)
+atexit.register(hot_seasons.save)
+warmup = WarmUp(
+    neo4j_conn,
+    fetch=lambda path: app.test_client().get(path, headers={"X-Warmup": "1"}),
+    hot_seasons=hot_seasons,
+    rankings=config.WARMUP_RANKINGS
 )
 
+# Drop any cached state for a league/season after one of its matches changes
+invalidation = routes.Invalidation(ranking_engine, rating_engine, matrix_cache, response_cache, flights,
+                                   reference_snapshot, snapshot_rebuilder)
+match_changed = invalidation.match_changed
+
+# Write-behind queue for ?async=1 mutations (WRITE_QUEUE_ENABLED), flushed in the background
+write_queue = WriteQueue(
+    neo4j_conn,
+    config.WRITE_QUEUE_DIR,
+    on_written=match_changed,
+    flush_delay=config.WRITE_QUEUE_FLUSH_DELAY,
+    batch_size=config.WRITE_QUEUE_BATCH_SIZE,
+    max_attempts=config.WRITE_QUEUE_MAX_ATTEMPTS
+) if config.WRITE_QUEUE_ENABLED else None
+
+# ?async=1: journal the edit and answer 202 with its job id instead of writing it now
+def queue_edit(op, match_id, match=None):
+    if not write_queue:
+        return jsonify({"error": "The write queue is disabled (WRITE_QUEUE_ENABLED)"}), 400
+    return jsonify(write_queue.submit(op, match_id, match)), 202
+
+# Error response for a match that must not be written (unknown team, taken id), or None
+def rejected_match(match, replace=False):
+    match = mutations.bind_match(match)
+    results = neo4j_conn.run_many(mutations.check_statements([match], replace=replace))
+    for _, message, status in mutations.match_errors([match], results, replace=replace):
+        return jsonify({"error": message}), status
+    return None
+
+# Count client /ranking requests per season, cached responses included
+@app.before_request
+def track_hot_seasons():
+    if request.endpoint == 'get_ranking' and 'X-Warmup' not in request.headers:
+        league_id = request.args.get('leagueID', type=int)
+        season = request.args.get('season')
+        if league_id and season:
+            hot_seasons.hit(league_id, season)
+
+# Readiness for the load balancer: 503 until the worker's warm-up has finished
+@app.route('/ready', methods=['GET'])
+def get_ready():
+    if not config.WARMUP_ENABLED:
+        return jsonify({"state": "ready"})
+    status = warmup.status()
+    return jsonify(status), 200 if status["state"] == "ready" else 503
+
+def rank_season(league_id, season, method):
+    if offline_analytics and offline_analytics.available():
+        return offline_analytics.rank(league_id, season, method, weighted=config.RANKING_WEIGHTED)
+    if method == 'pagerank':
+        return ranking_engine.rank(league_id, season)
+    return rating_engine.rank(league_id, season, method)
+
 # API endpoint to get rankings
 @app.route('/ranking', methods=['GET'])
+@response_cache.cached('ranking', season_of)
 def get_ranking():
+    league_id, season, top, team, method = routes.ranking_args(request.args)
     try:
-        # Get leagueID and season from query parameters
-        league_id = request.args.get('leagueID', type=int)
-        season = request.args.get('season', type=str)
-
-        if not league_id or not season:
-            return jsonify({"error": "Both 'leagueID' and 'season' parameters are required."}), 400
-        
-        # Create a unique graph projection name based on leagueID and season
-        graph_name = f"seasonLeagueGraph{league_id}{season.replace('/', '')}"
-
-        # Check if the graph projection already exists
-        check_query = f"""
-        CALL gds.graph.exists('{graph_name}') YIELD exists
-        """
-        exists_result = neo4j_conn.query(check_query)
-        graph_exists = exists_result[0]['exists'] if exists_result else False
-
-
-        if not graph_exists:
-
-            # Create graph projection for the specified season and league
-            projection_query = f"""
-            CALL gds.graph.project.cypher(
-            '{graph_name}',
-            'MATCH (t:Team)-[:beat]->()
-            WHERE EXISTS {{
-                MATCH (t)-[r:beat]->()
-                WHERE r.season = "{season}" AND toInteger(r.leagueID) = {league_id}
-            }}
-            RETURN id(t) AS id',
-            'MATCH (team1:Team)-[r:beat]->(team2:Team)
-            WHERE r.season = "{season}" AND toInteger(r.leagueID) = {league_id}
-            RETURN id(team1) AS source, id(team2) AS target, r.weight AS weight',
-            {{ validateRelationships: false }}
-            )
-            """
-            neo4j_conn.query(projection_query)
-
-        # Run the PageRank algorithm
-        pagerank_query = f"""
-        CALL gds.pageRank.stream('{graph_name}')
-        YIELD nodeId, score
-        RETURN gds.util.asNode(nodeId).team_long_name AS Team, score
-        ORDER BY score DESC;
-        """
-        results = neo4j_conn.query(pagerank_query)
-
-        ranked_results = []
-        for idx, result in enumerate(results, start=1):
-            ranked_results.append({
-                "Team": result["Team"],
-                "score": result["score"],
-                "rank": idx
-            })
-
-        return jsonify(ranked_results)
+        results = flights.do(("ranking", league_id, season, method),
+                             lambda: rank_season(league_id, season, method))
+        return jsonify(ranked(results, top=top, team=team))
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# API endpoint to get ranking engine counters (warm starts, iterations saved, ...)
+@app.route('/ranking/stats', methods=['GET'])
+def get_ranking_stats():
+    return jsonify(dict(ranking_engine.stats(), ratings=rating_engine.stats()))
+
+# API endpoint to start ranking every league/season in the background
+@app.route('/ranking/batch', methods=['POST'])
+def start_ranking_batch():
+    if not batch_runner.start():
+        return jsonify({"error": "A batch ranking run is already in progress"}), 409
+    return jsonify(batch_runner.status()), 202
+
+# API endpoint to get the state and report of the last batch ranking run
+@app.route('/ranking/batch', methods=['GET'])
+def get_ranking_batch():
+    return jsonify(batch_runner.status())
+
+# Request, statement and ranking latency histograms in the Prometheus text format
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+# API endpoint to get planning vs execution time per statement (QUERY_DEBUG=1)
+@app.route('/debug/queries', methods=['GET'])
+def get_query_stats():
+    return jsonify(statement_stats.report())
+
+# API endpoint to get GDS projection catalog counters
+@app.route('/projections/stats', methods=['GET'])
+def get_projection_stats():
+    return jsonify(projection_manager.stats())
+
+# API endpoint to get Neo4j connection pool metrics
+@app.route('/pool/stats', methods=['GET'])
+def get_pool_stats():
+    return jsonify(neo4j_conn.pool_stats())
+
+# API endpoint to get response cache counters
+@app.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(response_cache.stats())
+
+# API endpoint to get request coalescing counters (leaders, coalesced calls, ...)
+@app.route('/flights/stats', methods=['GET'])
+def get_flight_stats():
+    return jsonify(flights.stats())
+
+# API endpoint to get the version of the Parquet export served in offline mode
+@app.route('/analytics/stats', methods=['GET'])
+def get_analytics_stats():
+    if not offline_analytics:
+        return jsonify({"error": "Offline analytics are disabled"}), 404
+    return jsonify(offline_analytics.stats())
+
 # API endpoint to get leagues
 @app.route('/leagues', methods=['GET'])
+@response_cache.cached('leagues', global_of)
 def get_leagues():
-    query = "MATCH (l:League) RETURN l.id AS id, l.name AS name"
-    leagues = neo4j_conn.query(query)
-    return jsonify([{"id": league["id"], "name": league["name"]} for league in leagues])
+    if reference_snapshot and reference_snapshot.available():
+        return jsonify(reference_snapshot.leagues())
+    return jsonify(routes.leagues_body(neo4j_conn.run("leagues")))
 
 # API endpoint to get seasons for a league
 @app.route('/seasons', methods=['GET'])
+@response_cache.cached('seasons', league_of)
 def get_seasons():
-    league_id = request.args.get('leagueID')
-    if not league_id:
-        return jsonify({"error": "Missing leagueID parameter"}), 400
-
+    league_id = routes.league_arg(request.args)
     try:
-        query = """
-        MATCH ()-[r:beat]->()
-        WHERE r.leagueID = $leagueID  // No conversion to integer; match as a string
-        RETURN DISTINCT r.season AS season
-        ORDER BY season
-        """
-        results = neo4j_conn.query(query, {"leagueID": league_id})  # Pass leagueID directly as a string
-        return jsonify([record['season'] for record in results])
+        if reference_snapshot and reference_snapshot.available(league_id):
+            return jsonify(reference_snapshot.seasons(league_id))
+        return jsonify(routes.seasons_body(neo4j_conn.run("seasons", {"leagueID": league_id})))
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
+# API endpoint to get the reference-data snapshot manifest, for clients that keep a local copy
+@app.route('/reference/snapshot', methods=['GET'])
+def get_reference_snapshot():
+    if not reference_snapshot:
+        return jsonify({"error": "Reference snapshot is disabled"}), 404
+    manifest = reference.read_manifest(config.REFERENCE_SNAPSHOT)
+    if manifest is None:
+        return jsonify({"error": "Reference snapshot is not built yet"}), 503
+    return jsonify(dict(manifest, rebuilds=snapshot_rebuilder.rebuilds, last_error=snapshot_rebuilder.last_error))
+
+# API endpoint to download one table of the snapshot as an Arrow IPC file
+@app.route('/reference/snapshot/<table>', methods=['GET'])
+def get_reference_snapshot_table(table):
+    if not reference_snapshot:
+        return jsonify({"error": "Reference snapshot is disabled"}), 404
+    if table not in reference.SCHEMAS:
+        return jsonify({"error": f"Unknown snapshot table: {table}"}), 404
+    try:
+        return send_file(reference.table_path(config.REFERENCE_SNAPSHOT, table),
+                         mimetype="application/vnd.apache.arrow.file")
+    except FileNotFoundError:
+        return jsonify({"error": "Reference snapshot is not built yet"}), 503
+
+# API endpoint to re-export the snapshot, e.g. after loading data outside the API
+@app.route('/reference/snapshot', methods=['POST'])
+def rebuild_reference_snapshot():
+    if not reference_snapshot:
+        return jsonify({"error": "Reference snapshot is disabled"}), 404
+    snapshot_rebuilder.request()
+    return jsonify({"state": "scheduled"}), 202
+
 # API endpoint to get head-to-head stats
 @app.route('/head_to_head', methods=['GET'])
+@response_cache.cached('head_to_head', league_of)
 def get_head_to_head():
-    team1_id = request.args.get('team1_id')
-    team2_id = request.args.get('team2_id')
-    league_id = request.args.get('leagueID')
-    
-    query = f"""
-    MATCH (team1:Team {{team_api_id: {team1_id}}})-[r:beat]-(team2:Team {{team_api_id: {team2_id}}})
-    WHERE toInteger(r.leagueID) = {league_id}
-    RETURN team1.team_short_name AS team1, team2.team_short_name AS team2,
-           COUNT(CASE WHEN r.winner = team1.team_short_name THEN 1 ELSE NULL END) AS team1_wins,
-           COUNT(CASE WHEN r.winner = team2.team_short_name THEN 1 ELSE NULL END) AS team2_wins,
-           COUNT(CASE WHEN r.winner = "tie" THEN 1 ELSE NULL END) AS ties
-    """
-    results = neo4j_conn.query(query, {
-        "team1_id": team1_id,
-        "team2_id": team2_id,
-        "league_id": league_id
-    })
-    return jsonify(results[0] if results else {})
+    league_id, team1_id, team2_id = routes.head_to_head_args(request.args)
+    try:
+        if offline_analytics and offline_analytics.available():
+            return jsonify(offline_analytics.head_to_head(league_id, team1_id, team2_id))
+        matrix = matrix_cache.load(neo4j_conn, league_id)
+        return jsonify(matrix.pair(team1_id, team2_id))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# API endpoint to get the head-to-head matrix of a league, optionally for one season.
+# ?format=arrow returns an Arrow IPC stream instead of JSON.
+@app.route('/head_to_head_matrix', methods=['GET'])
+def get_head_to_head_matrix():
+    league_id, season, fmt = routes.matrix_args(request.args)
+    try:
+        matrix = matrix_cache.load(neo4j_conn, league_id, season)
+        if fmt == "arrow":
+            return Response(matrix.to_arrow(), mimetype="application/vnd.apache.arrow.stream")
+        return jsonify(matrix.to_json())
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 # API endpoint to get teams for a league
 @app.route('/teams', methods=['GET'])
+@response_cache.cached('teams', league_of)
 def get_teams():
-    league_id = request.args.get('leagueID')
-    if not league_id:
-        return jsonify({"error": "Missing leagueID parameter"}), 400
-
+    league_id = routes.league_arg(request.args)
     try:
-        query = f"""
-        MATCH (t:Team)-[:beat]->()
-        WHERE EXISTS {{
-            MATCH (t)-[r:beat]->()
-            WHERE toInteger(r.leagueID) = {league_id}
-        }}
-        RETURN DISTINCT t.team_api_id AS id, t.team_long_name AS team_long_name, t.team_short_name AS team_short_name
-        ORDER BY team_long_name
-        """
-        results = neo4j_conn.query(query, {"leagueID": league_id})  # Pass leagueID
+        if reference_snapshot and reference_snapshot.available(league_id):
+            return jsonify(reference_snapshot.teams(league_id))
+        results = neo4j_conn.run("teams", {"leagueID": league_id})
         return jsonify(results)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Offline mode computes the totals from the Parquet export. Otherwise read the precomputed
+# season totals; fall back to scanning the team's matches when they have not been built
+# yet (python team_stats.py rebuild)
+def trend_records(league_id, team_id):
+    if offline_analytics and offline_analytics.available():
+        return offline_analytics.team_trend(league_id, team_id)
+    results = neo4j_conn.run("team_trend_stats", {"leagueID": league_id, "teamID": team_id})
+    if not results:
+        results = neo4j_conn.run("team_trend", {"leagueID": league_id, "teamID": team_id})
+    return results
+
 # API endpoint to get team trends for a league
 @app.route('/team_trend', methods=['GET'])
+@response_cache.cached('team_trend', league_of)
 def team_trend():
+    league_id, team_id = routes.trend_args(request.args)
     try:
-        # Get leagueID and teamID from query parameters
-        league_id = request.args.get('leagueID', type=int)
-        team_id = request.args.get('teamID', type=int)
-
-        if not league_id or not team_id:
-            return jsonify({"error": "Both 'leagueID' and 'teamID' parameters are required."}), 400
-
-        # Neo4j query to fetch the seasonal trend for the team
-        query = f"""
-        MATCH (team:Team {{team_api_id: {team_id}}})
-        WITH team.team_short_name AS team_short_name, team
-        MATCH (team)-[r:beat]-()
-        WHERE toInteger(r.leagueID) = {league_id}
-        WITH r.season AS season,
-            COUNT(CASE WHEN r.winner = team_short_name THEN 1 ELSE NULL END) AS wins,
-            COUNT(CASE WHEN r.loser = team_short_name THEN 1 ELSE NULL END) AS losses,
-            SUM(CASE
-                WHEN r.winner = team_short_name THEN r.winner_goals
-                WHEN r.loser = team_short_name THEN r.loser_goals
-                ELSE 0 END) AS goals_for,
-            SUM(CASE
-                WHEN r.winner = team_short_name THEN r.loser_goals
-                WHEN r.loser = team_short_name THEN r.winner_goals
-                ELSE 0 END) AS goals_against
-        RETURN season, wins, losses, goals_for, goals_against
-        ORDER BY season
-        """
-
-        results = neo4j_conn.query(query, {"leagueID": league_id, "teamID": team_id})
+        results = flights.do(("team_trend", league_id, team_id), lambda: trend_records(league_id, team_id))
 
         if not results:
             return jsonify({"message": "No data found for the specified team and league."}), 404
 
-        formatted_results = [
-            {
-                "season": record["season"],
-                "wins": record["wins"],
-                "losses": record["losses"],
-                "goals_for": record["goals_for"],
-                "goals_against": record["goals_against"]
-            }
-            for record in results
-        ]
-
-        return jsonify(formatted_results)
+        return jsonify(routes.trend_body(results))
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
+# Dashboard views: every picker's options plus the data of the current selection in one
+# response. Missing or unknown selections fall back to the first option.
+@app.route('/views/rankings', methods=['GET'])
+@response_cache.cached('views/rankings', league_of)
+def get_rankings_view():
+    try:
+        return jsonify(view_builder.rankings_view(
+            request.args.get('leagueID', type=int), request.args.get('season')))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/views/head_to_head', methods=['GET'])
+@response_cache.cached('views/head_to_head', league_of)
+def get_head_to_head_view():
+    try:
+        return jsonify(view_builder.head_to_head_view(
+            request.args.get('leagueID', type=int), request.args.get('team1_id', type=int),
+            request.args.get('team2_id', type=int)))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/views/team_trend', methods=['GET'])
+@response_cache.cached('views/team_trend', league_of)
+def get_team_trend_view():
+    try:
+        return jsonify(view_builder.team_trend_view(
+            request.args.get('leagueID', type=int), request.args.get('teamID', type=int)))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/views/match_editor', methods=['GET'])
+@response_cache.cached('views/match_editor', league_of)
+def get_match_editor_view():
+    try:
+        return jsonify(view_builder.match_editor_view(
+            request.args.get('leagueID', type=int), request.args.get('season'),
+            request.args.get('matchID', type=int)))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # API endpoint to get stats for a match ID
 @app.route('/match_stats', methods=['GET'])
+@response_cache.cached('match_stats', global_of)
 def get_match_stats():
-    match_id = request.args.get('matchID', type=int)
-    if not match_id:
-        return jsonify({"error": "Missing matchID parameter"}), 400
-
-    query = f"""
-    MATCH (team1:Team)-[r:beat]-(team2:Team)
-    WHERE toInteger(r.match_id) = {match_id}
-    RETURN r.winner AS winner, r.loser AS loser, 
-           r.winner_goals AS winner_goals, 
-           r.loser_goals AS loser_goals
-    LIMIT 1
-    """
+    match_id = routes.match_id_arg(request.args)
     try:
-        result = neo4j_conn.query(query)
+        result = neo4j_conn.run("match_stats", {"matchID": match_id})
         if result:
             return jsonify(result[0]), 200
         else:
@@ -245,24 +433,26 @@ def get_match_stats():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-# API endpoint to get all matches for a season in a league
+# API endpoint to get all matches for a season in a league. The full list is streamed as
+# a JSON array (or NDJSON with ?format=ndjson); ?limit= returns one page of match ids
+# after the ?after= cursor, with the cursor of the next page. Streamed lists are not
+# stored, but carry an ETag so unchanged seasons answer conditional requests with 304.
 @app.route('/matches', methods=['GET'])
+@response_cache.cached('matches', season_of, vary=('Accept',))
 def get_matches():
-    league_id = request.args.get('leagueID')
-    season = request.args.get('season')
-
-    if not league_id or not season:
-        return jsonify({"error": "Both 'leagueID' and 'season' parameters are required."}), 400
-
-    query = f"""
-    MATCH ()-[r:beat]-()
-    WHERE toInteger(r.leagueID) = {league_id} AND r.season = '{season}'
-    RETURN DISTINCT toInteger(r.match_id) AS match_id
-    ORDER BY match_id
-    """
+    league_id, season, limit, after = routes.matches_args(request.args)
     try:
-        results = neo4j_conn.query(query)
-        return jsonify([{"match_id": record["match_id"]} for record in results])
+        if limit is not None:
+            # One extra row tells whether another page follows
+            results = neo4j_conn.run("matches_page", {
+                "leagueID": league_id, "season": season, "after": after, "limit": limit + 1
+            })
+            return jsonify(routes.page_body(results, limit))
+
+        as_ndjson = streaming.wants_ndjson(request.args.get('format'), request.headers.get('Accept'))
+        records = streaming.prime(neo4j_conn.stream(
+            "matches", {"leagueID": league_id, "season": season}, fetch_size=config.STREAM_FETCH_SIZE))
+        return Response(streaming.body(records, as_ndjson), mimetype=streaming.mimetype(as_ndjson))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -270,110 +460,106 @@ def get_matches():
 @app.route('/update_match', methods=['PUT'])
 def update_match():
     data = request.json
+    app.logger.debug("update_match %s", data)
+    match = routes.match_payload(data)
 
-    match_id = data.get("matchID")
-    winner = data.get("winner")
-    loser = data.get("loser")
-    winner_goals = data.get("winner_goals")
-    loser_goals = data.get("loser_goals")
-    league_id = data.get("leagueID")
-    season = data.get("season")
-    print([match_id, winner, loser, winner_goals, loser_goals, league_id, season])
-
-    if match_id is None or winner is None or loser is None or winner_goals is None or loser_goals is None or league_id is None or season is None:
-        return jsonify({"error": "All fields are required"}), 400
-
-    # Delete the existing relationship
-    delete_query = f"""
-    MATCH ()-[r:beat]-()
-    WHERE toInteger(r.match_id) = {match_id}
-    DELETE r
-    """
     try:
-        neo4j_conn.query(delete_query)
+        if request.args.get('async') == '1':
+            return queue_edit("update", match["matchID"], match)
 
-        # Create the new relationship
-        create_query = f"""
-        MATCH (team1:Team {{team_short_name: '{winner}'}})
-        MATCH (team2:Team {{team_short_name: '{loser}'}})
-        CREATE (team2)-[newRel:beat {{
-            match_id: {match_id},
-            winner: '{winner}',
-            loser: '{loser}',
-            winner_goals: {winner_goals},
-            loser_goals: {loser_goals},
-            scoreDifferential: {winner_goals - loser_goals},
-            season: '{season}',
-            weight: {abs(winner_goals - loser_goals)},
-            leagueID: '{league_id}'
-        }}]->(team1)
-        """
-        neo4j_conn.query(create_query)
+        rejected = rejected_match(match, replace=True)
+        if rejected:
+            return rejected
+
+        # Replace the existing relationship (and its season totals) in a single transaction
+        results = neo4j_conn.run_many(mutations.update_statements(match))
+
+        for scope in routes.changed_scopes(mutations.deleted_scopes(results) + [(match["leagueID"], match["season"])]):
+            match_changed(*scope)
         return jsonify({"message": "Match updated successfully"}), 200
+    except QueryParameterError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
 # API endpoint to add a new match to a season in a league
 @app.route('/add_match', methods=['PUT'])
 def add_match():
+    match = routes.match_payload(request.json)
     try:
-        data = request.json
-        match_id = data.get("matchID")
-        winner = data.get("winner")
-        loser = data.get("loser")
-        winner_goals = data.get("winner_goals")
-        loser_goals = data.get("loser_goals")
-        league_id = data.get("leagueID")
-        season = data.get("season")
-
-        if match_id is None or winner is None or loser is None or winner_goals is None or loser_goals is None or league_id is None or season is None:
-            return jsonify({"error": "All fields are required"}), 400
+        if request.args.get('async') == '1':
+            return queue_edit("add", match["matchID"], match)
+
+        rejected = rejected_match(match)
+        if rejected:
+            return rejected
 
         # Create the new relationship
-        create_query = f"""
-        MATCH (team1:Team {{team_short_name: '{winner}'}})
-        MATCH (team2:Team {{team_short_name: '{loser}'}})
-        CREATE (team2)-[newRel:beat {{
-            match_id: {match_id},
-            winner: '{winner}',
-            loser: '{loser}',
-            winner_goals: {winner_goals},
-            loser_goals: {loser_goals},
-            scoreDifferential: {winner_goals - loser_goals},
-            season: '{season}',
-            weight: {abs(winner_goals - loser_goals)},
-            leagueID: '{league_id}'
-        }}]->(team1)
-        """
-        neo4j_conn.query(create_query)
+        neo4j_conn.run_many(mutations.add_statements(match))
+        match_changed(match["leagueID"], match["season"])
 
         return jsonify({"message": "Match added successfully"}), 200
 
+    except QueryParameterError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# API endpoint to bulk load matches from CSV or JSON Lines (streamed, written in chunks)
+@app.route('/matches/bulk', methods=['POST'])
+def bulk_add_matches():
+    fmt, chunk_size = routes.bulk_args(request.args, format_for(content_type=request.content_type))
+    try:
+        report = ingest(neo4j_conn, text_stream(request.stream), fmt, chunk_size=chunk_size)
+        for league_id, season in report.scopes:
+            match_changed(league_id, season)
+        return jsonify(report.to_dict()), 200
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # API endpoint to delete a match from a season in a league
 @app.route('/delete_match', methods=['DELETE'])
 def delete_match():
+    match_id = routes.match_id_arg(request.args, "Match ID is required")
     try:
-        match_id = request.args.get("matchID")
-
-        if not match_id:
-            return jsonify({"error": "Match ID is required"}), 400
-
-        delete_query = f"""
-        MATCH ()-[r:beat]-()
-        WHERE toInteger(r.match_id) = {match_id}
-        DELETE r
-        """
-        print(delete_query)
-        neo4j_conn.query(delete_query)
+        if request.args.get('async') == '1':
+            return queue_edit("delete", match_id)
+
+        results = neo4j_conn.run_many(mutations.delete_statements(match_id))
+        for scope in mutations.deleted_scopes(results):
+            match_changed(*scope)
         return jsonify({"message": "Match deleted successfully"}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+# API endpoint to get the status of a queued edit: queued (journaled), written or failed.
+# ?wait=N waits up to N seconds (at most 30) for it to leave the queue.
+@app.route('/write_queue/jobs/<job_id>', methods=['GET'])
+def get_write_job(job_id):
+    if not write_queue:
+        return jsonify({"error": "The write queue is disabled (WRITE_QUEUE_ENABLED)"}), 404
+    job = write_queue.job(job_id, wait=routes.wait_arg(request.args))
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
+
+# API endpoint to get write queue counters (queued matches, coalesced edits, flushes, ...)
+@app.route('/write_queue/stats', methods=['GET'])
+def get_write_queue_stats():
+    if not write_queue:
+        return jsonify({"error": "The write queue is disabled (WRITE_QUEUE_ENABLED)"}), 404
+    return jsonify(write_queue.stats())
+
+
+# Without gunicorn.conf.py's hook, a blocking warm-up runs here, once every route exists
+if config.WARMUP_ENABLED and config.WARMUP_MODE == "background":
+    warmup.start()
+elif config.WARMUP_ENABLED and not config.WARMUP_HOOK:
+    warmup.run()
+
 # Run the Flask app
 if __name__ == '__main__':
     app.run(debug=True)
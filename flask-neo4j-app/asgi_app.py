@@ -0,0 +1,696 @@
+# ASGI variant of app.py built on the neo4j AsyncDriver. Serves the same routes so a
+# request waiting on Aura no longer holds a worker thread; parameter checks, cache scopes,
+# response bodies and invalidation are shared with app.py through routes.py and views.py.
+# The worker warm-up runs in the lifespan handler rather than in gunicorn's
+# post_worker_init hook.
+#
+#   gunicorn asgi_app:app -k uvicorn.workers.UvicornWorker
+import asyncio
+import contextlib
+import io
+import json
+import os
+import threading
+import time
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Match, Route
+from werkzeug.datastructures import MultiDict
+
+import config
+import metrics
+import mutations
+import streaming
+from analytics import OfflineAnalytics
+from cache import NOT_MODIFIED, ResponseCache, ScopeVersions, create_backend
+from db import connect, connect_async
+from headtohead import HeadToHeadMatrix, MatrixCache, edge_statement
+from ingest import format_for, ingest, text_stream
+from projections import ProjectionManager
+from queries import QueryParameterError, statement_stats
+from ranking import LocalRankingEngine, PrecomputedRankingEngine, create_engine, ranked
+from ranking_batch import BatchRunner
+from ratings import RatingEngine
+import routes
+from routes import RequestError, global_of, league_of, season_of
+from schema import check_schema
+from singleflight import SingleFlight
+from views import AsyncViewBuilder
+from warmup import HotSeasons, WarmUp
+from write_queue import WriteQueue
+import reference
+
+neo4j_conn = connect_async()
+
+cache_backend = create_backend(
+    config.CACHE_BACKEND,
+    max_entries=config.CACHE_MAX_ENTRIES,
+    ttl=config.CACHE_TTL_SECONDS,
+    redis_url=config.CACHE_REDIS_URL
+)
+
+# Projections, rankings, ratings and matrices cached in the worker follow the response
+# cache's league/season versions
+scope_versions = ScopeVersions(cache_backend, ttl=config.CACHE_TTL_SECONDS)
+
+# The engines, GDS projections, batch runs, bulk loads and the write queue keep a pooled
+# sync connection, used from worker threads. The local PageRank and rating engines get
+# their season edges from the async driver and only solve in a thread.
+ranking_conn = connect()
+
+# Same startup schema check as app.py, on the sync connection before serving
+if config.DB_BACKEND == "neo4j":
+    check_schema(ranking_conn, config.SCHEMA_CHECK)
+
+projection_manager = ProjectionManager(
+    ranking_conn,
+    max_projections=config.MAX_PROJECTIONS,
+    max_memory_bytes=config.MAX_PROJECTION_MEMORY_MB * 1024 * 1024 or None,
+    versions=scope_versions
+)
+ranking_engine = create_engine(
+    config.RANKING_BACKEND,
+    ranking_conn,
+    projection_manager,
+    weighted=config.RANKING_WEIGHTED,
+    rebuild_on_write=config.PROJECTION_REBUILD_ON_WRITE,
+    precomputed=config.RANKING_PRECOMPUTED,
+    incremental=config.RANKING_INCREMENTAL,
+    warm_start_iterations=config.RANKING_WARM_START_ITERATIONS,
+    versions=scope_versions
+)
+
+# Elo/Massey/Colley ratings for /ranking?method=, computed in-process from the season's matches
+rating_engine = RatingEngine(ranking_conn, versions=scope_versions)
+
+# Background batch ranking of every league/season (POST /ranking/batch)
+batch_runner = BatchRunner(ranking_conn, config.RANKING_BACKEND, weighted=config.RANKING_WEIGHTED,
+                           workers=config.RANKING_BATCH_WORKERS)
+
+matrix_cache = MatrixCache(versions=scope_versions)
+
+response_cache = ResponseCache(cache_backend, enabled=config.CACHE_ENABLED)
+
+# Memory-mapped /leagues, /seasons and /teams data, re-exported after match writes
+reference_snapshot = reference.ReferenceSnapshot(config.REFERENCE_SNAPSHOT) if config.REFERENCE_SNAPSHOT else None
+snapshot_rebuilder = reference.SnapshotRebuilder(ranking_conn, config.REFERENCE_SNAPSHOT,
+                                                 delay=config.REFERENCE_REBUILD_DELAY)
+if reference_snapshot and reference.read_manifest(config.REFERENCE_SNAPSHOT) is None:
+    snapshot_rebuilder.request()
+
+# Offline mode (ANALYTICS_PARQUET): trend, head-to-head and ranking read the Parquet
+# export in a worker thread instead of querying Neo4j
+offline_analytics = OfflineAnalytics(config.ANALYTICS_PARQUET) if config.ANALYTICS_PARQUET else None
+
+# Concurrent identical /ranking and /team_trend computations share one run, within the
+# worker and across the workers using SINGLE_FLIGHT_LOCK_DIR
+flights = SingleFlight(config.SINGLE_FLIGHT_LOCK_DIR, enabled=config.SINGLE_FLIGHT_ENABLED)
+
+# /views/* run their sub-queries concurrently as tasks on the async driver
+view_builder = AsyncViewBuilder(
+    neo4j_conn,
+    rank=lambda league_id, season: rank_season(league_id, season, 'pagerank'),
+    load_matrix=lambda league_id: load_matrix(league_id),
+    reference_snapshot=reference_snapshot
+)
+
+# Write-behind queue for ?async=1 mutations, flushed on the sync ranking connection
+write_queue = WriteQueue(
+    ranking_conn,
+    config.WRITE_QUEUE_DIR,
+    on_written=lambda league_id, season: match_changed(league_id, season),
+    flush_delay=config.WRITE_QUEUE_FLUSH_DELAY,
+    batch_size=config.WRITE_QUEUE_BATCH_SIZE,
+    max_attempts=config.WRITE_QUEUE_MAX_ATTEMPTS
+) if config.WRITE_QUEUE_ENABLED else None
+
+# Worker warm-up, run from the lifespan handler before the worker takes traffic or in the
+# background (WARMUP_MODE). Its GETs go through the app in-process.
+hot_seasons = HotSeasons(config.WARMUP_STATS_FILE)
+warmup = WarmUp(
+    ranking_conn,
+    fetch=lambda path: local_get(path, {"X-Warmup": "1"}),
+    hot_seasons=hot_seasons,
+    rankings=config.WARMUP_RANKINGS
+)
+warmup_loop = None
+
+invalidation = routes.Invalidation(ranking_engine, rating_engine, matrix_cache, response_cache, flights,
+                                   reference_snapshot, snapshot_rebuilder)
+match_changed = invalidation.match_changed
+
+
+# Query parameters as the MultiDict routes.py reads
+def args_of(request):
+    return MultiDict(request.query_params.multi_items())
+
+
+def error(message, status):
+    return JSONResponse({"error": message}, status_code=status)
+
+
+async def bad_request(request, e):
+    return error(str(e), 400)
+
+
+# Invalidate every touched league/season concurrently; dropping a GDS projection is a
+# blocking round trip on the ranking connection
+async def matches_changed(scopes):
+    await asyncio.gather(*(asyncio.to_thread(match_changed, league_id, season)
+                           for league_id, season in routes.changed_scopes(scopes)))
+
+
+# Response of local_get, with the part of the Flask test client response WarmUp reads
+class LocalResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+    def get_json(self):
+        return json.loads(self.body)
+
+
+# GET a path from the app itself, from a thread other than the event loop's
+def local_get(path, headers):
+    return asyncio.run_coroutine_threadsafe(call_app(path, headers), warmup_loop).result()
+
+
+async def call_app(path, headers):
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("127.0.0.1", 0), "server": ("127.0.0.1", 80), "state": {},
+    }
+    sent = asyncio.Event()
+    requested = []
+    response = {"status": 500, "body": []}
+
+    async def receive():
+        if not requested:
+            requested.append(1)
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await sent.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"].append(message.get("body", b""))
+            if not message.get("more_body"):
+                sent.set()
+
+    await app(scope, receive, send)
+    sent.set()
+    return LocalResponse(response["status"], b"".join(response["body"]))
+
+
+# Request body as a blocking binary stream for ingest(), read from a worker thread while
+# the event loop receives the chunks
+class RequestBodyReader(io.RawIOBase):
+    def __init__(self, request, loop):
+        self.chunks = request.stream()
+        self.loop = loop
+        self.pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending:
+            chunk = asyncio.run_coroutine_threadsafe(self._next(), self.loop).result()
+            if chunk is None:
+                return 0
+            self.pending = chunk
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+    async def _next(self):
+        return await anext(self.chunks, None)
+
+
+# Count client /ranking requests per season, cached responses included
+def track_hot_seasons(view):
+    async def wrapper(request):
+        league_id = args_of(request).get('leagueID', type=int)
+        season = request.query_params.get('season')
+        if league_id and season and 'x-warmup' not in request.headers:
+            hot_seasons.hit(league_id, season)
+        return await view(request)
+    return wrapper
+
+
+# Async counterpart of ResponseCache.cached
+def cached(endpoint, scope, vary=()):
+    def decorator(view):
+        async def wrapper(request):
+            if not response_cache.enabled:
+                return await view(request)
+
+            variant = [request.headers.get(name, "") for name in vary]
+            key, etag = response_cache.key(endpoint, args_of(request), scope, variant)
+            quoted = f'"{etag}"'
+            headers = {"ETag": quoted, "Vary": ", ".join(vary)} if vary else {"ETag": quoted}
+            body = response_cache.lookup(key, quoted in request.headers.get("if-none-match", ""))
+            if body is NOT_MODIFIED:
+                return Response(status_code=304, headers=headers)
+            if body is not None:
+                return Response(body, media_type="application/json", headers=headers)
+
+            response = await view(request)
+            if response.status_code == 200:
+                if isinstance(response, StreamingResponse):
+                    response_cache.store_streamed(key)
+                else:
+                    response_cache.store(key, response.body.decode())
+                response.headers.update(headers)
+            return response
+        return wrapper
+    return decorator
+
+
+async def rank_season(league_id, season, method):
+    if offline_analytics and offline_analytics.available():
+        return await asyncio.to_thread(offline_analytics.rank, league_id, season, method, config.RANKING_WEIGHTED)
+    engine, args = (ranking_engine, ()) if method == 'pagerank' else (rating_engine, (method,))
+    if isinstance(engine, PrecomputedRankingEngine):
+        stored = await neo4j_conn.run(*engine.store.statement(league_id, season))
+        if stored:
+            return stored
+        engine = engine.engine
+    # GDS projections are created and tracked on the sync connection
+    if not isinstance(engine, (LocalRankingEngine, RatingEngine)):
+        return await asyncio.to_thread(engine.rank, league_id, season)
+
+    loaded = None
+    if engine.needs_load(league_id, season, *args):
+        stamp = engine.stamp(league_id, season)
+        loaded = stamp, await neo4j_conn.run(*engine.edge_statement(league_id, season))
+    return await asyncio.to_thread(engine.rank, league_id, season, *args, loaded=loaded)
+
+
+@track_hot_seasons
+@cached('ranking', season_of)
+async def get_ranking(request):
+    league_id, season, top, team, method = routes.ranking_args(args_of(request))
+    try:
+        results = await flights.do_async(("ranking", league_id, season, method),
+                                         lambda: rank_season(league_id, season, method))
+        return JSONResponse(ranked(results, top=top, team=team))
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@cached('leagues', global_of)
+async def get_leagues(request):
+    if reference_snapshot and reference_snapshot.available():
+        return JSONResponse(reference_snapshot.leagues())
+    return JSONResponse(routes.leagues_body(await neo4j_conn.run("leagues")))
+
+
+@cached('seasons', league_of)
+async def get_seasons(request):
+    league_id = routes.league_arg(args_of(request))
+    try:
+        if reference_snapshot and reference_snapshot.available(league_id):
+            return JSONResponse(reference_snapshot.seasons(league_id))
+        return JSONResponse(routes.seasons_body(await neo4j_conn.run("seasons", {"leagueID": league_id})))
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@cached('head_to_head', league_of)
+async def get_head_to_head(request):
+    league_id, team1_id, team2_id = routes.head_to_head_args(args_of(request))
+    try:
+        if offline_analytics and offline_analytics.available():
+            return JSONResponse(await asyncio.to_thread(offline_analytics.head_to_head, league_id, team1_id, team2_id))
+        matrix = await load_matrix(league_id)
+        return JSONResponse(matrix.pair(team1_id, team2_id))
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def load_matrix(league_id, season=None):
+    matrix = matrix_cache.get(league_id, season)
+    if matrix is None:
+        stamp = matrix_cache.stamp(league_id, season)
+        matrix = HeadToHeadMatrix.from_records(await neo4j_conn.run(*edge_statement(league_id, season)))
+        matrix_cache.put(league_id, season, matrix, stamp)
+    return matrix
+
+
+async def get_head_to_head_matrix(request):
+    league_id, season, fmt = routes.matrix_args(args_of(request))
+    try:
+        matrix = await load_matrix(league_id, season)
+        if fmt == "arrow":
+            return Response(matrix.to_arrow(), media_type="application/vnd.apache.arrow.stream")
+        return JSONResponse(matrix.to_json())
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@cached('teams', league_of)
+async def get_teams(request):
+    league_id = routes.league_arg(args_of(request))
+    try:
+        if reference_snapshot and reference_snapshot.available(league_id):
+            return JSONResponse(reference_snapshot.teams(league_id))
+        return JSONResponse(await neo4j_conn.run("teams", {"leagueID": league_id}))
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def trend_records(league_id, team_id):
+    if offline_analytics and offline_analytics.available():
+        return await asyncio.to_thread(offline_analytics.team_trend, league_id, team_id)
+    results = await neo4j_conn.run("team_trend_stats", {"leagueID": league_id, "teamID": team_id})
+    if not results:
+        results = await neo4j_conn.run("team_trend", {"leagueID": league_id, "teamID": team_id})
+    return results
+
+
+@cached('team_trend', league_of)
+async def team_trend(request):
+    league_id, team_id = routes.trend_args(args_of(request))
+    try:
+        results = await flights.do_async(("team_trend", league_id, team_id), lambda: trend_records(league_id, team_id))
+        if not results:
+            return JSONResponse({"message": "No data found for the specified team and league."}, status_code=404)
+        return JSONResponse(routes.trend_body(results))
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@cached('match_stats', global_of)
+async def get_match_stats(request):
+    match_id = routes.match_id_arg(args_of(request))
+    try:
+        result = await neo4j_conn.run("match_stats", {"matchID": match_id})
+        if result:
+            return JSONResponse(result[0])
+        return error("Match not found", 404)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@cached('matches', season_of, vary=('Accept',))
+async def get_matches(request):
+    league_id, season, limit, after = routes.matches_args(args_of(request))
+    try:
+        if limit is not None:
+            results = await neo4j_conn.run("matches_page", {
+                "leagueID": league_id, "season": season, "after": after, "limit": limit + 1
+            })
+            return JSONResponse(routes.page_body(results, limit))
+
+        as_ndjson = streaming.wants_ndjson(request.query_params.get('format'), request.headers.get('accept'))
+        records = await streaming.aprime(neo4j_conn.stream(
+            "matches", {"leagueID": league_id, "season": season}, fetch_size=config.STREAM_FETCH_SIZE))
+        return StreamingResponse(streaming.abody(records, as_ndjson), media_type=streaming.mimetype(as_ndjson))
+    except Exception as e:
+        return error(str(e), 500)
+
+
+# ?async=1: journal the edit and answer 202 with its job id instead of writing it now
+def queue_edit(op, match_id, payload=None):
+    if not write_queue:
+        return error("The write queue is disabled (WRITE_QUEUE_ENABLED)", 400)
+    return JSONResponse(write_queue.submit(op, match_id, payload), status_code=202)
+
+
+# Error response for a match that must not be written (unknown team, taken id), or None
+async def rejected_match(payload, replace=False):
+    match = mutations.bind_match(payload)
+    results = await neo4j_conn.run_many(mutations.check_statements([match], replace=replace))
+    for _, message, status in mutations.match_errors([match], results, replace=replace):
+        return error(message, status)
+    return None
+
+
+async def update_match(request):
+    payload = routes.match_payload(await request.json())
+    try:
+        if request.query_params.get('async') == '1':
+            return await asyncio.to_thread(queue_edit, "update", payload["matchID"], payload)
+        rejected = await rejected_match(payload, replace=True)
+        if rejected:
+            return rejected
+        results = await neo4j_conn.run_many(mutations.update_statements(payload))
+        await matches_changed(mutations.deleted_scopes(results)
+                              + [(payload["leagueID"], payload["season"])])
+        return JSONResponse({"message": "Match updated successfully"})
+    except QueryParameterError as e:
+        return error(str(e), 400)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def add_match(request):
+    payload = routes.match_payload(await request.json())
+    try:
+        if request.query_params.get('async') == '1':
+            return await asyncio.to_thread(queue_edit, "add", payload["matchID"], payload)
+        rejected = await rejected_match(payload)
+        if rejected:
+            return rejected
+        await neo4j_conn.run_many(mutations.add_statements(payload))
+        await matches_changed([(payload["leagueID"], payload["season"])])
+        return JSONResponse({"message": "Match added successfully"})
+    except QueryParameterError as e:
+        return error(str(e), 400)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def bulk_add_matches(request):
+    fmt, chunk_size = routes.bulk_args(args_of(request), format_for(content_type=request.headers.get('content-type')))
+    try:
+        body = io.BufferedReader(RequestBodyReader(request, asyncio.get_running_loop()))
+        report = await asyncio.to_thread(ingest, ranking_conn, text_stream(body), fmt, chunk_size)
+        await matches_changed(report.scopes)
+        return JSONResponse(report.to_dict())
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def delete_match(request):
+    match_id = routes.match_id_arg(args_of(request), "Match ID is required")
+    try:
+        if request.query_params.get('async') == '1':
+            return await asyncio.to_thread(queue_edit, "delete", match_id)
+        results = await neo4j_conn.run_many(mutations.delete_statements(match_id))
+        await matches_changed(mutations.deleted_scopes(results))
+        return JSONResponse({"message": "Match deleted successfully"})
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def get_write_job(request):
+    if not write_queue:
+        return error("The write queue is disabled (WRITE_QUEUE_ENABLED)", 404)
+    job = await asyncio.to_thread(write_queue.job, request.path_params['job_id'], routes.wait_arg(args_of(request)))
+    if job is None:
+        return error("Unknown job", 404)
+    return JSONResponse(job)
+
+
+async def get_write_queue_stats(request):
+    if not write_queue:
+        return error("The write queue is disabled (WRITE_QUEUE_ENABLED)", 404)
+    return JSONResponse(write_queue.stats())
+
+
+async def build_view(view):
+    try:
+        return JSONResponse(await view)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@cached('views/rankings', league_of)
+async def get_rankings_view(request):
+    args = args_of(request)
+    return await build_view(view_builder.rankings_view(args.get('leagueID', type=int), args.get('season')))
+
+
+@cached('views/head_to_head', league_of)
+async def get_head_to_head_view(request):
+    args = args_of(request)
+    return await build_view(view_builder.head_to_head_view(
+        args.get('leagueID', type=int), args.get('team1_id', type=int), args.get('team2_id', type=int)))
+
+
+@cached('views/team_trend', league_of)
+async def get_team_trend_view(request):
+    args = args_of(request)
+    return await build_view(view_builder.team_trend_view(args.get('leagueID', type=int), args.get('teamID', type=int)))
+
+
+@cached('views/match_editor', league_of)
+async def get_match_editor_view(request):
+    args = args_of(request)
+    return await build_view(view_builder.match_editor_view(
+        args.get('leagueID', type=int), args.get('season'), args.get('matchID', type=int)))
+
+
+async def get_ranking_stats(request):
+    return JSONResponse(dict(ranking_engine.stats(), ratings=rating_engine.stats()))
+
+
+async def start_ranking_batch(request):
+    if not batch_runner.start():
+        return error("A batch ranking run is already in progress", 409)
+    return JSONResponse(batch_runner.status(), status_code=202)
+
+
+async def get_ranking_batch(request):
+    return JSONResponse(batch_runner.status())
+
+
+async def get_reference_snapshot(request):
+    if not reference_snapshot:
+        return error("Reference snapshot is disabled", 404)
+    manifest = reference.read_manifest(config.REFERENCE_SNAPSHOT)
+    if manifest is None:
+        return error("Reference snapshot is not built yet", 503)
+    return JSONResponse(dict(manifest, rebuilds=snapshot_rebuilder.rebuilds, last_error=snapshot_rebuilder.last_error))
+
+
+async def get_reference_snapshot_table(request):
+    table = request.path_params['table']
+    if not reference_snapshot:
+        return error("Reference snapshot is disabled", 404)
+    if table not in reference.SCHEMAS:
+        return error(f"Unknown snapshot table: {table}", 404)
+    path = reference.table_path(config.REFERENCE_SNAPSHOT, table)
+    if not os.path.exists(path):
+        return error("Reference snapshot is not built yet", 503)
+    return FileResponse(path, media_type="application/vnd.apache.arrow.file")
+
+
+async def rebuild_reference_snapshot(request):
+    if not reference_snapshot:
+        return error("Reference snapshot is disabled", 404)
+    snapshot_rebuilder.request()
+    return JSONResponse({"state": "scheduled"}, status_code=202)
+
+
+async def get_metrics(request):
+    return Response(metrics.REGISTRY.render(), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+
+async def get_ready(request):
+    if not config.WARMUP_ENABLED:
+        return JSONResponse({"state": "ready"})
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["state"] == "ready" else 503)
+
+
+async def get_query_stats(request):
+    return JSONResponse(statement_stats.report())
+
+
+async def get_projection_stats(request):
+    return JSONResponse(projection_manager.stats())
+
+
+# The async driver serves the routes and season loads; GDS ranking, batch runs, bulk loads
+# and the write queue use the sync ranking connection
+async def get_pool_stats(request):
+    return JSONResponse({"async": neo4j_conn.pool_stats(), "ranking": ranking_conn.pool_stats()})
+
+
+async def get_cache_stats(request):
+    return JSONResponse(response_cache.stats())
+
+
+async def get_flight_stats(request):
+    return JSONResponse(flights.stats())
+
+
+async def get_analytics_stats(request):
+    if not offline_analytics:
+        return error("Offline analytics are disabled", 404)
+    return JSONResponse(offline_analytics.stats())
+
+
+# Counterpart of the Flask before/after_request timing, labelled by route pattern
+class RequestTimer(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        start = time.perf_counter()
+        response = await call_next(request)
+        route = next((route.path for route in request.app.routes
+                      if route.matches(request.scope)[0] == Match.FULL), "unmatched")
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method,
+                                        route=route, status=response.status_code)
+        return response
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global warmup_loop
+    warmup_loop = asyncio.get_running_loop()
+    if config.WARMUP_ENABLED and config.WARMUP_MODE == "background":
+        threading.Thread(target=warmup.run, daemon=True).start()
+    elif config.WARMUP_ENABLED:
+        await asyncio.to_thread(warmup.run)
+    yield
+    hot_seasons.save()
+    await asyncio.to_thread(projection_manager.drop_all)
+    await neo4j_conn.close()
+    ranking_conn.close()
+
+
+app = Starlette(
+    routes=[
+        Route('/ready', get_ready, methods=['GET']),
+        Route('/ranking', get_ranking, methods=['GET']),
+        Route('/ranking/stats', get_ranking_stats, methods=['GET']),
+        Route('/ranking/batch', start_ranking_batch, methods=['POST']),
+        Route('/ranking/batch', get_ranking_batch, methods=['GET']),
+        Route('/leagues', get_leagues, methods=['GET']),
+        Route('/seasons', get_seasons, methods=['GET']),
+        Route('/head_to_head', get_head_to_head, methods=['GET']),
+        Route('/head_to_head_matrix', get_head_to_head_matrix, methods=['GET']),
+        Route('/teams', get_teams, methods=['GET']),
+        Route('/team_trend', team_trend, methods=['GET']),
+        Route('/match_stats', get_match_stats, methods=['GET']),
+        Route('/matches', get_matches, methods=['GET']),
+        Route('/update_match', update_match, methods=['PUT']),
+        Route('/add_match', add_match, methods=['PUT']),
+        Route('/matches/bulk', bulk_add_matches, methods=['POST']),
+        Route('/delete_match', delete_match, methods=['DELETE']),
+        Route('/write_queue/jobs/{job_id}', get_write_job, methods=['GET']),
+        Route('/write_queue/stats', get_write_queue_stats, methods=['GET']),
+        Route('/views/rankings', get_rankings_view, methods=['GET']),
+        Route('/views/head_to_head', get_head_to_head_view, methods=['GET']),
+        Route('/views/team_trend', get_team_trend_view, methods=['GET']),
+        Route('/views/match_editor', get_match_editor_view, methods=['GET']),
+        Route('/reference/snapshot', get_reference_snapshot, methods=['GET']),
+        Route('/reference/snapshot', rebuild_reference_snapshot, methods=['POST']),
+        Route('/reference/snapshot/{table}', get_reference_snapshot_table, methods=['GET']),
+        Route('/metrics', get_metrics, methods=['GET']),
+        Route('/debug/queries', get_query_stats, methods=['GET']),
+        Route('/projections/stats', get_projection_stats, methods=['GET']),
+        Route('/pool/stats', get_pool_stats, methods=['GET']),
+        Route('/cache/stats', get_cache_stats, methods=['GET']),
+        Route('/flights/stats', get_flight_stats, methods=['GET']),
+        Route('/analytics/stats', get_analytics_stats, methods=['GET']),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]),
+        Middleware(RequestTimer),
+    ],
+    exception_handlers={RequestError: bad_request},
+    lifespan=lifespan
+)
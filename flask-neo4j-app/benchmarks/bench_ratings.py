@@ -0,0 +1,128 @@
+# Latency and peak memory of the Elo/Massey/Colley ratings against PageRank on synthetic
+# seasons of growing size. Each team plays --games matches against random opponents, the
+# goals drawn from Poisson distributions around hidden team strengths.
+#
+# The PageRank column runs ranking.pagerank, the in-process mirror of gds.pageRank.stream
+# (same formulation, defaults and results), since a 10k-team season cannot be projected
+# without a database. --gds LEAGUE SEASON also times the GDS engine and the ratings on a
+# season of the configured Neo4j database.
+#
+#   python benchmarks/bench_ratings.py --teams 20 100 1000 10000 --games 38
+#   python benchmarks/bench_ratings.py --gds 1729 2008/2009
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import ratings
+from ranking import SeasonGraph, pagerank
+
+
+def synthetic_season(teams, games, seed=0):
+    rng = np.random.default_rng(seed)
+    count = teams * games // 2
+    # A ring of fixtures first keeps the season connected, then random pairings
+    home = np.concatenate([np.arange(teams), rng.integers(0, teams, max(count - teams, 0))])[:count]
+    away = np.concatenate([(np.arange(teams) + 1) % teams,
+                           (home[teams:] + rng.integers(1, teams, max(count - teams, 0))) % teams])[:count]
+    strength = rng.normal(1.3, 0.4, teams).clip(0.2)
+    home_goals = rng.poisson(strength[home] / strength[away] * 1.3)
+    away_goals = rng.poisson(strength[away] / strength[home] * 1.1)
+    # Beat edges point from the loser to the winner, from away to home on a draw
+    home_won = home_goals >= away_goals
+    return [
+        {"match_id": match_id, "source_id": int(a if won else h), "source_name": f"Team {a if won else h}",
+         "target_id": int(h if won else a), "target_name": f"Team {h if won else a}",
+         "winner_goals": int(max(hg, ag)), "loser_goals": int(min(hg, ag)), "weight": int(abs(hg - ag))}
+        for match_id, (h, a, hg, ag, won) in enumerate(zip(home, away, home_goals, away_goals, home_won))
+    ]
+
+
+# Best wall time of repeats runs and the peak traced allocation of one run
+def measure(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def cases(records):
+    matches = ratings.SeasonMatches.from_records(records)
+    graph = SeasonGraph.from_records(records)
+    yield "load", lambda: ratings.SeasonMatches.from_records(records)
+    yield "pagerank", lambda: pagerank(graph)
+    for method in ratings.METHODS:
+        yield method, lambda fn=ratings.RATINGS[method]: fn(matches)
+
+
+def report(label, results):
+    print(f"{label:<24}" + "".join(f"{seconds * 1000:>10.1f}ms{peak / 2**20:>8.1f}MB"
+                                   for seconds, peak in results))
+
+
+def header(columns):
+    print(f"{'':<24}" + "".join(f"{column:>22}" for column in columns))
+
+
+def bench_synthetic(args):
+    columns = ["load", "pagerank"] + ratings.METHODS
+    header(columns)
+    for teams in args.teams:
+        records = synthetic_season(teams, args.games, args.seed)
+        results = [measure(fn, args.repeats) for _, fn in cases(records)]
+        report(f"{teams} teams/{len(records)} games", results)
+
+
+def bench_gds(args):
+    import config
+    from db import connect
+    from projections import ProjectionManager
+    from ranking import GdsRankingEngine
+
+    league_id, season = int(args.gds[0]), args.gds[1]
+    conn = connect()
+    projections = ProjectionManager(conn, max_projections=config.MAX_PROJECTIONS)
+    try:
+        engine = GdsRankingEngine(conn, projections, weighted=config.RANKING_WEIGHTED)
+        records = conn.run("rating_edges", {"leagueID": league_id, "season": season})
+        matches = ratings.SeasonMatches.from_records(records)
+        columns = ["gds", "rating_edges"] + ratings.METHODS
+
+        # The first GDS call builds the projection; later calls stream from the catalog
+        results = [measure(lambda: engine.rank(league_id, season), args.repeats),
+                   measure(lambda: conn.run("rating_edges", {"leagueID": league_id, "season": season}),
+                           args.repeats)]
+        results += [measure(lambda fn=ratings.RATINGS[method]: fn(matches), args.repeats)
+                    for method in ratings.METHODS]
+        header(columns)
+        report(f"{league_id} {season}", results)
+    finally:
+        projections.drop_all()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the rating models against PageRank")
+    parser.add_argument("--teams", type=int, nargs="+", default=[20, 100, 1000, 10000])
+    parser.add_argument("--games", type=int, default=38, help="matches per team")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--gds", nargs=2, metavar=("LEAGUE", "SEASON"),
+                        help="time the GDS engine on a season of the configured database instead")
+    args = parser.parse_args()
+
+    if args.gds:
+        bench_gds(args)
+    else:
+        bench_synthetic(args)
@@ -0,0 +1,175 @@
+# Offline route benchmark. Serves app.py on the in-memory backend (DB_BACKEND=memory)
+# with a synthetic dataset and drives each route at a fixed concurrency, one scenario
+# after the other. Results can be saved as a baseline and compared with later runs.
+#
+#   python benchmarks/bench_routes.py --save benchmarks/baseline.json
+#   python benchmarks/bench_routes.py --baseline benchmarks/baseline.json
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from loadgen import run_load
+
+# Match ids used by the add_match/delete_match scenarios, above any generated id
+NEW_MATCH_ID = 10_000_000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark every route on the in-memory backend")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--scenarios", nargs="+", help="run only these scenarios")
+    parser.add_argument("--leagues", type=int, default=11)
+    parser.add_argument("--seasons", type=int, default=8)
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ranking-backend", choices=["gds", "local"], default="local")
+    parser.add_argument("--cache", action="store_true", help="keep the response cache on")
+    parser.add_argument("--save", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare with results saved by an earlier run")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent change in rps or p99 reported as a regression")
+    return parser.parse_args()
+
+
+# The app reads its configuration at import time
+def configure(args):
+    os.environ["DB_BACKEND"] = "memory"
+    os.environ["SYNTHETIC_LEAGUES"] = str(args.leagues)
+    os.environ["SYNTHETIC_SEASONS"] = str(args.seasons)
+    os.environ["SYNTHETIC_TEAMS"] = str(args.teams)
+    os.environ["SYNTHETIC_SEED"] = str(args.seed)
+    os.environ["RANKING_BACKEND"] = args.ranking_backend
+    os.environ["CACHE_ENABLED"] = "1" if args.cache else "0"
+
+
+def scenarios(graph):
+    league_id = next(iter(graph.leagues))
+    seasons = sorted({e["season"] for e in graph.league_edges(league_id)})
+    season = seasons[0]
+    team_ids = sorted({e["source_id"] for e in graph.season_edges(league_id, season)})
+    names = [graph.teams[team_id]["team_short_name"] for team_id in team_ids]
+    existing = [e for e in graph.season_edges(league_id, season) if e["winner"] != "tie"]
+
+    def update_match(sequence):
+        e = existing[sequence % len(existing)]
+        return "PUT", "/update_match", {
+            "matchID": e["match_id"], "winner": e["winner"], "loser": e["loser"],
+            "winner_goals": e["winner_goals"], "loser_goals": e["loser_goals"],
+            "leagueID": e["leagueID"], "season": e["season"],
+        }
+
+    def add_match(sequence):
+        return "PUT", "/add_match", {
+            "matchID": NEW_MATCH_ID + sequence, "winner": names[sequence % len(names)],
+            "loser": names[(sequence + 1) % len(names)], "winner_goals": 2, "loser_goals": 1,
+            "leagueID": league_id, "season": season,
+        }
+
+    # Removes the matches added by the add_match scenario, then deletes of unknown ids
+    def delete_match(sequence):
+        return "DELETE", f"/delete_match?matchID={NEW_MATCH_ID + sequence}", None
+
+    return {
+        "ranking": [f"/ranking?leagueID={league_id}&season={s}" for s in seasons],
+        "team_trend": [f"/team_trend?leagueID={league_id}&teamID={t}" for t in team_ids],
+        "head_to_head": [
+            f"/head_to_head?leagueID={league_id}&team1_id={team_ids[i]}&team2_id={team_ids[i - 1]}"
+            for i in range(len(team_ids))
+        ],
+        "matches": [f"/matches?leagueID={league_id}&season={s}" for s in seasons],
+        "update_match": [update_match],
+        "add_match": [add_match],
+        "delete_match": [delete_match],
+    }
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    print(f"{'scenario':<14}{'rps':>10}{'base':>10}{'change':>9}{'p99 ms':>10}{'base':>10}{'change':>9}")
+    for name, stats in results["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            print(f"{name:<14}{stats['rps']:>10.1f}{'-':>10}{'':>9}{stats['p99_ms']:>10.2f}{'-':>10}")
+            continue
+        rps_change = percent_change(stats["rps"], base["rps"])
+        p99_change = percent_change(stats["p99_ms"], base["p99_ms"])
+        flag = ""
+        if rps_change < -threshold or p99_change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<14}{stats['rps']:>10.1f}{base['rps']:>10.1f}{rps_change:>8.1f}%"
+              f"{stats['p99_ms']:>10.2f}{base['p99_ms']:>10.2f}{p99_change:>8.1f}%{flag}")
+    return regressions
+
+
+def percent_change(value, base):
+    return (value - base) / base * 100 if base else 0.0
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure(args)
+
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    import memory_db
+    from app import app
+
+    all_scenarios = scenarios(memory_db.shared_graph())
+    selected = args.scenarios or list(all_scenarios)
+    unknown = set(selected) - set(all_scenarios)
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    results = {
+        "settings": {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "leagues": args.leagues,
+            "seasons": args.seasons,
+            "teams": args.teams,
+            "seed": args.seed,
+            "ranking_backend": args.ranking_backend,
+            "cache": args.cache,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "scenarios": {},
+    }
+
+    print(f"{'scenario':<14}{'requests':>10}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    try:
+        for name in selected:
+            stats = run_load(base_url, all_scenarios[name], args.concurrency, duration=args.duration)
+            results["scenarios"][name] = stats
+            print(f"{name:<14}{stats['requests']:>10}{stats['rps']:>10.1f}{stats['p50_ms']:>10.2f}"
+                  f"{stats['p99_ms']:>10.2f}{stats['errors']:>8}")
+    finally:
+        server.shutdown()
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print()
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            sys.exit(f"Regressions over {args.threshold:.0f}%: {', '.join(regressions)}")
@@ -0,0 +1,40 @@
+# Compares the sync Flask deployment with the ASGI app at several client counts.
+# Start both servers first, e.g.
+#   gunicorn app:app -w 4 -b :8000
+#   gunicorn asgi_app:app -w 4 -k uvicorn.workers.UvicornWorker -b :8001
+# then run
+#   python benchmarks/compare_asgi.py --sync http://localhost:8000 --asgi http://localhost:8001
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from loadgen import run_load
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare sync and ASGI deployments")
+    parser.add_argument("--sync", default="http://localhost:8000")
+    parser.add_argument("--asgi", default="http://localhost:8001")
+    parser.add_argument("--league", type=int, default=1729)
+    parser.add_argument("--season", default="2008/2009")
+    parser.add_argument("--team", type=int, default=8455)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    paths = [
+        "/leagues",
+        f"/seasons?leagueID={args.league}",
+        f"/teams?leagueID={args.league}",
+        f"/matches?leagueID={args.league}&season={args.season}",
+        f"/team_trend?leagueID={args.league}&teamID={args.team}",
+        f"/ranking?leagueID={args.league}&season={args.season}",
+    ]
+
+    print(f"{'server':<8}{'clients':>8}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for concurrency in args.concurrency:
+        for name, url in (("sync", args.sync), ("asgi", args.asgi)):
+            stats = run_load(url, paths, concurrency, duration=args.duration)
+            print(f"{name:<8}{concurrency:>8}{stats['rps']:>10.1f}{stats['p50_ms']:>10.1f}"
+                  f"{stats['p99_ms']:>10.1f}{stats['errors']:>8}")
@@ -0,0 +1,79 @@
+# Closed-loop HTTP load generator: each client sends its next request as soon as the
+# previous one returns, for a fixed duration.
+import itertools
+import threading
+import time
+
+import numpy as np
+import requests
+
+
+def percentile(latencies, q):
+    return float(np.percentile(latencies, q)) if latencies else 0.0
+
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is unbounded
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+def histogram(latencies, buckets=BUCKETS_MS):
+    counts, _ = np.histogram(latencies, bins=[0] + buckets + [np.inf])
+    return [{"le_ms": bound, "count": int(count)} for bound, count in zip(buckets + ["inf"], counts)]
+
+
+def summarize(latencies, errors, elapsed):
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p90_ms": percentile(latencies, 90),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": max(latencies) if latencies else 0.0,
+        "histogram": histogram(latencies),
+    }
+
+
+# A GET path, or a callable taking a request sequence number (unique across clients)
+# and returning (method, path, json_body)
+def resolve(request, sequence):
+    if callable(request):
+        return request(sequence)
+    return "GET", request, None
+
+
+# paths is a list of requests (see resolve); clients pick them round-robin
+def run_load(base_url, paths, concurrency, duration=10.0, timeout=30.0):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    sequence = itertools.count()
+    deadline = time.perf_counter() + duration
+
+    def client(offset):
+        session = requests.Session()
+        local, failed, i = [], 0, offset
+        while time.perf_counter() < deadline:
+            method, path, body = resolve(paths[i % len(paths)], next(sequence))
+            i += 1
+            start = time.perf_counter()
+            try:
+                response = session.request(method, base_url + path, json=body, timeout=timeout)
+                if response.status_code >= 500:
+                    failed += 1
+                    continue
+            except requests.RequestException:
+                failed += 1
+                continue
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started)
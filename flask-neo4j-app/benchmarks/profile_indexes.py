@@ -0,0 +1,96 @@
+# Compares total db hits of the old toInteger() predicates with the index-backed queries.
+# Usage: python benchmarks/profile_indexes.py --league 1729 --season 2008/2009 --match 489042
+#
+# --match-nodes compares the indexed beat statements with their (:Match) node versions
+# instead, with DATA_MODEL=beat and after `python match_model.py migrate` (without
+# --drop-edges).
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import match_model
+import queries
+from db import connect
+
+CASES = {
+    "matches": (
+        """MATCH ()-[r:beat]-()
+        WHERE toInteger(r.leagueID) = $leagueID AND r.season = $season
+        RETURN DISTINCT toInteger(r.match_id) AS match_id""",
+        """MATCH ()-[r:beat]->()
+        WHERE r.leagueID = $leagueID AND r.season = $season
+        RETURN DISTINCT r.match_id AS match_id""",
+    ),
+    "match_stats": (
+        """MATCH (team1:Team)-[r:beat]-(team2:Team)
+        WHERE toInteger(r.match_id) = $matchID
+        RETURN r.winner AS winner LIMIT 1""",
+        """MATCH ()-[r:beat]->()
+        WHERE r.match_id = $matchID
+        RETURN r.winner AS winner LIMIT 1""",
+    ),
+    "teams": (
+        """MATCH (t:Team)-[:beat]->()
+        WHERE EXISTS { MATCH (t)-[r:beat]->() WHERE toInteger(r.leagueID) = $leagueID }
+        RETURN DISTINCT t.team_api_id AS id""",
+        """MATCH (t:Team)-[r:beat]->()
+        WHERE r.leagueID = $leagueID
+        RETURN DISTINCT t.team_api_id AS id""",
+    ),
+    "seasons": (
+        """MATCH ()-[r:beat]->()
+        WHERE toInteger(r.leagueID) = $leagueID
+        RETURN DISTINCT r.season AS season""",
+        """MATCH ()-[r:beat]->()
+        WHERE r.leagueID = $leagueID
+        RETURN DISTINCT r.season AS season""",
+    ),
+    "ranking_edges": (
+        """MATCH (team1:Team)-[r:beat]->(team2:Team)
+        WHERE r.season = $season AND toInteger(r.leagueID) = $leagueID
+        RETURN id(team1) AS source, id(team2) AS target""",
+        """MATCH (team1:Team)-[r:beat]->(team2:Team)
+        WHERE r.leagueID = $leagueID AND r.season = $season
+        RETURN id(team1) AS source, id(team2) AS target""",
+    ),
+}
+
+MATCH_NODE_CASES = {
+    name: (queries.get(name).text, match_model.TEXTS[name])
+    for name in ["matches", "match_stats", "teams", "seasons", "ranking_edges"]
+}
+
+
+def total_db_hits(plan):
+    return plan.get("dbHits", 0) + sum(total_db_hits(child) for child in plan.get("children", []))
+
+
+def profile(conn, query, parameters):
+    with conn.driver.session() as session:
+        summary = session.run("PROFILE " + query, parameters).consume()
+        return total_db_hits(summary.profile)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare db hits before and after the beat indexes")
+    parser.add_argument("--league", type=int, default=1729)
+    parser.add_argument("--season", default="2008/2009")
+    parser.add_argument("--match", type=int, default=489042)
+    parser.add_argument("--match-nodes", action="store_true")
+    args = parser.parse_args()
+    parameters = {"leagueID": args.league, "season": args.season, "matchID": args.match}
+
+    conn = connect()
+    try:
+        cases, labels = (MATCH_NODE_CASES, ("beat db hits", "node db hits")) if args.match_nodes \
+            else (CASES, ("legacy db hits", "indexed db hits"))
+        print(f"{'query':<15}{labels[0]:>16}{labels[1]:>17}{'reduction':>11}")
+        for name, (legacy, indexed) in cases.items():
+            before = profile(conn, legacy, parameters)
+            after = profile(conn, indexed, parameters)
+            reduction = before / after if after else float("inf")
+            print(f"{name:<15}{before:>16}{after:>17}{reduction:>10.1f}x")
+    finally:
+        conn.close()
@@ -0,0 +1,236 @@
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import request, make_response, Response
+
+# Version scopes: every match write bumps its season, its league and the global scope,
+# so a cached response only has to track the single scope it was computed from
+GLOBAL_SCOPE = "*"
+
+# ResponseCache.lookup result for a request whose If-None-Match holds the entry's ETag
+NOT_MODIFIED = object()
+
+# Entry stored in place of the body of a streamed response. The body is never buffered,
+# but while the marker is live a client holding the response's ETag gets a 304.
+STREAMED = {"streamed": True}
+
+
+def league_scope(league_id):
+    return f"league:{int(league_id)}"
+
+
+def season_scope(league_id, season):
+    return f"season:{int(league_id)}:{season}"
+
+
+# Size-bounded LRU store local to one worker process
+class MemoryBackend:
+    def __init__(self, max_entries=2048, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Shared store so every gunicorn worker sees the same entries and version counters.
+# Needs the optional redis package.
+class RedisBackend:
+    def __init__(self, url, ttl=None, prefix="soccer-cache:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.evictions = 0
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl or None)
+
+    def get_counter(self, key):
+        value = self.client.get(self.prefix + "counter:" + key)
+        return int(value) if value is not None else 0
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + "counter:" + key)
+
+    def __len__(self):
+        counters = (self.prefix + "counter:").encode()
+        return sum(1 for key in self.client.scan_iter(self.prefix + "*") if not key.startswith(counters))
+
+
+# Freshness of state a worker derives from a league/season outside the response cache
+# (ranking graphs, ratings, head-to-head matrices). An entry stamped before it was loaded
+# stays valid while the scope's version counter is unchanged and it is younger than ttl.
+# With the redis backend the counters are shared, so a write handled by any worker
+# invalidates every worker's copy; with per-worker counters the ttl bounds how long a
+# write handled by another worker goes unnoticed. Without a backend only the ttl applies.
+class ScopeVersions:
+    def __init__(self, backend=None, ttl=None):
+        self.backend = backend
+        self.ttl = ttl
+
+    def stamp(self, scope):
+        version = self.backend.get_counter(scope) if self.backend is not None else 0
+        return version, time.monotonic()
+
+    def fresh(self, scope, stamp):
+        version, created = stamp
+        if self.ttl and time.monotonic() - created > self.ttl:
+            return False
+        return self.backend is None or self.backend.get_counter(scope) == version
+
+
+def create_backend(name, max_entries=2048, ttl=None, redis_url=None):
+    if name == "memory":
+        return MemoryBackend(max_entries=max_entries, ttl=ttl)
+    if name == "redis":
+        return RedisBackend(redis_url, ttl=ttl)
+    raise ValueError(f"Unknown cache backend: {name}")
+
+
+# Caches whole JSON responses of read endpoints, keyed by endpoint, query parameters
+# and the version of the league/season scope the response depends on
+class ResponseCache:
+    def __init__(self, backend, enabled=True):
+        self.backend = backend
+        self.enabled = enabled
+        self._stats = {"hits": 0, "misses": 0, "not_modified": 0, "stores": 0, "bumps": 0}
+        self._lock = threading.Lock()
+
+    def version(self, scope):
+        return self.backend.get_counter(scope)
+
+    # Called after a match in the league/season was added, updated or deleted
+    def bump(self, league_id, season):
+        self.backend.incr(GLOBAL_SCOPE)
+        self.backend.incr(league_scope(league_id))
+        self.backend.incr(season_scope(league_id, season))
+        self._count("bumps")
+
+    # Cache key and ETag of a request; both change whenever the scope version is bumped.
+    # variant holds the values of the request headers the response varies by.
+    def key(self, endpoint, args, scope, variant=()):
+        try:
+            scope_key = scope(args)
+        except (KeyError, TypeError, ValueError):
+            scope_key = GLOBAL_SCOPE
+        params = sorted(args.items(multi=True))
+        if variant:
+            params.append(list(variant))
+        key = f"{endpoint}|{json.dumps(params)}|{scope_key}@{self.version(scope_key)}"
+        return key, hashlib.sha1(key.encode()).hexdigest()
+
+    # The cached body, NOT_MODIFIED when the client already has it (its ETag matched), or
+    # None. A matching ETag only counts while the entry is live: the version counters of
+    # the memory backend are per worker, and the entry's TTL is what bounds how long a
+    # client can be told its copy is still current. A streamed response's marker only
+    # answers conditional requests; other requests miss and stream again.
+    def lookup(self, key, etag_matched=False):
+        body = self.backend.get(key)
+        if body is None or (body == STREAMED and not etag_matched):
+            self._count("misses")
+            return None
+        if etag_matched:
+            self._count("not_modified")
+            return NOT_MODIFIED
+        self._count("hits")
+        return body
+
+    def store(self, key, body):
+        self.backend.set(key, body)
+        self._count("stores")
+
+    def store_streamed(self, key):
+        self.store(key, STREAMED)
+
+    # Flask view decorator; vary names the request headers the response depends on
+    def cached(self, endpoint, scope, vary=()):
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+
+                variant = [request.headers.get(name, "") for name in vary]
+                key, etag = self.key(endpoint, request.args, scope, variant)
+                body = self.lookup(key, etag in request.if_none_match)
+                if body is not None:
+                    if body is NOT_MODIFIED:
+                        response = Response(status=304)
+                    else:
+                        response = Response(body, mimetype="application/json")
+                    response.set_etag(etag)
+                    response.vary.update(vary)
+                    return response
+
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200:
+                    # The ETag comes from the scope version read before the view ran, so a
+                    # write landing while the response streams only costs a refetch
+                    if response.is_streamed:
+                        self.store_streamed(key)
+                    else:
+                        self.store(key, response.get_data(as_text=True))
+                    response.set_etag(etag)
+                    response.vary.update(vary)
+                return response
+            return wrapper
+        return decorator
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        served = stats["hits"] + stats["not_modified"]
+        requests = served + stats["misses"]
+        stats["hit_ratio"] = served / requests if requests else 0.0
+        stats["entries"] = len(self.backend)
+        stats["evictions"] = self.backend.evictions
+        stats["enabled"] = self.enabled
+        return stats
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
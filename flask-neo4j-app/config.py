@@ -0,0 +1,136 @@
+import os
+import tempfile
+
+# Neo4j Aura. For a local database use NEO4J_URI=bolt://localhost:7687
+NEO4J_URI = os.environ.get("NEO4J_URI", "neo4j+s://2f4d6707.databases.neo4j.io")
+NEO4J_USER = os.environ.get("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.environ.get("NEO4J_PASSWORD", "ozkwISVE3JulnPCIvq23n0H1Bu5KEMgXQIpLXxONq3g")
+
+# Storage backend: "neo4j" talks to NEO4J_URI, "memory" answers the registry statements
+# in-process over a synthetic dataset (memory_db.py), for offline runs and benchmarks
+DB_BACKEND = os.environ.get("DB_BACKEND", "neo4j")
+
+# Size and seed of the synthetic dataset served by DB_BACKEND=memory (synthetic.py)
+SYNTHETIC_LEAGUES = int(os.environ.get("SYNTHETIC_LEAGUES", "11"))
+SYNTHETIC_SEASONS = int(os.environ.get("SYNTHETIC_SEASONS", "8"))
+SYNTHETIC_TEAMS = int(os.environ.get("SYNTHETIC_TEAMS", "20"))
+SYNTHETIC_SEED = int(os.environ.get("SYNTHETIC_SEED", "0"))
+
+# Driver connection pool. Each gunicorn worker keeps its own pool; idle connections older
+# than the liveness timeout are pinged before reuse. Times are in seconds.
+NEO4J_MAX_POOL_SIZE = int(os.environ.get("NEO4J_MAX_POOL_SIZE", "20"))
+NEO4J_ACQUISITION_TIMEOUT = float(os.environ.get("NEO4J_ACQUISITION_TIMEOUT", "10"))
+NEO4J_LIVENESS_CHECK_TIMEOUT = float(os.environ.get("NEO4J_LIVENESS_CHECK_TIMEOUT", "30"))
+NEO4J_MAX_CONNECTION_LIFETIME = float(os.environ.get("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))
+NEO4J_MAX_RETRY_TIME = float(os.environ.get("NEO4J_MAX_RETRY_TIME", "15"))
+
+# Ranking backend: "gds" runs PageRank inside the Neo4j GDS plugin,
+# "local" loads the season's beat edges once and runs PageRank in-process with NumPy
+RANKING_BACKEND = os.environ.get("RANKING_BACKEND", "gds")
+
+# Use r.weight (absolute goal difference) as the PageRank relationship weight.
+# Off by default to match the unweighted gds.pageRank.stream call.
+RANKING_WEIGHTED = os.environ.get("RANKING_WEIGHTED", "0") == "1"
+
+# Local backend only: keep each season's converged PageRank scores and warm-start the
+# next solve from them after a match change. Solves then iterate to convergence instead
+# of stopping after the 20 iterations gds.pageRank.stream runs; a warm start that has not
+# converged within RANKING_WARM_START_ITERATIONS falls back to a full solve.
+RANKING_INCREMENTAL = os.environ.get("RANKING_INCREMENTAL", "0") == "1"
+RANKING_WARM_START_ITERATIONS = int(os.environ.get("RANKING_WARM_START_ITERATIONS", "20"))
+
+# Serve /ranking from the RankingResult rows written by ranking_batch.py when present. Off
+# by default: each ranking cache miss would otherwise first look for stored rows, and
+# each match write clear them.
+RANKING_PRECOMPUTED = os.environ.get("RANKING_PRECOMPUTED", "0") == "1"
+
+# Parallel league/season computations of a batch ranking run
+RANKING_BATCH_WORKERS = int(os.environ.get("RANKING_BATCH_WORKERS", "4"))
+
+# GDS catalog bounds for the projections created by /ranking. Least recently used
+# projections are dropped once either limit is exceeded (0 disables the memory cap).
+MAX_PROJECTIONS = int(os.environ.get("MAX_PROJECTIONS", "8"))
+MAX_PROJECTION_MEMORY_MB = int(os.environ.get("MAX_PROJECTION_MEMORY_MB", "0"))
+
+# Rebuild a season's projection right after one of its matches changes instead of
+# dropping it and waiting for the next /ranking request
+PROJECTION_REBUILD_ON_WRITE = os.environ.get("PROJECTION_REBUILD_ON_WRITE", "0") == "1"
+
+# Response cache for the read endpoints. "memory" keeps a size-bounded LRU per worker;
+# "redis" shares entries and version counters between workers (needs the redis package).
+# The TTL bounds staleness when several workers each keep their own memory cache: a 304
+# is only sent for an ETag whose entry is still cached. The rankings, ratings and
+# head-to-head matrices each worker keeps in memory follow the same version counters and TTL.
+CACHE_ENABLED = os.environ.get("CACHE_ENABLED", "1") == "1"
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "2048"))
+CACHE_TTL_SECONDS = int(os.environ.get("CACHE_TTL_SECONDS", "300"))
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+# Worker warm-up (warmup.py): "blocking" runs it in gunicorn's post_worker_init hook before
+# the worker accepts requests, "background" runs it in a thread while /ready answers 503.
+# WARMUP_RANKINGS is the number of most requested seasons to rank during warm-up; request
+# counts are kept in WARMUP_STATS_FILE.
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "1") == "1"
+WARMUP_MODE = os.environ.get("WARMUP_MODE", "blocking")
+# Set by gunicorn.conf.py. Without its hook (python app.py, the benchmarks) app.py runs the
+# warm-up itself once imported, so /ready does not stay at 503.
+WARMUP_HOOK = os.environ.get("WARMUP_HOOK") == "1"
+WARMUP_RANKINGS = int(os.environ.get("WARMUP_RANKINGS", "0"))
+WARMUP_STATS_FILE = os.environ.get("WARMUP_STATS_FILE",
+                                   os.path.join(tempfile.gettempdir(), "neo4j_app_hot_seasons.json"))
+
+# Request coalescing (singleflight.py): identical concurrent /ranking and /team_trend
+# computations run once per worker, and once across the workers sharing
+# SINGLE_FLIGHT_LOCK_DIR (empty coordinates within each worker only)
+SINGLE_FLIGHT_ENABLED = os.environ.get("SINGLE_FLIGHT_ENABLED", "1") == "1"
+SINGLE_FLIGHT_LOCK_DIR = os.environ.get("SINGLE_FLIGHT_LOCK_DIR",
+                                        os.path.join(tempfile.gettempdir(), "neo4j_app_flights"))
+
+# Write-behind queue for ?async=1 match mutations (write_queue.py): journal directory,
+# how long a flush waits for more edits to coalesce, the matches per transaction, and how
+# many times a match is written on its own before its jobs are marked failed
+WRITE_QUEUE_ENABLED = os.environ.get("WRITE_QUEUE_ENABLED", "0") == "1"
+WRITE_QUEUE_DIR = os.environ.get("WRITE_QUEUE_DIR", os.path.join(tempfile.gettempdir(), "neo4j_app_write_queue"))
+WRITE_QUEUE_FLUSH_DELAY = float(os.environ.get("WRITE_QUEUE_FLUSH_DELAY", "0.2"))
+WRITE_QUEUE_BATCH_SIZE = int(os.environ.get("WRITE_QUEUE_BATCH_SIZE", "500"))
+WRITE_QUEUE_MAX_ATTEMPTS = int(os.environ.get("WRITE_QUEUE_MAX_ATTEMPTS", "5"))
+
+# Directory of the memory-mapped reference-data snapshot (reference.py) serving /leagues,
+# /seasons and /teams; empty disables it. Match writes re-export it after
+# REFERENCE_REBUILD_DELAY seconds, batching writes that arrive meanwhile.
+REFERENCE_SNAPSHOT = os.environ.get("REFERENCE_SNAPSHOT", "")
+REFERENCE_REBUILD_DELAY = float(os.environ.get("REFERENCE_REBUILD_DELAY", "1"))
+
+# Directory of the partitioned Parquet export (python analytics.py export DIR); when set,
+# /team_trend, /head_to_head and /ranking are computed from those files instead of Neo4j
+ANALYTICS_PARQUET = os.environ.get("ANALYTICS_PARQUET", "")
+
+# "beat" stores each match as the properties of a (loser)-[:beat]->(winner) edge;
+# "match_nodes" as a (:Match) node unique on match_id (match_model.py, which migrates)
+DATA_MODEL = os.environ.get("DATA_MODEL", "beat")
+
+# Threads per worker running the sub-queries of the /views/* endpoints concurrently
+VIEW_WORKERS = int(os.environ.get("VIEW_WORKERS", "4"))
+
+# Startup check of the schema.py migration: "warn" logs untyped beat relationships and
+# missing indexes, "create" normalizes and creates them, "fail" refuses to start, "off" skips
+SCHEMA_CHECK = os.environ.get("SCHEMA_CHECK", "warn")
+
+# Record planning vs execution time for every registered statement (served on /debug/queries).
+# Costs an extra EXPLAIN round trip per query, so keep it off in production.
+QUERY_DEBUG = os.environ.get("QUERY_DEBUG", "0") == "1"
+
+# Log the PROFILE plan of read statements slower than this many milliseconds (0 disables),
+# at most once per statement every SLOW_QUERY_SAMPLE_INTERVAL seconds. Profiling re-runs
+# the statement in the background.
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "0"))
+SLOW_QUERY_SAMPLE_INTERVAL = float(os.environ.get("SLOW_QUERY_SAMPLE_INTERVAL", "60"))
+
+# Records the driver fetches per round trip when a response is streamed, and the largest
+# page /matches?limit= serves
+STREAM_FETCH_SIZE = int(os.environ.get("STREAM_FETCH_SIZE", "1000"))
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", "5000"))
+
+# Rows written per UNWIND transaction by /matches/bulk and ingest.py
+BULK_CHUNK_SIZE = int(os.environ.get("BULK_CHUNK_SIZE", "500"))
@@ -0,0 +1,316 @@
+import threading
+import time
+
+from neo4j import READ_ACCESS, AsyncGraphDatabase, GraphDatabase
+
+import config
+import metrics
+import queries
+
+
+# Counters for the driver's connection pool as seen by this process
+class PoolMetrics:
+    def __init__(self):
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.acquisitions = 0
+        self.acquisition_wait_ms = 0.0
+        self.max_acquisition_wait_ms = 0.0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def acquired(self, wait_ms):
+        with self._lock:
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.acquisitions += 1
+            self.acquisition_wait_ms += wait_ms
+            self.max_acquisition_wait_ms = max(self.max_acquisition_wait_ms, wait_ms)
+
+    def released(self):
+        with self._lock:
+            self.in_use -= 1
+
+    def retried(self):
+        with self._lock:
+            self.retries += 1
+
+
+# Connect to Neo4j
+class Neo4jConnection:
+    def __init__(self, uri, user, password, debug=False, max_pool_size=100,
+                 acquisition_timeout=60.0, liveness_check_timeout=None,
+                 max_connection_lifetime=3600, max_retry_time=30.0, slow_query_ms=0,
+                 slow_query_interval=60.0):
+        self.driver = GraphDatabase.driver(
+            uri,
+            auth=(user, password),
+            max_connection_pool_size=max_pool_size,
+            connection_acquisition_timeout=acquisition_timeout,
+            liveness_check_timeout=liveness_check_timeout,
+            max_connection_lifetime=max_connection_lifetime,
+            max_transaction_retry_time=max_retry_time
+        )
+        self.debug = debug
+        self.max_pool_size = max_pool_size
+        self.metrics = PoolMetrics()
+        self.sampler = (metrics.SlowQuerySampler(self._profile, slow_query_ms, slow_query_interval)
+                        if slow_query_ms else None)
+
+    def close(self):
+        self.driver.close()
+
+    def verify_connectivity(self):
+        self.driver.verify_connectivity()
+
+    # Plan a registry statement without running it, so its plan is cached server-side
+    def explain(self, name):
+        statement = queries.get(name)
+        with self.driver.session() as session:
+            session.run("EXPLAIN " + statement.text, statement.sample_parameters()).consume()
+
+    # Raw auto-commit query, for admin statements that manage their own
+    # transactions (CALL ... IN TRANSACTIONS, schema changes)
+    def query(self, query, parameters=None):
+        with self.driver.session() as session:
+            return session.run(query, parameters).data()
+
+    # Run a statement from the query registry by name in a managed read or write
+    # transaction; the driver retries transient errors
+    def run(self, name, parameters=None):
+        return self.run_many([(name, parameters)])[0]
+
+    # Run several registry statements in one transaction. The transaction is a write
+    # transaction if any statement writes.
+    def run_many(self, statements):
+        bound = []
+        for name, parameters in statements:
+            statement = queries.get(name)
+            bound.append((statement, statement.bind(parameters)))
+
+        write = any(statement.write for statement, _ in bound)
+        requested = time.perf_counter()
+        attempts = []
+
+        def work(tx):
+            if attempts:
+                self.metrics.retried()
+            else:
+                self.metrics.acquired((time.perf_counter() - requested) * 1000)
+            attempts.append(1)
+            return [self._execute(tx, statement, params) for statement, params in bound]
+
+        try:
+            with self.driver.session() as session:
+                if write:
+                    return session.execute_write(work)
+                return session.execute_read(work)
+        finally:
+            if attempts:
+                self.metrics.released()
+
+    # Yield the records of a read statement as the driver fetches them, fetch_size at a
+    # time. The session stays open until the generator is exhausted or closed; unlike
+    # run(), a failure after the first record is not retried.
+    def stream(self, name, parameters=None, fetch_size=1000):
+        statement = queries.get(name)
+        if statement.write:
+            raise ValueError(f"{name}: only read statements can be streamed")
+        params = statement.bind(parameters)
+
+        requested = time.perf_counter()
+        with self.driver.session(default_access_mode=READ_ACCESS, fetch_size=fetch_size) as session:
+            with session.begin_transaction() as tx:
+                self.metrics.acquired((time.perf_counter() - requested) * 1000)
+                try:
+                    start = time.perf_counter()
+                    result = tx.run(statement.text, params)
+                    for record in result:
+                        yield record.data()
+                    metrics.record_statement(name, time.perf_counter() - start, result.consume())
+                finally:
+                    self.metrics.released()
+
+    def _execute(self, tx, statement, params):
+        planning = tx.run("EXPLAIN " + statement.text, params).consume() if self.debug else None
+
+        start = time.perf_counter()
+        try:
+            result = tx.run(statement.text, params)
+            records = result.data()
+            summary = result.consume()
+        except Exception:
+            metrics.STATEMENT_ERRORS.inc(statement=statement.name)
+            raise
+        elapsed = time.perf_counter() - start
+
+        metrics.record_statement(statement.name, elapsed, summary)
+        if self.sampler:
+            self.sampler.offer(statement, params, elapsed * 1000)
+        if planning is not None:
+            queries.statement_stats.record(
+                statement.name,
+                planning.result_available_after or 0,
+                (summary.result_available_after or 0) + (summary.result_consumed_after or 0)
+            )
+        return records
+
+    # PROFILE run of a read statement for the slow query sampler
+    def _profile(self, statement, params):
+        with self.driver.session() as session:
+            return session.execute_read(lambda tx: tx.run("PROFILE " + statement.text, params).consume())
+
+    def pool_stats(self):
+        return pool_stats(self.driver, self.max_pool_size, self.metrics)
+
+
+def pool_stats(driver, max_pool_size, pool_metrics):
+    stats = {
+        "max_pool_size": max_pool_size,
+        "in_use": pool_metrics.in_use,
+        "peak_in_use": pool_metrics.peak_in_use,
+        "acquisitions": pool_metrics.acquisitions,
+        "retries": pool_metrics.retries,
+        "avg_acquisition_wait_ms": (pool_metrics.acquisition_wait_ms / pool_metrics.acquisitions
+                                    if pool_metrics.acquisitions else 0.0),
+        "max_acquisition_wait_ms": pool_metrics.max_acquisition_wait_ms,
+    }
+
+    # Open and idle connections from the driver's pool, when it exposes them
+    pool = getattr(driver, "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is not None:
+        open_connections = [c for address in list(connections) for c in list(connections[address])]
+        stats["open"] = len(open_connections)
+        stats["idle"] = sum(1 for c in open_connections if not getattr(c, "in_use", False))
+    return stats
+
+
+# asyncio counterpart of Neo4jConnection for the ASGI app
+class AsyncNeo4jConnection:
+    def __init__(self, uri, user, password, debug=False, max_pool_size=100, acquisition_timeout=60.0,
+                 liveness_check_timeout=None, max_connection_lifetime=3600, max_retry_time=30.0):
+        self.driver = AsyncGraphDatabase.driver(
+            uri,
+            auth=(user, password),
+            max_connection_pool_size=max_pool_size,
+            connection_acquisition_timeout=acquisition_timeout,
+            liveness_check_timeout=liveness_check_timeout,
+            max_connection_lifetime=max_connection_lifetime,
+            max_transaction_retry_time=max_retry_time
+        )
+        self.debug = debug
+        self.max_pool_size = max_pool_size
+        self.metrics = PoolMetrics()
+
+    async def close(self):
+        await self.driver.close()
+
+    async def run(self, name, parameters=None):
+        return (await self.run_many([(name, parameters)]))[0]
+
+    async def run_many(self, statements):
+        bound = []
+        for name, parameters in statements:
+            statement = queries.get(name)
+            bound.append((statement, statement.bind(parameters)))
+
+        requested = time.perf_counter()
+        attempts = []
+
+        async def work(tx):
+            if attempts:
+                self.metrics.retried()
+            else:
+                self.metrics.acquired((time.perf_counter() - requested) * 1000)
+            attempts.append(1)
+            results = []
+            for statement, params in bound:
+                planning = None
+                if self.debug:
+                    planning = await (await tx.run("EXPLAIN " + statement.text, params)).consume()
+                start = time.perf_counter()
+                try:
+                    result = await tx.run(statement.text, params)
+                    results.append(await result.data())
+                    summary = await result.consume()
+                except Exception:
+                    metrics.STATEMENT_ERRORS.inc(statement=statement.name)
+                    raise
+                metrics.record_statement(statement.name, time.perf_counter() - start, summary)
+                if planning is not None:
+                    queries.statement_stats.record(
+                        statement.name,
+                        planning.result_available_after or 0,
+                        (summary.result_available_after or 0) + (summary.result_consumed_after or 0)
+                    )
+            return results
+
+        try:
+            async with self.driver.session() as session:
+                if any(statement.write for statement, _ in bound):
+                    return await session.execute_write(work)
+                return await session.execute_read(work)
+        finally:
+            if attempts:
+                self.metrics.released()
+
+    async def stream(self, name, parameters=None, fetch_size=1000):
+        statement = queries.get(name)
+        if statement.write:
+            raise ValueError(f"{name}: only read statements can be streamed")
+        params = statement.bind(parameters)
+
+        requested = time.perf_counter()
+        async with self.driver.session(default_access_mode=READ_ACCESS, fetch_size=fetch_size) as session:
+            async with await session.begin_transaction() as tx:
+                self.metrics.acquired((time.perf_counter() - requested) * 1000)
+                try:
+                    start = time.perf_counter()
+                    result = await tx.run(statement.text, params)
+                    async for record in result:
+                        yield record.data()
+                    metrics.record_statement(name, time.perf_counter() - start, await result.consume())
+                finally:
+                    self.metrics.released()
+
+    def pool_stats(self):
+        return pool_stats(self.driver, self.max_pool_size, self.metrics)
+
+
+def connect():
+    if config.DB_BACKEND == "memory":
+        from memory_db import MemoryConnection, shared_graph
+        return MemoryConnection(shared_graph(), debug=config.QUERY_DEBUG)
+
+    return Neo4jConnection(
+        uri=config.NEO4J_URI,
+        user=config.NEO4J_USER,
+        password=config.NEO4J_PASSWORD,
+        debug=config.QUERY_DEBUG,
+        max_pool_size=config.NEO4J_MAX_POOL_SIZE,
+        acquisition_timeout=config.NEO4J_ACQUISITION_TIMEOUT,
+        liveness_check_timeout=config.NEO4J_LIVENESS_CHECK_TIMEOUT,
+        max_connection_lifetime=config.NEO4J_MAX_CONNECTION_LIFETIME,
+        max_retry_time=config.NEO4J_MAX_RETRY_TIME,
+        slow_query_ms=config.SLOW_QUERY_MS,
+        slow_query_interval=config.SLOW_QUERY_SAMPLE_INTERVAL
+    )
+
+
+def connect_async():
+    if config.DB_BACKEND == "memory":
+        from memory_db import AsyncMemoryConnection, shared_graph
+        return AsyncMemoryConnection(shared_graph(), debug=config.QUERY_DEBUG)
+
+    return AsyncNeo4jConnection(
+        uri=config.NEO4J_URI,
+        user=config.NEO4J_USER,
+        password=config.NEO4J_PASSWORD,
+        debug=config.QUERY_DEBUG,
+        max_pool_size=config.NEO4J_MAX_POOL_SIZE,
+        acquisition_timeout=config.NEO4J_ACQUISITION_TIMEOUT,
+        liveness_check_timeout=config.NEO4J_LIVENESS_CHECK_TIMEOUT,
+        max_connection_lifetime=config.NEO4J_MAX_CONNECTION_LIFETIME,
+        max_retry_time=config.NEO4J_MAX_RETRY_TIME
+    )
@@ -0,0 +1,21 @@
+# gunicorn settings for app.py (see Procfile). Bind address and worker count come from
+# $PORT and $WEB_CONCURRENCY as usual.
+import os
+import sys
+
+# Tells app.py that post_worker_init runs the blocking warm-up
+os.environ["WARMUP_HOOK"] = "1"
+
+import config
+
+
+# Runs in each worker after app.py is imported and before it accepts connections.
+# asgi_app.py warms up in its lifespan handler instead.
+def post_worker_init(worker):
+    if "app" not in sys.modules:
+        return
+    if config.WARMUP_ENABLED and config.WARMUP_MODE == "blocking":
+        from app import warmup
+        warmup.run()
+        worker.log.info("Warm-up %s: %s", warmup.status()["state"],
+                        {name: step["state"] for name, step in warmup.status()["steps"].items()})
@@ -0,0 +1,162 @@
+import io
+import threading
+
+import numpy as np
+
+from cache import ScopeVersions, league_scope, season_scope
+
+
+# Head-to-head results of every pair of teams in a league (optionally one season),
+# built from the league's beat edges in one pass. Row i / column j are indexed by the
+# position of the team in team_ids:
+#   wins[i, j]            matches team i won against team j
+#   ties[i, j]            tied matches between i and j
+#   goal_difference[i, j] goals of i minus goals of j over their matches
+#   matches[i, j]         matches between i and j
+class HeadToHeadMatrix:
+    def __init__(self, team_ids, team_names, wins, ties, goal_difference, matches):
+        self.team_ids = np.asarray(team_ids, dtype=np.int64)
+        self.team_names = list(team_names)
+        self.index = {int(team_id): i for i, team_id in enumerate(self.team_ids)}
+        self.wins = wins
+        self.ties = ties
+        self.goal_difference = goal_difference
+        self.matches = matches
+
+    @classmethod
+    def from_records(cls, records):
+        index, names = {}, []
+        for record in records:
+            for team_id, name in ((record["source_id"], record["source_name"]),
+                                  (record["target_id"], record["target_name"])):
+                if team_id not in index:
+                    index[team_id] = len(names)
+                    names.append(name)
+
+        n = len(names)
+        source = np.array([index[r["source_id"]] for r in records], dtype=np.int64)
+        target = np.array([index[r["target_id"]] for r in records], dtype=np.int64)
+        winner = np.array([r["winner"] for r in records], dtype=object)
+        winner_goals = np.array([r["winner_goals"] or 0 for r in records], dtype=np.int64)
+        loser_goals = np.array([r["loser_goals"] or 0 for r in records], dtype=np.int64)
+        name_array = np.array(names, dtype=object)
+
+        # Same string comparisons as the original Cypher: a win counts for the endpoint
+        # whose short name equals r.winner, a tie is r.winner = "tie"
+        source_won = (winner == name_array[source]).astype(bool)
+        target_won = (winner == name_array[target]).astype(bool) & ~source_won
+        tied = (winner == "tie").astype(bool)
+
+        wins = np.zeros((n, n), dtype=np.int32)
+        np.add.at(wins, (source[source_won], target[source_won]), 1)
+        np.add.at(wins, (target[target_won], source[target_won]), 1)
+
+        ties = np.zeros((n, n), dtype=np.int32)
+        np.add.at(ties, (source[tied], target[tied]), 1)
+        np.add.at(ties, (target[tied], source[tied]), 1)
+
+        matches = np.zeros((n, n), dtype=np.int32)
+        np.add.at(matches, (source, target), 1)
+        np.add.at(matches, (target, source), 1)
+
+        margin = winner_goals - loser_goals
+        source_margin = np.where(source_won, margin, np.where(target_won, -margin, 0))
+        goal_difference = np.zeros((n, n), dtype=np.int32)
+        np.add.at(goal_difference, (source, target), source_margin)
+        np.add.at(goal_difference, (target, source), -source_margin)
+
+        return cls(list(index), names, wins, ties, goal_difference, matches)
+
+    # Same shape as the original /head_to_head response ({} when the teams never met)
+    def pair(self, team1_id, team2_id):
+        i, j = self.index.get(team1_id), self.index.get(team2_id)
+        if i is None or j is None or self.matches[i, j] == 0:
+            return {}
+        return {
+            "team1": self.team_names[i],
+            "team2": self.team_names[j],
+            "team1_wins": int(self.wins[i, j]),
+            "team2_wins": int(self.wins[j, i]),
+            "ties": int(self.ties[i, j]),
+        }
+
+    def to_json(self):
+        return {
+            "teams": [
+                {"id": int(team_id), "team_short_name": name}
+                for team_id, name in zip(self.team_ids, self.team_names)
+            ],
+            "wins": self.wins.tolist(),
+            "ties": self.ties.tolist(),
+            "goal_difference": self.goal_difference.tolist(),
+            "matches": self.matches.tolist(),
+        }
+
+    # Arrow IPC stream: one row per team, each matrix row as a fixed-size list column
+    def to_arrow(self):
+        import pyarrow as pa
+
+        n = len(self.team_names)
+
+        def rows(matrix):
+            return pa.FixedSizeListArray.from_arrays(pa.array(matrix.ravel(), type=pa.int32()), n)
+
+        table = pa.table({
+            "team_api_id": pa.array(self.team_ids, type=pa.int64()),
+            "team_short_name": pa.array(self.team_names, type=pa.string()),
+            "wins": rows(self.wins),
+            "ties": rows(self.ties),
+            "goal_difference": rows(self.goal_difference),
+            "matches": rows(self.matches),
+        })
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
+
+
+# Matrices per (leagueID, season); season None is the whole league. A matrix is kept
+# until invalidated or the version of its league or season changes (versions, a
+# cache.ScopeVersions); stamp() is taken before the edges are read.
+class MatrixCache:
+    def __init__(self, versions=None):
+        self.versions = versions or ScopeVersions()
+        self._matrices = {}
+        self._lock = threading.Lock()
+
+    def get(self, league_id, season=None):
+        with self._lock:
+            entry = self._matrices.get((int(league_id), season))
+        if entry is None or not self.versions.fresh(matrix_scope(league_id, season), entry[0]):
+            return None
+        return entry[1]
+
+    def stamp(self, league_id, season=None):
+        return self.versions.stamp(matrix_scope(league_id, season))
+
+    def put(self, league_id, season, matrix, stamp):
+        with self._lock:
+            self._matrices[(int(league_id), season)] = (stamp, matrix)
+
+    def load(self, conn, league_id, season=None):
+        matrix = self.get(league_id, season)
+        if matrix is None:
+            stamp = self.stamp(league_id, season)
+            matrix = HeadToHeadMatrix.from_records(conn.run(*edge_statement(league_id, season)))
+            self.put(league_id, season, matrix, stamp)
+        return matrix
+
+    def invalidate(self, league_id, season):
+        with self._lock:
+            self._matrices.pop((int(league_id), season), None)
+            self._matrices.pop((int(league_id), None), None)
+
+
+def matrix_scope(league_id, season=None):
+    return league_scope(league_id) if season is None else season_scope(league_id, season)
+
+
+def edge_statement(league_id, season=None):
+    if season is None:
+        return "league_edges", {"leagueID": league_id}
+    return "league_season_edges", {"leagueID": league_id, "season": season}
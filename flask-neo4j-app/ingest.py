@@ -0,0 +1,177 @@
+# Bulk match loader shared by the /matches/bulk endpoint and the command line.
+# Rows are read lazily from the input stream, validated one by one and written in
+# UNWIND chunks, one transaction per chunk.
+#
+#   python ingest.py season.csv --chunk-size 500
+import argparse
+import csv
+import io
+import json
+import time
+
+import mutations
+from queries import coerce
+
+FIELDS = ["matchID", "winner", "loser", "winner_goals", "loser_goals", "leagueID", "season"]
+
+# Per-row errors kept in the report; the counts always cover every row
+MAX_REPORTED_ERRORS = 100
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_jsonl(stream):
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, RowError(f"invalid JSON: {e.msg}")
+
+
+def read_csv(stream):
+    # Line 1 is the header
+    for line_no, row in enumerate(csv.DictReader(stream), start=2):
+        yield line_no, row
+
+
+def read_rows(stream, fmt):
+    if fmt == "csv":
+        return read_csv(stream)
+    if fmt == "jsonl":
+        return read_jsonl(stream)
+    raise ValueError(f"Unknown format: {fmt}")
+
+
+# Same fields and types as /add_match
+def to_match(line_no, row):
+    if not isinstance(row, dict):
+        raise RowError("row must be an object")
+    missing = [field for field in FIELDS if row.get(field) in (None, "")]
+    if missing:
+        raise RowError(f"missing fields: {', '.join(missing)}")
+    try:
+        return {
+            "line": line_no,
+            "matchID": coerce(int, row["matchID"]),
+            "winner": str(row["winner"]),
+            "loser": str(row["loser"]),
+            "winnerGoals": coerce(int, row["winner_goals"]),
+            "loserGoals": coerce(int, row["loser_goals"]),
+            "leagueID": coerce(int, row["leagueID"]),
+            "season": str(row["season"]),
+        }
+    except (TypeError, ValueError):
+        raise RowError("matchID, winner_goals, loser_goals and leagueID must be whole numbers")
+
+
+class IngestReport:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.failed = 0
+        self.chunks = 0
+        self.errors = []
+        self.scopes = set()
+        self.started = time.perf_counter()
+
+    def error(self, line_no, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": message})
+
+    def to_dict(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "errors": self.errors,
+            "seconds": elapsed,
+            "rows_per_second": self.inserted / elapsed if elapsed else 0.0,
+        }
+
+
+def write_chunk(conn, chunk, report):
+    report.chunks += 1
+    try:
+        errors = mutations.match_errors(chunk, conn.run_many(mutations.check_statements(chunk)))
+        rejected = {id(match) for match, _, _ in errors}
+        for match, message, _ in errors:
+            report.error(match["line"], message)
+        chunk = [match for match in chunk if id(match) not in rejected]
+        created = conn.run_many(mutations.bulk_add_statements(chunk))[0] if chunk else []
+    except Exception as e:
+        for match in chunk:
+            report.error(match["line"], str(e))
+        return
+
+    # Rows whose winner or loser short name matched no team create nothing
+    written = {record["line"] for record in created}
+    for match in chunk:
+        if match["line"] in written:
+            report.inserted += 1
+            report.scopes.add((match["leagueID"], match["season"]))
+        else:
+            report.error(match["line"], "unknown winner or loser team")
+
+
+def ingest(conn, stream, fmt, chunk_size=500):
+    report = IngestReport()
+    chunk = []
+    for line_no, row in read_rows(stream, fmt):
+        report.rows += 1
+        try:
+            if isinstance(row, RowError):
+                raise row
+            chunk.append(to_match(line_no, row))
+        except RowError as e:
+            report.error(line_no, str(e))
+            continue
+
+        if len(chunk) >= chunk_size:
+            write_chunk(conn, chunk, report)
+            chunk = []
+
+    if chunk:
+        write_chunk(conn, chunk, report)
+    return report
+
+
+def format_for(filename=None, content_type=None):
+    if content_type:
+        if "csv" in content_type:
+            return "csv"
+        if "ndjson" in content_type or "jsonl" in content_type or "json" in content_type:
+            return "jsonl"
+    if filename and filename.endswith(".csv"):
+        return "csv"
+    return "jsonl"
+
+
+def text_stream(binary):
+    return io.TextIOWrapper(binary, encoding="utf-8", newline="")
+
+
+if __name__ == "__main__":
+    from db import connect
+
+    parser = argparse.ArgumentParser(description="Bulk load matches from CSV or JSON Lines")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"])
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        with open(args.path, encoding="utf-8", newline="") as stream:
+            report = ingest(conn, stream, args.format or format_for(filename=args.path),
+                            chunk_size=args.chunk_size)
+        print(json.dumps(report.to_dict(), indent=2))
+    finally:
+        conn.close()
@@ -0,0 +1,289 @@
+# DATA_MODEL=match_nodes: every match is a (:Match) node, unique on match_id, instead of
+# the properties of a beat relationship. Point lookups and edits by match id then seek the
+# uniqueness constraint's index instead of a relationship index, and each match is one
+# node rather than an edge matched from both ends.
+#
+#   (m:Match {match_id, leagueID, season, winner, loser, winner_goals, loser_goals,
+#             scoreDifferential, weight})
+#   (m)-[:LOSER]->(:Team)    source of the old beat edge: the loser, the away team on a draw
+#   (m)-[:WINNER]->(:Team)   target of the old beat edge: the winner, the home team on a draw
+#   (m)-[:IN_LEAGUE]->(:League)
+#
+# TEXTS replaces the registry texts of every statement that reads or writes matches
+# (queries.py); names and parameters are unchanged, so callers and the in-memory backend
+# work with either model. The PageRank projection and the local ranking edges are built
+# from the (:Team)<-[:LOSER]-(:Match)-[:WINNER]->(:Team) paths.
+#
+#   python match_model.py migrate [--drop-edges]   # create :Match nodes from the beat edges
+#   python match_model.py check                    # compare beat edge and :Match node counts
+import argparse
+
+INDEXES = {
+    "match_id": "CREATE CONSTRAINT match_id IF NOT EXISTS FOR (m:Match) REQUIRE m.match_id IS UNIQUE",
+    "match_league_season": "CREATE INDEX match_league_season IF NOT EXISTS FOR (m:Match) ON (m.leagueID, m.season)",
+    "match_league": "CREATE INDEX match_league IF NOT EXISTS FOR (m:Match) ON (m.leagueID)",
+}
+
+# Sides of a match, bound as team1 (LOSER) and team2 (WINNER) like the beat edge endpoints
+SIDES = "(team1:Team)<-[:LOSER]-(m:Match)-[:WINNER]->(team2:Team)"
+
+MATCH_PROPERTIES = """
+    match_id: {p}matchID,
+    winner: {p}winner,
+    loser: {p}loser,
+    winner_goals: {p}winnerGoals,
+    loser_goals: {p}loserGoals,
+    scoreDifferential: {p}winnerGoals - {p}loserGoals,
+    season: {p}season,
+    weight: abs({p}winnerGoals - {p}loserGoals),
+    leagueID: {p}leagueID
+"""
+
+LINK_LEAGUE = """
+OPTIONAL MATCH (league:League {id: m.leagueID})
+FOREACH (l IN CASE WHEN league IS NULL THEN [] ELSE [league] END | CREATE (m)-[:IN_LEAGUE]->(l))
+"""
+
+TEAM_COUNTS = """
+    COUNT(CASE WHEN m.winner = team_short_name THEN 1 ELSE NULL END) AS wins,
+    COUNT(CASE WHEN m.loser = team_short_name THEN 1 ELSE NULL END) AS losses,
+    SUM(CASE
+        WHEN m.winner = team_short_name THEN m.winner_goals
+        WHEN m.loser = team_short_name THEN m.loser_goals
+        ELSE 0 END) AS goals_for,
+    SUM(CASE
+        WHEN m.winner = team_short_name THEN m.loser_goals
+        WHEN m.loser = team_short_name THEN m.winner_goals
+        ELSE 0 END) AS goals_against
+"""
+
+TEXTS = {
+    "seasons": """
+MATCH (m:Match)
+WHERE m.leagueID = $leagueID
+RETURN DISTINCT m.season AS season
+ORDER BY season
+""",
+    "teams": """
+MATCH (m:Match)-[:LOSER]->(t:Team)
+WHERE m.leagueID = $leagueID
+RETURN DISTINCT t.team_api_id AS id, t.team_long_name AS team_long_name, t.team_short_name AS team_short_name
+ORDER BY team_long_name
+""",
+    "league_teams": """
+MATCH (m:Match)-[:LOSER]->(t:Team)
+RETURN DISTINCT m.leagueID AS leagueID, t.team_api_id AS team_api_id
+ORDER BY leagueID, team_api_id
+""",
+    "league_edges": f"""
+MATCH {SIDES}
+WHERE m.leagueID = $leagueID
+RETURN team1.team_api_id AS source_id, team1.team_short_name AS source_name,
+       team2.team_api_id AS target_id, team2.team_short_name AS target_name,
+       m.winner AS winner, m.winner_goals AS winner_goals, m.loser_goals AS loser_goals
+""",
+    "league_season_edges": f"""
+MATCH {SIDES}
+WHERE m.leagueID = $leagueID AND m.season = $season
+RETURN team1.team_api_id AS source_id, team1.team_short_name AS source_name,
+       team2.team_api_id AS target_id, team2.team_short_name AS target_name,
+       m.winner AS winner, m.winner_goals AS winner_goals, m.loser_goals AS loser_goals
+""",
+    "season_edges_page": f"""
+MATCH {SIDES}
+WHERE m.leagueID = $leagueID AND m.season = $season AND m.match_id > $after
+RETURN m.match_id AS match_id,
+       team1.team_api_id AS source_id, team1.team_short_name AS source_short_name,
+       team1.team_long_name AS source_long_name,
+       team2.team_api_id AS target_id, team2.team_short_name AS target_short_name,
+       team2.team_long_name AS target_long_name,
+       m.winner AS winner, m.loser AS loser, m.winner_goals AS winner_goals,
+       m.loser_goals AS loser_goals, m.weight AS weight
+ORDER BY match_id
+LIMIT $limit
+""",
+    "team_trend": f"""
+MATCH (team:Team {{team_api_id: $teamID}})
+WITH team.team_short_name AS team_short_name, team
+MATCH (team)<-[:LOSER|WINNER]-(m:Match)
+WHERE m.leagueID = $leagueID
+WITH m.season AS season,{TEAM_COUNTS}
+RETURN season, wins, losses, goals_for, goals_against
+ORDER BY season
+""",
+    "ranking_edges": f"""
+MATCH {SIDES}
+WHERE m.leagueID = $leagueID AND m.season = $season
+RETURN team1.team_api_id AS source_id, team1.team_long_name AS source_name,
+       team2.team_api_id AS target_id, m.weight AS weight
+""",
+    "rating_edges": f"""
+MATCH {SIDES}
+WHERE m.leagueID = $leagueID AND m.season = $season
+RETURN m.match_id AS match_id,
+       team1.team_api_id AS source_id, team1.team_long_name AS source_name,
+       team2.team_api_id AS target_id, team2.team_long_name AS target_name,
+       m.winner_goals AS winner_goals, m.loser_goals AS loser_goals
+ORDER BY match_id
+""",
+    "projection_build": """
+CALL gds.graph.project.cypher(
+    $graphName,
+    'MATCH (m:Match)-[:LOSER]->(t:Team)
+     WHERE m.leagueID = $leagueID AND m.season = $season
+     RETURN DISTINCT id(t) AS id',
+    'MATCH (team1:Team)<-[:LOSER]-(m:Match)-[:WINNER]->(team2:Team)
+     WHERE m.leagueID = $leagueID AND m.season = $season
+     RETURN id(team1) AS source, id(team2) AS target, m.weight AS weight',
+    {parameters: {leagueID: $leagueID, season: $season}, validateRelationships: false}
+)
+YIELD nodeCount, relationshipCount
+RETURN nodeCount, relationshipCount
+""",
+    "league_seasons": """
+MATCH (m:Match)
+RETURN DISTINCT m.leagueID AS leagueID, m.season AS season
+ORDER BY leagueID, season
+""",
+    "matches": """
+MATCH (m:Match)
+WHERE m.leagueID = $leagueID AND m.season = $season
+RETURN m.match_id AS match_id
+ORDER BY match_id
+""",
+    "matches_page": """
+MATCH (m:Match)
+WHERE m.leagueID = $leagueID AND m.season = $season AND m.match_id > $after
+RETURN m.match_id AS match_id
+ORDER BY match_id
+LIMIT $limit
+""",
+    "match_stats": """
+MATCH (m:Match {match_id: $matchID})
+RETURN m.winner AS winner, m.loser AS loser,
+       m.winner_goals AS winner_goals,
+       m.loser_goals AS loser_goals
+""",
+    "match_delete": """
+MATCH (m:Match {match_id: $matchID})
+WITH m, m.leagueID AS leagueID, m.season AS season
+DETACH DELETE m
+RETURN leagueID, season
+""",
+    "match_bulk_delete": """
+UNWIND $matchIDs AS matchID
+MATCH (m:Match {match_id: matchID})
+WITH m, m.leagueID AS leagueID, m.season AS season
+DETACH DELETE m
+RETURN leagueID, season
+""",
+    "match_ids_existing": """
+UNWIND $matchIDs AS matchID
+MATCH (m:Match {match_id: matchID})
+RETURN DISTINCT matchID AS match_id
+""",
+    # A second match with the same id fails on the uniqueness constraint
+    "match_create": """
+MATCH (team1:Team {team_short_name: $winner})
+MATCH (team2:Team {team_short_name: $loser})
+CREATE (m:Match {""" + MATCH_PROPERTIES.format(p="$") + """})
+CREATE (m)-[:LOSER]->(team2), (m)-[:WINNER]->(team1)
+WITH m""" + LINK_LEAGUE,
+    "match_bulk_create": """
+UNWIND $rows AS row
+MATCH (team1:Team {team_short_name: row.winner})
+MATCH (team2:Team {team_short_name: row.loser})
+CREATE (m:Match {""" + MATCH_PROPERTIES.format(p="row.") + """})
+CREATE (m)-[:LOSER]->(team2), (m)-[:WINNER]->(team1)
+WITH m, row""" + LINK_LEAGUE + """RETURN row.line AS line
+""",
+    "team_stats_from_edges": f"""
+MATCH (team:Team)<-[:LOSER|WINNER]-(m:Match)
+WITH team.team_api_id AS team_api_id, team.team_short_name AS team_short_name,
+     m.leagueID AS leagueID, m.season AS season, m
+RETURN team_api_id, leagueID, season,
+    count(m) AS matches,{TEAM_COUNTS}""",
+}
+
+# Bindings for queries.TEAM_STATS_DELTA, which queries.py appends as for the beat version
+STATS_DELTA_TEXTS = {
+    "team_stats_remove": f"""
+MATCH {SIDES}
+WHERE m.match_id = $matchID
+WITH team1, team2, m.leagueID AS leagueID, m.season AS season, m.winner AS winner, m.loser AS loser,
+     m.winner_goals AS winner_goals, m.loser_goals AS loser_goals, -1 AS sign
+""",
+    "team_stats_bulk_remove": f"""
+UNWIND $matchIDs AS matchID
+MATCH {SIDES}
+WHERE m.match_id = matchID
+WITH team1, team2, m.leagueID AS leagueID, m.season AS season, m.winner AS winner, m.loser AS loser,
+     m.winner_goals AS winner_goals, m.loser_goals AS loser_goals, -1 AS sign
+""",
+}
+
+
+# One :Match node per beat edge, created in batches. Edges sharing a match id collapse
+# into the first one; the count of such duplicates is reported by `check`.
+MIGRATE_QUERY = """
+MATCH (team1:Team)-[r:beat]->(team2:Team)
+CALL {
+    WITH team1, team2, r
+    MERGE (m:Match {match_id: r.match_id})
+    WITH team1, team2, r, m
+    WHERE NOT (m)-[:LOSER]->()
+    SET m.leagueID = r.leagueID, m.season = r.season, m.winner = r.winner, m.loser = r.loser,
+        m.winner_goals = r.winner_goals, m.loser_goals = r.loser_goals,
+        m.scoreDifferential = r.scoreDifferential, m.weight = r.weight
+    CREATE (m)-[:LOSER]->(team1), (m)-[:WINNER]->(team2)
+    WITH m""" + LINK_LEAGUE + """
+} IN TRANSACTIONS OF $batchSize ROWS
+RETURN count(*) AS edges
+"""
+
+DROP_EDGES_QUERY = """
+MATCH ()-[r:beat]->()
+CALL {
+    WITH r
+    DELETE r
+} IN TRANSACTIONS OF $batchSize ROWS
+RETURN count(*) AS deleted
+"""
+
+CHECK_QUERY = """
+CALL { MATCH ()-[r:beat]->() RETURN count(r) AS edges, count(DISTINCT r.match_id) AS edge_ids }
+CALL { MATCH (m:Match) RETURN count(m) AS nodes }
+RETURN edges, edges - edge_ids AS duplicate_ids, nodes
+"""
+
+
+def create_indexes(conn):
+    for statement in INDEXES.values():
+        conn.query(statement)
+    conn.query("CALL db.awaitIndexes(300)")
+
+
+def migrate(conn, drop_edges=False, batch_size=10000):
+    create_indexes(conn)
+    edges = conn.query(MIGRATE_QUERY, {"batchSize": batch_size})[0]["edges"]
+    deleted = conn.query(DROP_EDGES_QUERY, {"batchSize": batch_size})[0]["deleted"] if drop_edges else 0
+    return {"edges": edges, "deleted_edges": deleted}
+
+
+if __name__ == "__main__":
+    from db import connect
+
+    parser = argparse.ArgumentParser(description="Migrate matches from beat edges to :Match nodes")
+    parser.add_argument("command", choices=["migrate", "check"])
+    parser.add_argument("--drop-edges", action="store_true",
+                        help="delete the beat edges after migrating (no way back to DATA_MODEL=beat)")
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        if args.command == "migrate":
+            print(migrate(conn, args.drop_edges))
+        else:
+            print(conn.query(CHECK_QUERY)[0])
+    finally:
+        conn.close()
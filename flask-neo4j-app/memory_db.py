@@ -0,0 +1,678 @@
+# In-memory stand-in for Neo4j, selected with DB_BACKEND=memory. It answers every
+# statement of the query registry by name over a synthetic dataset (synthetic.py), so
+# the API can be run and benchmarked without the Aura instance. Parameters are bound
+# by the registry exactly as for Neo4j; raw Cypher (Neo4jConnection.query), which only the
+# schema and migration commands use, raises UnsupportedQueryError.
+import contextlib
+import threading
+import time
+
+import config
+import metrics
+import queries
+import synthetic
+from db import PoolMetrics
+from ranking import SeasonGraph, pagerank
+
+
+# Raw Cypher sent to the in-memory backend; there is no schema to index or migrate
+class UnsupportedQueryError(RuntimeError):
+    pass
+
+
+class MemoryGraph:
+    def __init__(self):
+        self.leagues = {}
+        self.teams = {}
+        self.teams_by_short_name = {}
+        self.edges = {}
+        self.edges_by_match = {}
+        self.edges_by_league = {}
+        self.edges_by_season = {}
+        self.edges_by_team = {}
+        self.stats = {}
+        self.stats_built = False
+        self.rankings = {}
+        self.projections = {}
+        self._next_edge = 0
+        self._undo = None
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_dataset(cls, dataset):
+        graph = cls()
+        for league in dataset.leagues:
+            graph.leagues[league["id"]] = league["name"]
+        for team in dataset.teams:
+            graph.teams[team["team_api_id"]] = dict(team)
+            graph.teams_by_short_name.setdefault(team["team_short_name"], []).append(graph.teams[team["team_api_id"]])
+        for match in dataset.matches:
+            graph.add_edge(match["source_id"], match["target_id"], match["matchID"], match["winner"],
+                           match["loser"], match["winner_goals"], match["loser_goals"],
+                           match["season"], match["leagueID"])
+        # Same state as a database after `python team_stats.py rebuild`
+        for row in team_stats_from_edges(graph, {}):
+            graph.set_stats(stats_key(row), row)
+        graph.stats_built = True
+        return graph
+
+    # Writes are applied in place and undone in reverse order if the transaction fails
+    @contextlib.contextmanager
+    def transaction(self, write=False):
+        with self._lock:
+            if not write:
+                yield
+                return
+            self._undo = []
+            try:
+                yield
+            except BaseException:
+                for undo in reversed(self._undo):
+                    undo()
+                raise
+            finally:
+                self._undo = None
+
+    def _record(self, undo):
+        if self._undo is not None:
+            self._undo.append(undo)
+
+    def add_edge(self, source_id, target_id, match_id, winner, loser, winner_goals, loser_goals,
+                 season, league_id):
+        edge_id = self._next_edge
+        self._next_edge += 1
+        self._insert(edge_id, {
+            "source_id": source_id,
+            "target_id": target_id,
+            "match_id": match_id,
+            "winner": winner,
+            "loser": loser,
+            "winner_goals": winner_goals,
+            "loser_goals": loser_goals,
+            "scoreDifferential": winner_goals - loser_goals,
+            "season": season,
+            "weight": abs(winner_goals - loser_goals),
+            "leagueID": league_id,
+        })
+        self._record(lambda: self._remove(edge_id))
+        return edge_id
+
+    def remove_edge(self, edge_id):
+        edge = self._remove(edge_id)
+        self._record(lambda: self._insert(edge_id, edge))
+        return edge
+
+    def set_stats(self, key, row):
+        previous = self.stats.get(key)
+        if row is None:
+            self.stats.pop(key, None)
+        else:
+            self.stats[key] = row
+        self._record(lambda: self._restore_stats(key, previous))
+
+    def mark_stats_built(self):
+        previous = self.stats_built
+        self.stats_built = True
+        self._record(lambda: setattr(self, "stats_built", previous))
+
+    def _restore_stats(self, key, row):
+        if row is None:
+            self.stats.pop(key, None)
+        else:
+            self.stats[key] = row
+
+    def set_ranking(self, key, rows):
+        previous = self.rankings.get(key)
+        self._restore_ranking(key, rows)
+        self._record(lambda: self._restore_ranking(key, previous))
+
+    def _restore_ranking(self, key, rows):
+        if rows is None:
+            self.rankings.pop(key, None)
+        else:
+            self.rankings[key] = rows
+
+    # Edge ids per index are kept in insertion order (dict keys)
+    def _insert(self, edge_id, edge):
+        self.edges[edge_id] = edge
+        self.edges_by_match.setdefault(edge["match_id"], {})[edge_id] = None
+        self.edges_by_league.setdefault(edge["leagueID"], {})[edge_id] = None
+        self.edges_by_season.setdefault((edge["leagueID"], edge["season"]), {})[edge_id] = None
+        self.edges_by_team.setdefault(edge["source_id"], {})[edge_id] = None
+        self.edges_by_team.setdefault(edge["target_id"], {})[edge_id] = None
+
+    def _remove(self, edge_id):
+        edge = self.edges.pop(edge_id)
+        del self.edges_by_match[edge["match_id"]][edge_id]
+        del self.edges_by_league[edge["leagueID"]][edge_id]
+        del self.edges_by_season[(edge["leagueID"], edge["season"])][edge_id]
+        self.edges_by_team[edge["source_id"]].pop(edge_id, None)
+        self.edges_by_team[edge["target_id"]].pop(edge_id, None)
+        return edge
+
+    def match_edges(self, match_id):
+        return [self.edges[edge_id] for edge_id in self.edges_by_match.get(match_id, ())]
+
+    def league_edges(self, league_id):
+        return [self.edges[edge_id] for edge_id in self.edges_by_league.get(league_id, ())]
+
+    def season_edges(self, league_id, season):
+        return [self.edges[edge_id] for edge_id in self.edges_by_season.get((league_id, season), ())]
+
+    def team_edges(self, team_id):
+        return [self.edges[edge_id] for edge_id in self.edges_by_team.get(team_id, ())]
+
+    # MATCH (t:Team {team_short_name: $name}) matches every team with that short name
+    def teams_named(self, short_name):
+        return self.teams_by_short_name.get(short_name, [])
+
+
+HANDLERS = {}
+
+
+def handler(name):
+    def decorator(fn):
+        HANDLERS[name] = fn
+        return fn
+    return decorator
+
+
+def stats_key(row):
+    return (row["team_api_id"], row["leagueID"], row["season"])
+
+
+# Season totals of one team over the given edges, as the CASE expressions of the
+# team_trend and team_stats_from_edges statements compute them
+def season_totals(team, edges):
+    short_name = team["team_short_name"]
+    totals = {}
+    for edge in edges:
+        row = totals.setdefault((edge["leagueID"], edge["season"]), {
+            "matches": 0, "wins": 0, "losses": 0, "goals_for": 0, "goals_against": 0
+        })
+        row["matches"] += 1
+        if edge["winner"] == short_name:
+            row["wins"] += 1
+            row["goals_for"] += edge["winner_goals"]
+            row["goals_against"] += edge["loser_goals"]
+        elif edge["loser"] == short_name:
+            row["losses"] += 1
+            row["goals_for"] += edge["loser_goals"]
+            row["goals_against"] += edge["winner_goals"]
+        # A team counts as the winner and the loser independently in Cypher
+        if edge["winner"] == short_name and edge["loser"] == short_name:
+            row["losses"] += 1
+    return totals
+
+
+@handler("leagues")
+def leagues(graph, params):
+    return [{"id": league_id, "name": name} for league_id, name in graph.leagues.items()]
+
+
+@handler("seasons")
+def seasons(graph, params):
+    return [{"season": season} for season in sorted({e["season"] for e in graph.league_edges(params["leagueID"])})]
+
+
+@handler("teams")
+def teams(graph, params):
+    team_ids = {e["source_id"] for e in graph.league_edges(params["leagueID"])}
+    rows = [
+        {"id": team_id, "team_long_name": graph.teams[team_id]["team_long_name"],
+         "team_short_name": graph.teams[team_id]["team_short_name"]}
+        for team_id in team_ids
+    ]
+    return sorted(rows, key=lambda row: row["team_long_name"])
+
+
+@handler("teams_all")
+def teams_all(graph, params):
+    return [{"team_api_id": team_id, "team_long_name": team["team_long_name"],
+             "team_short_name": team["team_short_name"]}
+            for team_id, team in sorted(graph.teams.items())]
+
+
+@handler("league_teams")
+def league_teams(graph, params):
+    return [{"leagueID": league_id, "team_api_id": team_id}
+            for league_id in sorted(graph.edges_by_league)
+            for team_id in sorted({e["source_id"] for e in graph.league_edges(league_id)})]
+
+
+def edge_rows(graph, edges):
+    return [
+        {
+            "source_id": e["source_id"],
+            "source_name": graph.teams[e["source_id"]]["team_short_name"],
+            "target_id": e["target_id"],
+            "target_name": graph.teams[e["target_id"]]["team_short_name"],
+            "winner": e["winner"],
+            "winner_goals": e["winner_goals"],
+            "loser_goals": e["loser_goals"],
+        }
+        for e in edges
+    ]
+
+
+@handler("league_edges")
+def league_edges(graph, params):
+    return edge_rows(graph, graph.league_edges(params["leagueID"]))
+
+
+@handler("league_season_edges")
+def league_season_edges(graph, params):
+    return edge_rows(graph, graph.season_edges(params["leagueID"], params["season"]))
+
+
+@handler("season_edges_page")
+def season_edges_page(graph, params):
+    edges = sorted((e for e in graph.season_edges(params["leagueID"], params["season"])
+                    if e["match_id"] > params["after"]), key=lambda e: e["match_id"])
+    return [
+        {
+            "match_id": e["match_id"],
+            "source_id": e["source_id"],
+            "source_short_name": graph.teams[e["source_id"]]["team_short_name"],
+            "source_long_name": graph.teams[e["source_id"]]["team_long_name"],
+            "target_id": e["target_id"],
+            "target_short_name": graph.teams[e["target_id"]]["team_short_name"],
+            "target_long_name": graph.teams[e["target_id"]]["team_long_name"],
+            "winner": e["winner"],
+            "loser": e["loser"],
+            "winner_goals": e["winner_goals"],
+            "loser_goals": e["loser_goals"],
+            "weight": e["weight"],
+        }
+        for e in edges[:params["limit"]]
+    ]
+
+
+@handler("team_trend")
+def team_trend(graph, params):
+    team = graph.teams.get(params["teamID"])
+    if team is None:
+        return []
+    edges = [e for e in graph.team_edges(team["team_api_id"]) if e["leagueID"] == params["leagueID"]]
+    totals = season_totals(team, edges)
+    return [
+        {"season": season, "wins": row["wins"], "losses": row["losses"],
+         "goals_for": row["goals_for"], "goals_against": row["goals_against"]}
+        for (_, season), row in sorted(totals.items(), key=lambda item: item[0][1])
+    ]
+
+
+@handler("ranking_edges")
+def ranking_edges(graph, params):
+    return [
+        {
+            "source_id": e["source_id"],
+            "source_name": graph.teams[e["source_id"]]["team_long_name"],
+            "target_id": e["target_id"],
+            "weight": e["weight"],
+        }
+        for e in graph.season_edges(params["leagueID"], params["season"])
+    ]
+
+
+@handler("rating_edges")
+def rating_edges(graph, params):
+    return [
+        {
+            "match_id": e["match_id"],
+            "source_id": e["source_id"],
+            "source_name": graph.teams[e["source_id"]]["team_long_name"],
+            "target_id": e["target_id"],
+            "target_name": graph.teams[e["target_id"]]["team_long_name"],
+            "winner_goals": e["winner_goals"],
+            "loser_goals": e["loser_goals"],
+        }
+        for e in sorted(graph.season_edges(params["leagueID"], params["season"]), key=lambda e: e["match_id"])
+    ]
+
+
+# GDS projections are snapshots of the season's edges, like the graph catalog
+@handler("projection_build")
+def projection_build(graph, params):
+    if params["graphName"] in graph.projections:
+        raise ValueError(f"A graph with name '{params['graphName']}' already exists.")
+    season_graph = SeasonGraph.from_records(ranking_edges(graph, params))
+    graph.projections[params["graphName"]] = season_graph
+    return [{"nodeCount": season_graph.node_count, "relationshipCount": season_graph.edge_count}]
+
+
+@handler("projection_drop")
+def projection_drop(graph, params):
+    if graph.projections.pop(params["graphName"], None) is None:
+        return []
+    return [{"graphName": params["graphName"]}]
+
+
+def stream_pagerank(graph, params, weighted):
+    season_graph = graph.projections.get(params["graphName"])
+    if season_graph is None:
+        raise ValueError(f"Graph with name `{params['graphName']}` does not exist.")
+    scores, _ = pagerank(season_graph, weighted=weighted)
+    rows = [{"Team": name, "score": float(score)} for name, score in zip(season_graph.team_names, scores)]
+    return sorted(rows, key=lambda row: row["score"], reverse=True)
+
+
+@handler("pagerank")
+def pagerank_unweighted(graph, params):
+    return stream_pagerank(graph, params, weighted=False)
+
+
+@handler("pagerank_weighted")
+def pagerank_weighted(graph, params):
+    return stream_pagerank(graph, params, weighted=True)
+
+
+@handler("league_seasons")
+def league_seasons(graph, params):
+    return [{"leagueID": league_id, "season": season}
+            for league_id, season in sorted(key for key, edges in graph.edges_by_season.items() if edges)]
+
+
+@handler("ranking_stored")
+def ranking_stored(graph, params):
+    rows = graph.rankings.get((params["leagueID"], params["season"])) or []
+    return [{"Team": row["Team"], "score": row["score"]}
+            for row in sorted(rows, key=lambda row: row["rank"]) if row["weighted"] == params["weighted"]]
+
+
+@handler("ranking_clear")
+def ranking_clear(graph, params):
+    graph.set_ranking((params["leagueID"], params["season"]), None)
+    return []
+
+
+@handler("ranking_save")
+def ranking_save(graph, params):
+    key = (params["leagueID"], params["season"])
+    rows = list(graph.rankings.get(key) or [])
+    rows.extend(dict(row, weighted=params["weighted"], computedAt=params["computedAt"]) for row in params["rows"])
+    graph.set_ranking(key, rows)
+    return []
+
+
+@handler("matches")
+def matches(graph, params):
+    match_ids = {e["match_id"] for e in graph.season_edges(params["leagueID"], params["season"])}
+    return [{"match_id": match_id} for match_id in sorted(match_ids)]
+
+
+@handler("matches_page")
+def matches_page(graph, params):
+    match_ids = {e["match_id"] for e in graph.season_edges(params["leagueID"], params["season"])
+                 if e["match_id"] > params["after"]}
+    return [{"match_id": match_id} for match_id in sorted(match_ids)[:params["limit"]]]
+
+
+@handler("match_stats")
+def match_stats(graph, params):
+    for e in graph.match_edges(params["matchID"]):
+        return [{"winner": e["winner"], "loser": e["loser"],
+                 "winner_goals": e["winner_goals"], "loser_goals": e["loser_goals"]}]
+    return []
+
+
+@handler("match_delete")
+def match_delete(graph, params):
+    deleted = []
+    for edge_id in list(graph.edges_by_match.get(params["matchID"], ())):
+        edge = graph.remove_edge(edge_id)
+        deleted.append({"leagueID": edge["leagueID"], "season": edge["season"]})
+    return deleted
+
+
+@handler("match_bulk_delete")
+def match_bulk_delete(graph, params):
+    return [row for match_id in params["matchIDs"] for row in match_delete(graph, {"matchID": match_id})]
+
+
+@handler("match_ids_existing")
+def match_ids_existing(graph, params):
+    return [{"match_id": match_id} for match_id in dict.fromkeys(params["matchIDs"])
+            if graph.edges_by_match.get(match_id)]
+
+
+@handler("teams_named")
+def teams_named(graph, params):
+    return [{"team_short_name": name} for name in dict.fromkeys(params["names"]) if graph.teams_named(name)]
+
+
+def create_match(graph, row):
+    created = 0
+    for team1 in graph.teams_named(row["winner"]):
+        for team2 in graph.teams_named(row["loser"]):
+            graph.add_edge(team2["team_api_id"], team1["team_api_id"], row["matchID"], row["winner"],
+                           row["loser"], row["winnerGoals"], row["loserGoals"], row["season"], row["leagueID"])
+            created += 1
+    return created
+
+
+@handler("match_create")
+def match_create(graph, params):
+    create_match(graph, params)
+    return []
+
+
+@handler("match_bulk_create")
+def match_bulk_create(graph, params):
+    return [{"line": row.get("line")} for row in params["rows"] for _ in range(create_match(graph, row))]
+
+
+# TEAM_STATS_DELTA for both teams of one match
+def apply_stats_delta(graph, team1, team2, league_id, season, winner, loser, winner_goals, loser_goals, sign):
+    for team in (team1, team2):
+        key = (team["team_api_id"], league_id, season)
+        row = dict(graph.stats.get(key) or {
+            "team_api_id": key[0], "leagueID": league_id, "season": season,
+            "matches": 0, "wins": 0, "losses": 0, "goals_for": 0, "goals_against": 0,
+        })
+        short_name = team["team_short_name"]
+        row["matches"] += sign
+        if winner == short_name:
+            row["wins"] += sign
+            row["goals_for"] += sign * winner_goals
+            row["goals_against"] += sign * loser_goals
+        elif loser == short_name:
+            row["goals_for"] += sign * loser_goals
+            row["goals_against"] += sign * winner_goals
+        if loser == short_name:
+            row["losses"] += sign
+        graph.set_stats(key, row)
+
+
+def add_match_stats(graph, row):
+    for team1 in graph.teams_named(row["winner"]):
+        for team2 in graph.teams_named(row["loser"]):
+            apply_stats_delta(graph, team1, team2, row["leagueID"], row["season"], row["winner"],
+                              row["loser"], row["winnerGoals"], row["loserGoals"], 1)
+
+
+@handler("team_stats_remove")
+def team_stats_remove(graph, params):
+    for e in graph.match_edges(params["matchID"]):
+        apply_stats_delta(graph, graph.teams[e["source_id"]], graph.teams[e["target_id"]], e["leagueID"],
+                          e["season"], e["winner"], e["loser"], e["winner_goals"], e["loser_goals"], -1)
+    return []
+
+
+@handler("team_stats_bulk_remove")
+def team_stats_bulk_remove(graph, params):
+    for match_id in params["matchIDs"]:
+        team_stats_remove(graph, {"matchID": match_id})
+    return []
+
+
+@handler("team_stats_add")
+def team_stats_add(graph, params):
+    add_match_stats(graph, params)
+    return []
+
+
+@handler("team_stats_bulk_add")
+def team_stats_bulk_add(graph, params):
+    for row in params["rows"]:
+        add_match_stats(graph, row)
+    return []
+
+
+@handler("team_trend_stats")
+def team_trend_stats(graph, params):
+    if not graph.stats_built:
+        return []
+    rows = [
+        row for (team_id, league_id, _), row in graph.stats.items()
+        if team_id == params["teamID"] and league_id == params["leagueID"] and row["matches"] > 0
+    ]
+    return [
+        {"season": row["season"], "wins": row["wins"], "losses": row["losses"],
+         "goals_for": row["goals_for"], "goals_against": row["goals_against"]}
+        for row in sorted(rows, key=lambda row: row["season"])
+    ]
+
+
+@handler("team_stats_from_edges")
+def team_stats_from_edges(graph, params):
+    rows = []
+    for team_id, team in graph.teams.items():
+        for (league_id, season), totals in season_totals(team, graph.team_edges(team_id)).items():
+            rows.append(dict(totals, team_api_id=team_id, leagueID=league_id, season=season))
+    return rows
+
+
+@handler("team_stats_all")
+def team_stats_all(graph, params):
+    return [dict(row) for row in graph.stats.values() if row["matches"] > 0]
+
+
+@handler("team_stats_clear")
+def team_stats_clear(graph, params):
+    for key in list(graph.stats):
+        graph.set_stats(key, None)
+    return []
+
+
+@handler("team_stats_load")
+def team_stats_load(graph, params):
+    for row in params["rows"]:
+        graph.set_stats(stats_key(row), dict(row))
+    return []
+
+
+@handler("team_stats_mark_built")
+def team_stats_mark_built(graph, params):
+    graph.mark_stats_built()
+    return []
+
+
+missing = set(queries.QUERIES) - set(HANDLERS)
+assert not missing, f"No in-memory handler for {sorted(missing)}"
+
+
+# Drop-in for Neo4jConnection over a MemoryGraph
+class MemoryConnection:
+    def __init__(self, graph, debug=False):
+        self.graph = graph
+        self.debug = debug
+        self.metrics = PoolMetrics()
+
+    def close(self):
+        pass
+
+    def verify_connectivity(self):
+        pass
+
+    # Nothing is planned in memory; only check the statement has a handler
+    def explain(self, name):
+        HANDLERS[queries.get(name).name]
+
+    def query(self, query, parameters=None):
+        raise UnsupportedQueryError("The in-memory backend only runs statements from the query registry; "
+                                    "schema.py and match_model.py need DB_BACKEND=neo4j")
+
+    def run(self, name, parameters=None):
+        return self.run_many([(name, parameters)])[0]
+
+    def run_many(self, statements):
+        bound = []
+        for name, parameters in statements:
+            statement = queries.get(name)
+            bound.append((statement, statement.bind(parameters)))
+
+        self.metrics.acquired(0.0)
+        try:
+            with self.graph.transaction(write=any(statement.write for statement, _ in bound)):
+                return [self._execute(statement, params) for statement, params in bound]
+        finally:
+            self.metrics.released()
+
+    # Records are already in memory; fetch_size is accepted for interface parity
+    def stream(self, name, parameters=None, fetch_size=1000):
+        if queries.get(name).write:
+            raise ValueError(f"{name}: only read statements can be streamed")
+        yield from self.run(name, parameters)
+
+    def _execute(self, statement, params):
+        start = time.perf_counter()
+        try:
+            records = HANDLERS[statement.name](self.graph, params)
+        except Exception:
+            metrics.STATEMENT_ERRORS.inc(statement=statement.name)
+            raise
+        elapsed = time.perf_counter() - start
+
+        metrics.record_statement(statement.name, elapsed)
+        if self.debug:
+            queries.statement_stats.record(statement.name, 0.0, elapsed * 1000)
+        return records
+
+    def pool_stats(self):
+        return {
+            "backend": "memory",
+            "in_use": self.metrics.in_use,
+            "peak_in_use": self.metrics.peak_in_use,
+            "acquisitions": self.metrics.acquisitions,
+        }
+
+
+# Drop-in for AsyncNeo4jConnection; statements run inline on the event loop
+class AsyncMemoryConnection:
+    def __init__(self, graph, debug=False):
+        self.conn = MemoryConnection(graph, debug=debug)
+
+    async def close(self):
+        pass
+
+    async def run(self, name, parameters=None):
+        return self.conn.run(name, parameters)
+
+    async def run_many(self, statements):
+        return self.conn.run_many(statements)
+
+    async def stream(self, name, parameters=None, fetch_size=1000):
+        for record in self.conn.stream(name, parameters, fetch_size):
+            yield record
+
+    def pool_stats(self):
+        return self.conn.pool_stats()
+
+
+_shared_graph = None
+_shared_lock = threading.Lock()
+
+
+# One dataset per process, shared by every connection so writes are visible to all of them
+def shared_graph():
+    global _shared_graph
+    with _shared_lock:
+        if _shared_graph is None:
+            _shared_graph = MemoryGraph.from_dataset(synthetic.generate(
+                leagues=config.SYNTHETIC_LEAGUES,
+                seasons=config.SYNTHETIC_SEASONS,
+                teams=config.SYNTHETIC_TEAMS,
+                seed=config.SYNTHETIC_SEED
+            ))
+        return _shared_graph
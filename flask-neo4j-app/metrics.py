@@ -0,0 +1,206 @@
+# Request, statement and ranking latency histograms, served on /metrics in the
+# Prometheus text exposition format. Every gunicorn worker keeps its own values, so
+# scrape each worker or aggregate by instance.
+import bisect
+import contextlib
+import logging
+import threading
+import time
+
+# Upper bounds in seconds
+DEFAULT_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+logger = logging.getLogger("neo4j_app.slow_queries")
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = list(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            series["counts"][index] += 1
+            series["sum"] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(s["counts"]), s["sum"]) for key, s in self._series.items()}
+        for key, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ["+Inf"], counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(self.labels, key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route", "status"])
+
+STATEMENT_SECONDS = REGISTRY.histogram(
+    "neo4j_statement_duration_seconds", "Client-side time to run a registry statement and fetch its records",
+    ["statement"])
+
+# result_available_after / result_consumed_after from the driver's result summary
+STATEMENT_SERVER_SECONDS = REGISTRY.histogram(
+    "neo4j_statement_server_seconds", "Server-reported time until the first record (available) and to stream all records (consumed)",
+    ["statement", "phase"])
+
+STATEMENT_ERRORS = REGISTRY.counter(
+    "neo4j_statement_errors_total", "Registry statements that raised", ["statement"])
+
+STATEMENT_DB_HITS = REGISTRY.counter(
+    "neo4j_statement_db_hits_total", "Database hits of profiled statement runs", ["statement"])
+
+SLOW_STATEMENTS = REGISTRY.counter(
+    "neo4j_slow_statements_total", "Statement runs above SLOW_QUERY_MS", ["statement"])
+
+RANKING_SECONDS = REGISTRY.histogram(
+    "ranking_phase_duration_seconds", "Time spent in each phase of a /ranking computation",
+    ["backend", "phase"])
+
+
+# outcome: leader (computed), coalesced (shared a call in the same worker), worker_wait
+# (waited for another worker's lock), worker_shared (used that worker's result)
+SINGLE_FLIGHT_CALLS = REGISTRY.counter(
+    "single_flight_calls_total", "Coalescible calls by computation and outcome", ["flight", "outcome"])
+
+def record_statement(name, seconds, summary=None):
+    STATEMENT_SECONDS.observe(seconds, statement=name)
+    if summary is None:
+        return
+    if summary.result_available_after is not None:
+        STATEMENT_SERVER_SECONDS.observe(summary.result_available_after / 1000,
+                                         statement=name, phase="available")
+    if summary.result_consumed_after is not None:
+        STATEMENT_SERVER_SECONDS.observe(summary.result_consumed_after / 1000,
+                                         statement=name, phase="consumed")
+
+
+def db_hits(plan):
+    return (plan.get("dbHits") or 0) + sum(db_hits(child) for child in plan.get("children", []))
+
+
+# One line per operator of a PROFILE plan, children indented below their parent
+def format_plan(plan, depth=0):
+    args = plan.get("args") or {}
+    details = args.get("Details") or ""
+    lines = [f"{'  ' * depth}{plan.get('operatorType')} rows={plan.get('rows', 0)} "
+             f"dbHits={plan.get('dbHits', 0)} {details}".rstrip()]
+    for child in plan.get("children", []):
+        lines.extend(format_plan(child, depth + 1))
+    return lines
+
+
+# Logs the PROFILE plan of statements slower than threshold_ms. Profiling re-runs the
+# statement, so it happens on a background thread, at most once per statement every
+# interval seconds, and only for read statements; slow writes are logged without a plan.
+class SlowQuerySampler:
+    def __init__(self, profile, threshold_ms, interval=60.0):
+        self.profile = profile
+        self.threshold_ms = threshold_ms
+        self.interval = interval
+        self._last_sampled = {}
+        self._lock = threading.Lock()
+
+    def offer(self, statement, params, elapsed_ms):
+        if elapsed_ms < self.threshold_ms:
+            return
+        SLOW_STATEMENTS.inc(statement=statement.name)
+
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sampled.get(statement.name, -self.interval) < self.interval:
+                return
+            self._last_sampled[statement.name] = now
+
+        if statement.write:
+            logger.warning("Slow statement %s: %.1f ms (write, not profiled)", statement.name, elapsed_ms)
+            return
+        threading.Thread(target=self._sample, args=(statement, params, elapsed_ms), daemon=True).start()
+
+    def _sample(self, statement, params, elapsed_ms):
+        try:
+            summary = self.profile(statement, params)
+        except Exception as e:
+            logger.warning("Slow statement %s: %.1f ms (PROFILE failed: %s)", statement.name, elapsed_ms, e)
+            return
+
+        plan = summary.profile or {}
+        STATEMENT_DB_HITS.inc(db_hits(plan), statement=statement.name)
+        logger.warning("Slow statement %s: %.1f ms, %d db hits\n%s", statement.name, elapsed_ms,
+                       db_hits(plan), "\n".join(format_plan(plan)))
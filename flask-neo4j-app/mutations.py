@@ -0,0 +1,75 @@
+# Statement lists for the match mutations, shared by app.py, asgi_app.py and the bulk
+# loader. Each list runs as one transaction (Neo4jConnection.run_many), so the beat
+# edges and the TeamSeasonStats rows derived from them always change together.
+import queries
+
+
+# Match payload with the parameter types of match_create; raises QueryParameterError
+def bind_match(match):
+    return queries.get("match_create").bind(match)
+
+
+# Reads run before writing bound matches; results: [known team short names, existing ids].
+# Replacing a match (update, write queue) needs no id check.
+def check_statements(matches, replace=False):
+    statements = [("teams_named", {"names": sorted({match[side] for match in matches
+                                                    for side in ("winner", "loser")})})]
+    if not replace:
+        statements.append(("match_ids_existing", {"matchIDs": [match["matchID"] for match in matches]}))
+    return statements
+
+
+# (match, message, status) for every match that must not be written: 400 when a team does
+# not exist (the create would match nothing, and an update would only delete), 409 when
+# the id of a new match is taken, in the database or earlier in the list
+def match_errors(matches, results, replace=False):
+    known = {record["team_short_name"] for record in results[0]}
+    existing = set() if replace else {record["match_id"] for record in results[1]}
+    errors = []
+    for match in matches:
+        unknown = [match[side] for side in ("winner", "loser") if match[side] not in known]
+        if unknown:
+            errors.append((match, f"unknown team: {', '.join(unknown)}", 400))
+        elif not replace and match["matchID"] in existing:
+            errors.append((match, f"match id {match['matchID']} already exists", 409))
+        elif not replace:
+            existing.add(match["matchID"])
+    return errors
+
+
+def add_statements(match):
+    return [
+        ("match_create", match),
+        ("team_stats_add", {name: value for name, value in match.items() if name != "matchID"}),
+    ]
+
+
+def delete_statements(match_id):
+    return [
+        ("team_stats_remove", {"matchID": match_id}),
+        ("match_delete", {"matchID": match_id}),
+    ]
+
+
+def update_statements(match):
+    return delete_statements(match["matchID"]) + add_statements(match)
+
+
+def bulk_add_statements(rows):
+    return [
+        ("match_bulk_create", {"rows": rows}),
+        ("team_stats_bulk_add", {"rows": rows}),
+    ]
+
+
+# One flush of the write queue: every listed match is deleted, then the rows are created
+# (each row a match being replaced). Results: [stats, deleted scopes, created lines, stats].
+def replace_statements(match_ids, rows):
+    return [
+        ("team_stats_bulk_remove", {"matchIDs": match_ids}),
+        ("match_bulk_delete", {"matchIDs": match_ids}),
+    ] + bulk_add_statements(rows)
+
+# (leagueID, season) of the edges removed by a delete/update, from run_many's results
+def deleted_scopes(results):
+    return [(record["leagueID"], record["season"]) for record in results[1]]
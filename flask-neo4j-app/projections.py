@@ -0,0 +1,178 @@
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from cache import ScopeVersions, season_scope
+
+# Rough GDS heap cost used to cap the catalog by memory
+NODE_BYTES = 64
+RELATIONSHIP_BYTES = 24
+PROJECTION_OVERHEAD_BYTES = 64 * 1024
+
+# Numbers the managers of one process, e.g. when app.py and asgi_app.py are imported together
+_managers = itertools.count()
+
+
+class Projection:
+    def __init__(self, name, league_id, season, node_count, relationship_count, build_seconds, stamp):
+        self.name = name
+        self.league_id = league_id
+        self.season = season
+        self.node_count = node_count
+        self.relationship_count = relationship_count
+        self.build_seconds = build_seconds
+        self.stamp = stamp
+        self.estimated_bytes = (PROJECTION_OVERHEAD_BYTES + node_count * NODE_BYTES
+                                + relationship_count * RELATIONSHIP_BYTES)
+
+
+# Tracks the GDS projections this process created and keeps the catalog bounded.
+# Projections are kept in LRU order and dropped with gds.graph.drop once the count
+# or estimated memory cap is exceeded, or when a match in their league/season changes.
+#
+# Graph names carry the process id and a per-process manager number, so gunicorn workers
+# sharing a database never build, drop or evict each other's projections. A projection
+# is also rebuilt once its season's version changes (versions, a cache.ScopeVersions),
+# which is how a write handled by another worker reaches this one.
+#
+# The lock only guards the bookkeeping: builds and drops run outside it, and concurrent
+# requests for a season that is being built wait for that build instead of starting one.
+class ProjectionManager:
+    def __init__(self, conn, max_projections=8, max_memory_bytes=None, versions=None):
+        self.conn = conn
+        self.max_projections = max_projections
+        self.max_memory_bytes = max_memory_bytes
+        self.versions = versions or ScopeVersions()
+        self.suffix = f"{os.getpid()}_{next(_managers)}"
+        self._projections = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "builds": 0,
+            "build_seconds": 0.0,
+        }
+
+    def graph_name(self, league_id, season):
+        return f"seasonLeagueGraph{league_id}{season.replace('/', '')}_{self.suffix}"
+
+    # Return the name of an up-to-date projection for the league/season, building it if needed
+    def acquire(self, league_id, season):
+        name = self.graph_name(league_id, season)
+        scope = season_scope(league_id, season)
+        while True:
+            with self._lock:
+                projection = self._projections.get(name)
+                if projection is not None and self.versions.fresh(scope, projection.stamp):
+                    self._projections.move_to_end(name)
+                    self._stats["hits"] += 1
+                    return name
+                building = self._building.get(name)
+                if building is None:
+                    building = self._building[name] = threading.Event()
+                    self._projections.pop(name, None)
+                    self._stats["misses"] += 1
+                    break
+            building.wait()
+
+        evicted = []
+        try:
+            projection = self._build(name, league_id, season)
+            with self._lock:
+                self._projections[name] = projection
+                evicted = self._evict()
+        finally:
+            with self._lock:
+                del self._building[name]
+            building.set()
+        for stale in evicted:
+            self._drop(stale)
+        return name
+
+    def invalidate(self, league_id, season, rebuild=False):
+        name = self.graph_name(league_id, season)
+        with self._lock:
+            if self._projections.pop(name, None) is None:
+                return
+            self._stats["invalidations"] += 1
+        self._drop(name)
+        if rebuild:
+            self.acquire(league_id, season)
+
+    # A projection this manager still lists was dropped behind its back (e.g. by a database
+    # restart); the next acquire builds it again
+    def forget(self, name):
+        with self._lock:
+            self._projections.pop(name, None)
+
+    def drop_all(self):
+        with self._lock:
+            names = list(self._projections)
+            self._projections.clear()
+        for name in names:
+            self._drop(name)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["projections"] = [
+                {
+                    "name": p.name,
+                    "leagueID": p.league_id,
+                    "season": p.season,
+                    "nodeCount": p.node_count,
+                    "relationshipCount": p.relationship_count,
+                    "estimatedBytes": p.estimated_bytes,
+                    "buildSeconds": p.build_seconds,
+                }
+                for p in self._projections.values()
+            ]
+            stats["estimated_bytes"] = sum(p.estimated_bytes for p in self._projections.values())
+            return stats
+
+    def _build(self, name, league_id, season):
+        start = time.perf_counter()
+        stamp = self.versions.stamp(season_scope(league_id, season))
+
+        # Left over from a crashed worker that had the same process id, or from an earlier
+        # build of this manager; either way it can be stale
+        self._drop(name)
+
+        # Create graph projection for the specified season and league
+        result = self.conn.run("projection_build",
+                               {"graphName": name, "leagueID": league_id, "season": season})
+        counts = result[0] if result else {"nodeCount": 0, "relationshipCount": 0}
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._stats["builds"] += 1
+            self._stats["build_seconds"] += elapsed
+        return Projection(name, int(league_id), season,
+                          counts["nodeCount"], counts["relationshipCount"], elapsed, stamp)
+
+    def _drop(self, name):
+        self.conn.run("projection_drop", {"graphName": name})
+
+    def _over_budget(self):
+        if self.max_projections is not None and len(self._projections) > self.max_projections:
+            return True
+        if self.max_memory_bytes is not None:
+            total = sum(p.estimated_bytes for p in self._projections.values())
+            return total > self.max_memory_bytes
+        return False
+
+    # Removes least recently used projections over budget and returns their names, for
+    # the caller to drop once the lock is released
+    def _evict(self):
+        evicted = []
+        # Never evict the projection that was just acquired
+        while len(self._projections) > 1 and self._over_budget():
+            name, _ = self._projections.popitem(last=False)
+            evicted.append(name)
+            self._stats["evictions"] += 1
+        return evicted
@@ -0,0 +1,481 @@
+import threading
+
+import config
+
+# Every statement the API sends to Neo4j, one fully parameterized text per name. Values
+# never end up in the query text, so each statement is planned once and then served
+# from the Neo4j query plan cache.
+
+
+class QueryParameterError(ValueError):
+    pass
+
+
+# Placeholder values per parameter type, for planning a statement with EXPLAIN
+SAMPLE_VALUES = {int: 0, str: "", float: 0.0, bool: False, list: []}
+
+
+# kind(value), except that int() would silently truncate a float such as 2.5 goals
+def coerce(kind, value):
+    if kind is int and isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"{value!r} is not a whole number")
+    return kind(value)
+
+
+class Statement:
+    def __init__(self, name, text, write=False, **params):
+        self.name = name
+        self.text = text
+        self.write = write
+        self.params = params
+
+    # Coerce values to the declared parameter types; undeclared values are rejected
+    def bind(self, values=None):
+        values = values or {}
+        unknown = set(values) - set(self.params)
+        if unknown:
+            raise QueryParameterError(f"{self.name}: unexpected parameters {sorted(unknown)}")
+
+        bound = {}
+        for param, kind in self.params.items():
+            value = values.get(param)
+            if value is None:
+                raise QueryParameterError(f"{self.name}: missing parameter '{param}'")
+            try:
+                bound[param] = coerce(kind, value)
+            except (TypeError, ValueError):
+                raise QueryParameterError(
+                    f"{self.name}: parameter '{param}' must be {kind.__name__}, got {value!r}")
+        return bound
+
+    def sample_parameters(self):
+        return {param: SAMPLE_VALUES[kind] for param, kind in self.params.items()}
+
+
+QUERIES = {}
+
+
+# write=True routes the statement to a write transaction (the cluster leader)
+def register(name, text, write=False, **params):
+    QUERIES[name] = Statement(name, text, write=write, **params)
+
+
+def get(name):
+    return QUERIES[name]
+
+
+# Reference data
+register("leagues", """
+MATCH (l:League)
+RETURN l.id AS id, l.name AS name
+""")
+
+register("seasons", """
+MATCH ()-[r:beat]->()
+WHERE r.leagueID = $leagueID
+RETURN DISTINCT r.season AS season
+ORDER BY season
+""", leagueID=int)
+
+register("teams", """
+MATCH (t:Team)-[r:beat]->()
+WHERE r.leagueID = $leagueID
+RETURN DISTINCT t.team_api_id AS id, t.team_long_name AS team_long_name, t.team_short_name AS team_short_name
+ORDER BY team_long_name
+""", leagueID=int)
+
+# Every team and its leagues, exported to the reference-data snapshot (reference.py)
+register("teams_all", """
+MATCH (t:Team)
+RETURN t.team_api_id AS team_api_id, t.team_long_name AS team_long_name, t.team_short_name AS team_short_name
+ORDER BY team_api_id
+""")
+
+register("league_teams", """
+MATCH (t:Team)-[r:beat]->()
+RETURN DISTINCT r.leagueID AS leagueID, t.team_api_id AS team_api_id
+ORDER BY leagueID, team_api_id
+""")
+
+# Analysis
+# Every match of a league (or one season), for the head-to-head matrix
+register("league_edges", """
+MATCH (team1:Team)-[r:beat]->(team2:Team)
+WHERE r.leagueID = $leagueID
+RETURN team1.team_api_id AS source_id, team1.team_short_name AS source_name,
+       team2.team_api_id AS target_id, team2.team_short_name AS target_name,
+       r.winner AS winner, r.winner_goals AS winner_goals, r.loser_goals AS loser_goals
+""", leagueID=int)
+
+register("league_season_edges", """
+MATCH (team1:Team)-[r:beat]->(team2:Team)
+WHERE r.leagueID = $leagueID AND r.season = $season
+RETURN team1.team_api_id AS source_id, team1.team_short_name AS source_name,
+       team2.team_api_id AS target_id, team2.team_short_name AS target_name,
+       r.winner AS winner, r.winner_goals AS winner_goals, r.loser_goals AS loser_goals
+""", leagueID=int, season=str)
+
+# One page of a season's matches with both teams' names, keyset-paginated on match_id,
+# for the Parquet export (analytics.py)
+register("season_edges_page", """
+MATCH (team1:Team)-[r:beat]->(team2:Team)
+WHERE r.leagueID = $leagueID AND r.season = $season AND r.match_id > $after
+RETURN r.match_id AS match_id,
+       team1.team_api_id AS source_id, team1.team_short_name AS source_short_name,
+       team1.team_long_name AS source_long_name,
+       team2.team_api_id AS target_id, team2.team_short_name AS target_short_name,
+       team2.team_long_name AS target_long_name,
+       r.winner AS winner, r.loser AS loser, r.winner_goals AS winner_goals,
+       r.loser_goals AS loser_goals, r.weight AS weight
+ORDER BY match_id
+LIMIT $limit
+""", leagueID=int, season=str, after=int, limit=int)
+
+register("team_trend", """
+MATCH (team:Team {team_api_id: $teamID})
+WITH team.team_short_name AS team_short_name, team
+MATCH (team)-[r:beat]-()
+WHERE r.leagueID = $leagueID
+WITH r.season AS season,
+    COUNT(CASE WHEN r.winner = team_short_name THEN 1 ELSE NULL END) AS wins,
+    COUNT(CASE WHEN r.loser = team_short_name THEN 1 ELSE NULL END) AS losses,
+    SUM(CASE
+        WHEN r.winner = team_short_name THEN r.winner_goals
+        WHEN r.loser = team_short_name THEN r.loser_goals
+        ELSE 0 END) AS goals_for,
+    SUM(CASE
+        WHEN r.winner = team_short_name THEN r.loser_goals
+        WHEN r.loser = team_short_name THEN r.winner_goals
+        ELSE 0 END) AS goals_against
+RETURN season, wins, losses, goals_for, goals_against
+ORDER BY season
+""", teamID=int, leagueID=int)
+
+# Ranking. The GDS graph catalog lives on the member that built the projection, so
+# projection and PageRank calls are all routed as writes to stay on the same member.
+register("ranking_edges", """
+MATCH (team1:Team)-[r:beat]->(team2:Team)
+WHERE r.leagueID = $leagueID AND r.season = $season
+RETURN team1.team_api_id AS source_id, team1.team_long_name AS source_name,
+       team2.team_api_id AS target_id, r.weight AS weight
+""", leagueID=int, season=str)
+
+# Matches of a league/season in match_id order for the Elo/Massey/Colley ratings (ratings.py)
+register("rating_edges", """
+MATCH (team1:Team)-[r:beat]->(team2:Team)
+WHERE r.leagueID = $leagueID AND r.season = $season
+RETURN r.match_id AS match_id,
+       team1.team_api_id AS source_id, team1.team_long_name AS source_name,
+       team2.team_api_id AS target_id, team2.team_long_name AS target_name,
+       r.winner_goals AS winner_goals, r.loser_goals AS loser_goals
+ORDER BY match_id
+""", leagueID=int, season=str)
+
+register("projection_build", """
+CALL gds.graph.project.cypher(
+    $graphName,
+    'MATCH (t:Team)-[r:beat]->()
+     WHERE r.leagueID = $leagueID AND r.season = $season
+     RETURN DISTINCT id(t) AS id',
+    'MATCH (team1:Team)-[r:beat]->(team2:Team)
+     WHERE r.leagueID = $leagueID AND r.season = $season
+     RETURN id(team1) AS source, id(team2) AS target, r.weight AS weight',
+    {parameters: {leagueID: $leagueID, season: $season}, validateRelationships: false}
+)
+YIELD nodeCount, relationshipCount
+RETURN nodeCount, relationshipCount
+""", write=True, graphName=str, leagueID=int, season=str)
+
+register("projection_drop", """
+CALL gds.graph.drop($graphName, false) YIELD graphName
+RETURN graphName
+""", write=True, graphName=str)
+
+# Scores are sorted and the team nodes resolved with one gds.util.asNodes call for the
+# whole result instead of a gds.util.asNode lookup per row
+PAGERANK_TEAMS = """
+YIELD nodeId, score
+WITH nodeId, score
+ORDER BY score DESC
+WITH collect(nodeId) AS nodeIds, collect(score) AS scores
+WITH gds.util.asNodes(nodeIds) AS teams, scores
+UNWIND range(0, size(scores) - 1) AS i
+RETURN teams[i].team_long_name AS Team, scores[i] AS score
+"""
+
+register("pagerank", """
+CALL gds.pageRank.stream($graphName)""" + PAGERANK_TEAMS, write=True, graphName=str)
+
+register("pagerank_weighted", """
+CALL gds.pageRank.stream($graphName, {relationshipWeightProperty: 'weight'})""" + PAGERANK_TEAMS,
+         write=True, graphName=str)
+
+# Precomputed rankings written by ranking_batch.py, one row per team and league/season
+register("league_seasons", """
+MATCH ()-[r:beat]->()
+RETURN DISTINCT r.leagueID AS leagueID, r.season AS season
+ORDER BY leagueID, season
+""")
+
+register("ranking_stored", """
+MATCH (s:RankingResult {leagueID: $leagueID, season: $season, weighted: $weighted})
+RETURN s.Team AS Team, s.score AS score
+ORDER BY s.rank
+""", leagueID=int, season=str, weighted=bool)
+
+register("ranking_clear", """
+MATCH (s:RankingResult {leagueID: $leagueID, season: $season})
+DETACH DELETE s
+""", write=True, leagueID=int, season=str)
+
+register("ranking_save", """
+UNWIND $rows AS row
+CREATE (s:RankingResult {leagueID: $leagueID, season: $season, weighted: $weighted})
+SET s.Team = row.Team, s.score = row.score, s.rank = row.rank, s.computedAt = $computedAt
+""", write=True, leagueID=int, season=str, weighted=bool, rows=list, computedAt=float)
+
+# Matches
+register("matches", """
+MATCH ()-[r:beat]->()
+WHERE r.leagueID = $leagueID AND r.season = $season
+RETURN DISTINCT r.match_id AS match_id
+ORDER BY match_id
+""", leagueID=int, season=str)
+
+# One page of a season's matches, keyset-paginated on match_id
+register("matches_page", """
+MATCH ()-[r:beat]->()
+WHERE r.leagueID = $leagueID AND r.season = $season AND r.match_id > $after
+RETURN DISTINCT r.match_id AS match_id
+ORDER BY match_id
+LIMIT $limit
+""", leagueID=int, season=str, after=int, limit=int)
+
+register("match_stats", """
+MATCH ()-[r:beat]->()
+WHERE r.match_id = $matchID
+RETURN r.winner AS winner, r.loser AS loser,
+       r.winner_goals AS winner_goals,
+       r.loser_goals AS loser_goals
+LIMIT 1
+""", matchID=int)
+
+register("match_delete", """
+MATCH ()-[r:beat]->()
+WHERE r.match_id = $matchID
+WITH r, r.leagueID AS leagueID, r.season AS season
+DELETE r
+RETURN leagueID, season
+""", write=True, matchID=int)
+
+# Grouped delete of the write queue (write_queue.py)
+register("match_bulk_delete", """
+UNWIND $matchIDs AS matchID
+MATCH ()-[r:beat]->()
+WHERE r.match_id = matchID
+WITH r, r.leagueID AS leagueID, r.season AS season
+DELETE r
+RETURN leagueID, season
+""", write=True, matchIDs=list)
+
+register("match_create", """
+MATCH (team1:Team {team_short_name: $winner})
+MATCH (team2:Team {team_short_name: $loser})
+CREATE (team2)-[newRel:beat {
+    match_id: $matchID,
+    winner: $winner,
+    loser: $loser,
+    winner_goals: $winnerGoals,
+    loser_goals: $loserGoals,
+    scoreDifferential: $winnerGoals - $loserGoals,
+    season: $season,
+    weight: abs($winnerGoals - $loserGoals),
+    leagueID: $leagueID
+}]->(team1)
+""", write=True, matchID=int, winner=str, loser=str, winnerGoals=int, loserGoals=int, season=str, leagueID=int)
+
+# Checks run before a match is written (mutations.check_statements): which of the ids
+# already exist, and which of the short names are teams
+register("match_ids_existing", """
+UNWIND $matchIDs AS matchID
+MATCH ()-[r:beat]->()
+WHERE r.match_id = matchID
+RETURN DISTINCT matchID AS match_id
+""", matchIDs=list)
+
+register("teams_named", """
+UNWIND $names AS name
+MATCH (t:Team {team_short_name: name})
+RETURN DISTINCT name AS team_short_name
+""", names=list)
+
+# One chunk of /matches/bulk; returns the input line of every row that was created
+register("match_bulk_create", """
+UNWIND $rows AS row
+MATCH (team1:Team {team_short_name: row.winner})
+MATCH (team2:Team {team_short_name: row.loser})
+CREATE (team2)-[newRel:beat {
+    match_id: row.matchID,
+    winner: row.winner,
+    loser: row.loser,
+    winner_goals: row.winnerGoals,
+    loser_goals: row.loserGoals,
+    scoreDifferential: row.winnerGoals - row.loserGoals,
+    season: row.season,
+    weight: abs(row.winnerGoals - row.loserGoals),
+    leagueID: row.leagueID
+}]->(team1)
+RETURN row.line AS line
+""", write=True, rows=list)
+
+
+# Materialized per-team season totals (TeamSeasonStats), kept in step with the beat
+# edges by applying +1/-1 deltas in the same transaction as each match write. Each
+# statement binds team1/team2 (the match's two teams), the beat properties and $sign.
+TEAM_STATS_DELTA = """
+UNWIND [team1, team2] AS team
+MERGE (s:TeamSeasonStats {team_api_id: team.team_api_id, leagueID: leagueID, season: season})
+SET s.matches = coalesce(s.matches, 0) + sign,
+    s.wins = coalesce(s.wins, 0) + sign * CASE WHEN winner = team.team_short_name THEN 1 ELSE 0 END,
+    s.losses = coalesce(s.losses, 0) + sign * CASE WHEN loser = team.team_short_name THEN 1 ELSE 0 END,
+    s.goals_for = coalesce(s.goals_for, 0) + sign * CASE
+        WHEN winner = team.team_short_name THEN winner_goals
+        WHEN loser = team.team_short_name THEN loser_goals
+        ELSE 0 END,
+    s.goals_against = coalesce(s.goals_against, 0) + sign * CASE
+        WHEN winner = team.team_short_name THEN loser_goals
+        WHEN loser = team.team_short_name THEN winner_goals
+        ELSE 0 END
+"""
+
+# Runs before match_delete, while the edge still exists
+register("team_stats_remove", """
+MATCH (team1:Team)-[r:beat]->(team2:Team)
+WHERE r.match_id = $matchID
+WITH team1, team2, r.leagueID AS leagueID, r.season AS season, r.winner AS winner, r.loser AS loser,
+     r.winner_goals AS winner_goals, r.loser_goals AS loser_goals, -1 AS sign
+""" + TEAM_STATS_DELTA, write=True, matchID=int)
+
+register("team_stats_bulk_remove", """
+UNWIND $matchIDs AS matchID
+MATCH (team1:Team)-[r:beat]->(team2:Team)
+WHERE r.match_id = matchID
+WITH team1, team2, r.leagueID AS leagueID, r.season AS season, r.winner AS winner, r.loser AS loser,
+     r.winner_goals AS winner_goals, r.loser_goals AS loser_goals, -1 AS sign
+""" + TEAM_STATS_DELTA, write=True, matchIDs=list)
+
+# Mirrors match_create, which resolves both teams by short name
+register("team_stats_add", """
+MATCH (team1:Team {team_short_name: $winner})
+MATCH (team2:Team {team_short_name: $loser})
+WITH team1, team2, $leagueID AS leagueID, $season AS season, $winner AS winner, $loser AS loser,
+     $winnerGoals AS winner_goals, $loserGoals AS loser_goals, 1 AS sign
+""" + TEAM_STATS_DELTA, write=True, winner=str, loser=str, winnerGoals=int, loserGoals=int,
+         season=str, leagueID=int)
+
+register("team_stats_bulk_add", """
+UNWIND $rows AS row
+MATCH (team1:Team {team_short_name: row.winner})
+MATCH (team2:Team {team_short_name: row.loser})
+WITH team1, team2, row.leagueID AS leagueID, row.season AS season, row.winner AS winner, row.loser AS loser,
+     row.winnerGoals AS winner_goals, row.loserGoals AS loser_goals, 1 AS sign
+""" + TEAM_STATS_DELTA, write=True, rows=list)
+
+# Empty until `team_stats.py rebuild` has run (the TeamSeasonStatsBuild marker), so the
+# partial rows MERGEd by match writes before that are not served; callers then fall back
+# to team_trend
+register("team_trend_stats", """
+MATCH (s:TeamSeasonStats {team_api_id: $teamID, leagueID: $leagueID})
+WHERE s.matches > 0 AND EXISTS { MATCH (:TeamSeasonStatsBuild) }
+RETURN s.season AS season, s.wins AS wins, s.losses AS losses,
+       s.goals_for AS goals_for, s.goals_against AS goals_against
+ORDER BY season
+""", teamID=int, leagueID=int)
+
+# Full recomputation from the beat edges, used by team_stats.py rebuild/check
+register("team_stats_from_edges", """
+MATCH (team:Team)-[r:beat]-()
+WITH team.team_api_id AS team_api_id, team.team_short_name AS team_short_name,
+     r.leagueID AS leagueID, r.season AS season, r
+RETURN team_api_id, leagueID, season,
+    count(r) AS matches,
+    COUNT(CASE WHEN r.winner = team_short_name THEN 1 ELSE NULL END) AS wins,
+    COUNT(CASE WHEN r.loser = team_short_name THEN 1 ELSE NULL END) AS losses,
+    SUM(CASE
+        WHEN r.winner = team_short_name THEN r.winner_goals
+        WHEN r.loser = team_short_name THEN r.loser_goals
+        ELSE 0 END) AS goals_for,
+    SUM(CASE
+        WHEN r.winner = team_short_name THEN r.loser_goals
+        WHEN r.loser = team_short_name THEN r.winner_goals
+        ELSE 0 END) AS goals_against
+""")
+
+register("team_stats_all", """
+MATCH (s:TeamSeasonStats)
+WHERE s.matches > 0
+RETURN s.team_api_id AS team_api_id, s.leagueID AS leagueID, s.season AS season,
+       s.matches AS matches, s.wins AS wins, s.losses AS losses,
+       s.goals_for AS goals_for, s.goals_against AS goals_against
+""")
+
+register("team_stats_clear", """
+MATCH (s:TeamSeasonStats)
+DETACH DELETE s
+""", write=True)
+
+register("team_stats_load", """
+UNWIND $rows AS row
+CREATE (s:TeamSeasonStats)
+SET s = row
+""", write=True, rows=list)
+
+register("team_stats_mark_built", """
+MERGE (b:TeamSeasonStatsBuild)
+SET b.builtAt = datetime()
+""", write=True)
+
+
+# DATA_MODEL=match_nodes swaps in the (:Match) node texts of every statement touching
+# matches (match_model.py). Names, parameters and read/write routing stay the same.
+def use_texts(texts):
+    for name, text in texts.items():
+        statement = QUERIES[name]
+        QUERIES[name] = Statement(name, text, write=statement.write, **statement.params)
+
+
+if config.DATA_MODEL == "match_nodes":
+    import match_model
+    use_texts(match_model.TEXTS)
+    use_texts({name: text + TEAM_STATS_DELTA for name, text in match_model.STATS_DELTA_TEXTS.items()})
+
+
+# Planning vs execution time per statement, collected when QUERY_DEBUG is on.
+# Planning time is the server-side time to answer an EXPLAIN of the statement,
+# which drops to ~0 once the plan is cached.
+class StatementStats:
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, planning_ms, execution_ms):
+        with self._lock:
+            entry = self._stats.setdefault(name, {
+                "calls": 0, "planning_ms": 0.0, "execution_ms": 0.0, "max_planning_ms": 0.0
+            })
+            entry["calls"] += 1
+            entry["planning_ms"] += planning_ms
+            entry["execution_ms"] += execution_ms
+            entry["max_planning_ms"] = max(entry["max_planning_ms"], planning_ms)
+
+    def report(self):
+        with self._lock:
+            return {
+                name: dict(entry,
+                           avg_planning_ms=entry["planning_ms"] / entry["calls"],
+                           avg_execution_ms=entry["execution_ms"] / entry["calls"])
+                for name, entry in self._stats.items()
+            }
+
+
+statement_stats = StatementStats()
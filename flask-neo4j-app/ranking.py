@@ -0,0 +1,350 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+from cache import ScopeVersions, season_scope
+from metrics import RANKING_SECONDS
+
+logger = logging.getLogger("neo4j_app.ranking")
+
+# Same defaults gds.pageRank.stream uses when no configuration is passed
+DAMPING_FACTOR = 0.85
+MAX_ITERATIONS = 20
+TOLERANCE = 1e-7
+
+# Iteration cap of the solves run by incremental ranking, which iterate to convergence
+# so a warm start and a full solve reach the same fixed point
+CONVERGED_MAX_ITERATIONS = 500
+
+
+# Beat edges of one league/season stored as CSR arrays indexed by the losing (source) team
+class SeasonGraph:
+    def __init__(self, team_ids, team_names, sources, targets, weights):
+        order = np.argsort(sources, kind="stable")
+        self.team_ids = np.asarray(team_ids)
+        self.team_names = list(team_names)
+        self.indices = np.asarray(targets, dtype=np.int64)[order]
+        self.weights = np.asarray(weights, dtype=np.float64)[order]
+        counts = np.bincount(np.asarray(sources, dtype=np.int64), minlength=len(self.team_ids))
+        self.indptr = np.concatenate(([0], np.cumsum(counts)))
+
+    @property
+    def node_count(self):
+        return len(self.team_ids)
+
+    @property
+    def edge_count(self):
+        return len(self.indices)
+
+    @classmethod
+    def from_records(cls, records):
+        # Mirror the GDS cypher projection: only teams with an outgoing beat edge in the
+        # season are nodes, and edges pointing outside that node set are dropped
+        index = {}
+        names = []
+        for record in records:
+            if record["source_id"] not in index:
+                index[record["source_id"]] = len(names)
+                names.append(record["source_name"])
+
+        sources, targets, weights = [], [], []
+        for record in records:
+            target = index.get(record["target_id"])
+            if target is None:
+                continue
+            sources.append(index[record["source_id"]])
+            targets.append(target)
+            weights.append(record["weight"] or 0)
+
+        return cls(list(index), names, sources, targets, weights)
+
+
+# Weighted PageRank by power iteration, matching the GDS formulation:
+# unnormalized scores starting at 1 - d, no redistribution of dangling mass
+def pagerank(graph, weighted=False, damping=DAMPING_FACTOR,
+             max_iterations=MAX_ITERATIONS, tolerance=TOLERANCE):
+    scores, iterations, _ = power_iteration(graph, weighted, damping, max_iterations, tolerance)
+    return scores, iterations
+
+
+# Returns (scores, iterations, residual), the residual being the largest score change
+# of the last iteration. initial, if given, replaces the 1 - d starting vector.
+def power_iteration(graph, weighted=False, damping=DAMPING_FACTOR, max_iterations=MAX_ITERATIONS,
+                    tolerance=TOLERANCE, initial=None):
+    n = graph.node_count
+    if n == 0:
+        return np.zeros(0), 0, 0.0
+
+    weights = graph.weights if weighted else np.ones(graph.edge_count)
+    weights = np.where(weights > 0, weights, 0.0)
+    sources = np.repeat(np.arange(n), np.diff(graph.indptr))
+    out_weight = np.bincount(sources, weights=weights, minlength=n)
+    edge_share = np.divide(weights, out_weight[sources],
+                           out=np.zeros_like(weights), where=out_weight[sources] > 0)
+
+    scores = np.full(n, 1 - damping) if initial is None else np.asarray(initial, dtype=np.float64)
+    iterations = 0
+    residual = float("inf")
+    while iterations < max_iterations:
+        iterations += 1
+        incoming = np.bincount(graph.indices, weights=scores[sources] * edge_share, minlength=n)
+        updated = (1 - damping) + damping * incoming
+        residual = float(np.max(np.abs(updated - scores)))
+        scores = updated
+        if residual < tolerance:
+            break
+
+    return scores, iterations, residual
+
+
+# Last converged scores of a league/season, keyed by team id so they can seed the solve
+# after the season's edges change
+class Solution:
+    def __init__(self, graph, scores, iterations, residual, full_iterations):
+        self.graph = graph
+        self.scores = scores
+        self.iterations = iterations
+        self.residual = residual
+        self.full_iterations = full_iterations
+        self.by_team = dict(zip(graph.team_ids.tolist(), scores.tolist()))
+
+    def seed(self, graph, damping=DAMPING_FACTOR):
+        return np.array([self.by_team.get(team_id, 1 - damping) for team_id in graph.team_ids.tolist()])
+
+
+# Ranking backed by the GDS plugin: named graph projection + gds.pageRank.stream
+class GdsRankingEngine:
+    def __init__(self, conn, projections, weighted=False, rebuild_on_write=False):
+        self.conn = conn
+        self.projections = projections
+        self.weighted = weighted
+        self.rebuild_on_write = rebuild_on_write
+
+    def rank(self, league_id, season):
+        statement = "pagerank_weighted" if self.weighted else "pagerank"
+        for attempt in range(2):
+            with RANKING_SECONDS.time(backend="gds", phase="projection"):
+                graph_name = self.projections.acquire(league_id, season)
+
+            # Run the PageRank algorithm
+            try:
+                with RANKING_SECONDS.time(backend="gds", phase="pagerank"):
+                    return self.conn.run(statement, {"graphName": graph_name})
+            except Exception as e:
+                # Dropped after acquire (evicted or invalidated by a concurrent request, or
+                # lost in a database restart): build it again, once
+                if attempt or "does not exist" not in str(e):
+                    raise
+                self.projections.forget(graph_name)
+
+    def invalidate(self, league_id, season):
+        self.projections.invalidate(league_id, season, rebuild=self.rebuild_on_write)
+
+    def stats(self):
+        return {"backend": "gds", "projections": self.projections.stats()}
+
+
+# Ranking computed in-process: the season's edges are loaded once and cached as CSR arrays
+# until the season's version changes (versions, a cache.ScopeVersions) or it is invalidated.
+# With incremental=True the converged scores are kept per league/season, and after a
+# match change the next solve starts from them; if it has not converged within
+# warm_start_iterations, the season is solved again from the uniform start.
+class LocalRankingEngine:
+    def __init__(self, conn, weighted=False, incremental=False, warm_start_iterations=20, versions=None):
+        self.conn = conn
+        self.weighted = weighted
+        self.incremental = incremental
+        self.warm_start_iterations = warm_start_iterations
+        self.versions = versions or ScopeVersions()
+        self._graphs = {}
+        self._solutions = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "full_solves": 0,
+            "warm_starts": 0,
+            "fallbacks": 0,
+            "iterations": 0,
+            "iterations_saved": 0,
+            "last": None,
+        }
+
+    # The edge query and scope stamp of a season, for callers that run the query
+    # themselves (asgi_app.py, on the async driver) and pass (stamp, records) as loaded
+    def edge_statement(self, league_id, season):
+        return "ranking_edges", {"leagueID": int(league_id), "season": season}
+
+    def stamp(self, league_id, season):
+        return self.versions.stamp(season_scope(league_id, season))
+
+    # Whether rank() would have to query the season's edges
+    def needs_load(self, league_id, season):
+        with self._lock:
+            entry = self._graphs.get((int(league_id), season))
+        return entry is None or not self.versions.fresh(season_scope(league_id, season), entry[0])
+
+    def load(self, league_id, season, loaded=None):
+        key = (int(league_id), season)
+        with self._lock:
+            entry = self._graphs.get(key)
+        if entry is not None and self.versions.fresh(season_scope(*key), entry[0]):
+            return entry[1]
+
+        if loaded is None:
+            stamp = self.stamp(*key)
+            records = self.conn.run(*self.edge_statement(*key))
+        else:
+            stamp, records = loaded
+        graph = SeasonGraph.from_records(records)
+        with self._lock:
+            self._graphs[key] = (stamp, graph)
+        return graph
+
+    def rank(self, league_id, season, loaded=None):
+        with RANKING_SECONDS.time(backend="local", phase="load"):
+            graph = self.load(league_id, season, loaded)
+        with RANKING_SECONDS.time(backend="local", phase="pagerank"):
+            if self.incremental:
+                scores = self._solve(int(league_id), season, graph)
+            else:
+                scores, _ = pagerank(graph, weighted=self.weighted)
+        order = np.argsort(-scores, kind="stable")
+        return [{"Team": graph.team_names[i], "score": float(scores[i])} for i in order]
+
+    def _solve(self, league_id, season, graph):
+        key = (league_id, season)
+        with self._lock:
+            previous = self._solutions.get(key)
+        if previous is not None and previous.graph is graph:
+            return previous.scores
+
+        mode = "full"
+        if previous is not None:
+            scores, iterations, residual = power_iteration(
+                graph, self.weighted, max_iterations=self.warm_start_iterations,
+                initial=previous.seed(graph))
+            mode = "warm" if residual < TOLERANCE else "fallback"
+
+        if mode != "warm":
+            scores, iterations, residual = power_iteration(
+                graph, self.weighted, max_iterations=CONVERGED_MAX_ITERATIONS)
+            full_iterations = iterations
+        else:
+            full_iterations = previous.full_iterations
+
+        with self._lock:
+            self._solutions[key] = Solution(graph, scores, iterations, residual, full_iterations)
+            self._stats["iterations"] += iterations
+            if mode == "warm":
+                self._stats["warm_starts"] += 1
+                self._stats["iterations_saved"] += max(full_iterations - iterations, 0)
+            else:
+                self._stats["full_solves"] += 1
+                if mode == "fallback":
+                    self._stats["fallbacks"] += 1
+            self._stats["last"] = {"leagueID": league_id, "season": season, "mode": mode,
+                                   "iterations": iterations, "residual": residual}
+        return scores
+
+    # Keeps the season's last solution: the graph is reloaded on the next request and
+    # the solve warm-starts from it
+    def invalidate(self, league_id, season):
+        with self._lock:
+            self._graphs.pop((int(league_id), season), None)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, incremental=self.incremental, solutions=len(self._solutions))
+
+
+# Scores this close count as a tie (PageRank of symmetric teams only agrees up to rounding)
+TIE_TOLERANCE = 1e-9
+
+
+# Ranks for results sorted by descending score, with ties sharing the rank of the first
+# tied row ("1, 2, 2, 4"). top keeps the rows ranked top or better (ties included), team
+# the rows of one team by name; both are applied before the rows are built.
+def ranked(results, top=None, team=None):
+    count = len(results)
+    if not count:
+        return []
+    scores = np.fromiter((result["score"] for result in results), dtype=np.float64, count=count)
+    starts = np.ones(count, dtype=bool)
+    starts[1:] = ~np.isclose(scores[1:], scores[:-1], rtol=TIE_TOLERANCE, atol=0.0)
+    ranks = np.maximum.accumulate(np.where(starts, np.arange(1, count + 1), 0))
+
+    rows = np.arange(count)
+    if top is not None:
+        rows = rows[ranks[rows] <= top]
+    if team is not None:
+        team = team.casefold()
+        rows = [i for i in rows if (results[i]["Team"] or "").casefold() == team]
+    return [{"Team": results[i]["Team"], "score": results[i]["score"], "rank": int(ranks[i])} for i in rows]
+
+
+# Rankings persisted as (:RankingResult) rows by ranking_batch.py
+class RankingStore:
+    def __init__(self, conn, weighted=False):
+        self.conn = conn
+        self.weighted = weighted
+
+    def statement(self, league_id, season):
+        return "ranking_stored", {"leagueID": league_id, "season": season, "weighted": self.weighted}
+
+    def load(self, league_id, season):
+        return self.conn.run(*self.statement(league_id, season))
+
+    def save(self, league_id, season, results):
+        scope = {"leagueID": league_id, "season": season}
+        self.conn.run_many([
+            ("ranking_clear", scope),
+            ("ranking_save", dict(scope, weighted=self.weighted, computedAt=time.time(), rows=ranked(results))),
+        ])
+
+    def clear(self, league_id, season):
+        self.conn.run("ranking_clear", {"leagueID": league_id, "season": season})
+
+
+# Serves stored rankings and falls back to computing on demand with the wrapped engine.
+# A match change clears the season's stored ranking until the next batch run.
+class PrecomputedRankingEngine:
+    def __init__(self, engine, store):
+        self.engine = engine
+        self.store = store
+
+    def rank(self, league_id, season):
+        with RANKING_SECONDS.time(backend="stored", phase="load"):
+            stored = self.store.load(league_id, season)
+        if stored:
+            return stored
+        return self.engine.rank(league_id, season)
+
+    # Runs after the match write has committed, so a failed clear is logged rather than
+    # failing the request; the stored rows stay until the next batch run or clear
+    def invalidate(self, league_id, season):
+        self.engine.invalidate(league_id, season)
+        try:
+            self.store.clear(league_id, season)
+        except Exception:
+            logger.warning("Could not clear the stored ranking of league %s season %s",
+                           league_id, season, exc_info=True)
+
+    def stats(self):
+        return self.engine.stats()
+
+
+def create_engine(backend, conn, projections, weighted=False, rebuild_on_write=False,
+                  precomputed=False, incremental=False, warm_start_iterations=20, versions=None):
+    if backend == "gds":
+        engine = GdsRankingEngine(conn, projections, weighted=weighted,
+                                  rebuild_on_write=rebuild_on_write)
+    elif backend == "local":
+        engine = LocalRankingEngine(conn, weighted=weighted, incremental=incremental,
+                                    warm_start_iterations=warm_start_iterations, versions=versions)
+    else:
+        raise ValueError(f"Unknown ranking backend: {backend}")
+
+    if precomputed:
+        return PrecomputedRankingEngine(engine, RankingStore(conn, weighted=weighted))
+    return engine
@@ -0,0 +1,150 @@
+# Ranks every league/season ahead of time and stores the results as (:RankingResult)
+# rows, which /ranking serves before computing on demand once RANKING_PRECOMPUTED=1.
+# With the default RANKING_PRECOMPUTED=0 the API never reads the stored rows.
+#
+#   python ranking_batch.py --workers 8                   # concurrent GDS calls
+#   python ranking_batch.py --backend local --executor process
+#
+# Seasons are computed concurrently and each season's rows are written in one
+# transaction. The gds backend uses its own projection names, suffixed per process
+# and per call like ProjectionManager's, so it never drops a projection an API worker
+# or a concurrent batch run is using.
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import config
+from ranking import LocalRankingEngine, RankingStore
+
+
+_graphs = itertools.count()
+
+
+def graph_name(league_id, season):
+    return f"rankingBatch{league_id}{season.replace('/', '')}_{os.getpid()}_{next(_graphs)}"
+
+
+def gds_ranking(conn, league_id, season, weighted):
+    name = graph_name(league_id, season)
+    conn.run("projection_drop", {"graphName": name})
+    conn.run("projection_build", {"graphName": name, "leagueID": league_id, "season": season})
+    try:
+        return conn.run("pagerank_weighted" if weighted else "pagerank", {"graphName": name})
+    finally:
+        conn.run("projection_drop", {"graphName": name})
+
+
+def compute(conn, league_id, season, backend, weighted):
+    start = time.perf_counter()
+    if backend == "gds":
+        results = gds_ranking(conn, league_id, season, weighted)
+    elif backend == "local":
+        results = LocalRankingEngine(conn, weighted=weighted).rank(league_id, season)
+    else:
+        raise ValueError(f"Unknown ranking backend: {backend}")
+    return results, time.perf_counter() - start
+
+
+# Process pool workers open their own connection; results are saved by the parent
+_worker_conn = None
+
+
+def _init_worker():
+    global _worker_conn
+    from db import connect
+    _worker_conn = connect()
+
+
+def _compute_in_worker(league_id, season, backend, weighted):
+    return compute(_worker_conn, league_id, season, backend, weighted)
+
+
+def run_batch(conn, backend="gds", weighted=False, workers=4, executor="thread", seasons=None):
+    started = time.perf_counter()
+    seasons = seasons or [(row["leagueID"], row["season"]) for row in conn.run("league_seasons")]
+    store = RankingStore(conn, weighted=weighted)
+    report = {"backend": backend, "weighted": weighted, "workers": workers, "executor": executor,
+              "seasons": len(seasons), "ranked": 0, "failed": [], "compute_seconds": 0.0}
+
+    if executor == "process":
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        submit = lambda league_id, season: pool.submit(_compute_in_worker, league_id, season, backend, weighted)
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+        submit = lambda league_id, season: pool.submit(compute, conn, league_id, season, backend, weighted)
+
+    with pool:
+        futures = {submit(league_id, season): (league_id, season) for league_id, season in seasons}
+        for future in as_completed(futures):
+            league_id, season = futures[future]
+            try:
+                results, seconds = future.result()
+                store.save(league_id, season, results)
+            except Exception as e:
+                report["failed"].append({"leagueID": league_id, "season": season, "error": str(e)})
+                continue
+            report["ranked"] += 1
+            report["compute_seconds"] += seconds
+
+    report["wall_seconds"] = time.perf_counter() - started
+    return report
+
+
+# Runs one batch at a time in a background thread for the /ranking/batch endpoint
+class BatchRunner:
+    def __init__(self, conn, backend, weighted=False, workers=4):
+        self.conn = conn
+        self.backend = backend
+        self.weighted = weighted
+        self.workers = workers
+        self._thread = None
+        self._status = {"state": "idle"}
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._status = {"state": "running", "started": time.time()}
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+            return True
+
+    def status(self):
+        with self._lock:
+            return dict(self._status)
+
+    def _run(self):
+        try:
+            report = run_batch(self.conn, self.backend, self.weighted, self.workers)
+            status = dict(report, state="done")
+        except Exception as e:
+            status = {"state": "failed", "error": str(e)}
+        with self._lock:
+            self._status = dict(status, started=self._status.get("started"), finished=time.time())
+
+
+if __name__ == "__main__":
+    from db import connect
+
+    parser = argparse.ArgumentParser(description="Rank every league/season and store the results")
+    parser.add_argument("--backend", choices=["gds", "local"], default=config.RANKING_BACKEND)
+    parser.add_argument("--weighted", action="store_true", default=config.RANKING_WEIGHTED)
+    parser.add_argument("--workers", type=int, default=config.RANKING_BATCH_WORKERS)
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    args = parser.parse_args()
+
+    if not config.RANKING_PRECOMPUTED:
+        print("RANKING_PRECOMPUTED is off: /ranking will not serve the stored results "
+              "until the API runs with RANKING_PRECOMPUTED=1", file=sys.stderr)
+
+    conn = connect()
+    try:
+        print(json.dumps(run_batch(conn, args.backend, args.weighted, args.workers, args.executor), indent=2))
+    finally:
+        conn.close()
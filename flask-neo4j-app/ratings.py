@@ -0,0 +1,232 @@
+# Rating models besides PageRank, selected with /ranking?method=. A season's matches are
+# loaded once as NumPy arrays, one entry per match in match_id order, and cached per
+# league/season like the local PageRank graphs (until invalidated or the season's version
+# changes).
+#
+#   elo     sequential scan in match order; draws score 1/2 for both teams
+#   massey  least squares on the goal differential: L r = p, ratings summing to zero
+#   colley  (2I + L) r = 1 + (wins - losses) / 2; draws count for neither side
+#
+# L is the season's Laplacian: games played on the diagonal, minus the number of meetings
+# off it. Up to DENSE_MAX_TEAMS teams it is built and solved densely. Larger leagues use
+# conjugate gradients with L applied edge-wise, so the n x n matrix is never built.
+import threading
+
+import numpy as np
+
+from cache import ScopeVersions, season_scope
+from metrics import RANKING_SECONDS
+
+METHODS = ["elo", "massey", "colley"]
+
+ELO_START = 1500.0
+ELO_K = 20.0
+
+# Dense solves win for a football-sized league; CG is faster from a few hundred teams on
+DENSE_MAX_TEAMS = 200
+CG_TOLERANCE = 1e-10
+
+
+# One league/season's matches. Each match has a loser and a winner index (the beat edge's
+# source and target, i.e. away and home team on a draw) and its non-negative goal margin.
+class SeasonMatches:
+    def __init__(self, team_ids, team_names, losers, winners, margins):
+        self.team_ids = np.asarray(team_ids)
+        self.team_names = list(team_names)
+        self.losers = np.asarray(losers, dtype=np.int64)
+        self.winners = np.asarray(winners, dtype=np.int64)
+        self.margins = np.asarray(margins, dtype=np.float64)
+        self.draws = self.margins == 0
+        self.games = (np.bincount(self.losers, minlength=self.team_count)
+                      + np.bincount(self.winners, minlength=self.team_count)).astype(np.float64)
+
+    @property
+    def team_count(self):
+        return len(self.team_ids)
+
+    @property
+    def match_count(self):
+        return len(self.margins)
+
+    # Records of the rating_edges statement, ordered by match_id
+    @classmethod
+    def from_records(cls, records):
+        return cls.from_columns(
+            [r["source_id"] for r in records], [r["source_name"] for r in records],
+            [r["target_id"] for r in records], [r["target_name"] for r in records],
+            [r["winner_goals"] for r in records], [r["loser_goals"] for r in records])
+
+    # One sequence per column, e.g. the columns of a DataFrame (analytics.py)
+    @classmethod
+    def from_columns(cls, source_ids, source_names, target_ids, target_names, winner_goals, loser_goals):
+        count = len(source_ids)
+        if not count:
+            return cls([], [], [], [], [])
+        ids = np.concatenate([np.asarray(source_ids, dtype=np.int64), np.asarray(target_ids, dtype=np.int64)])
+        names = np.concatenate([np.asarray(source_names, dtype=object), np.asarray(target_names, dtype=object)])
+        team_ids, first, index = np.unique(ids, return_index=True, return_inverse=True)
+        margins = np.asarray(winner_goals, dtype=np.float64) - np.asarray(loser_goals, dtype=np.float64)
+        return cls(team_ids, names[first].tolist(), index[:count], index[count:], margins)
+
+
+def elo(matches, k=ELO_K, start=ELO_START):
+    ratings = [start] * matches.team_count
+    for loser, winner, draw in zip(matches.losers.tolist(), matches.winners.tolist(), matches.draws.tolist()):
+        expected = 1.0 / (1.0 + 10.0 ** ((ratings[loser] - ratings[winner]) / 400.0))
+        delta = k * ((0.5 if draw else 1.0) - expected)
+        ratings[winner] += delta
+        ratings[loser] -= delta
+    return np.array(ratings)
+
+
+def laplacian(matches, shift=0.0):
+    matrix = np.diag(matches.games + shift)
+    np.add.at(matrix, (matches.losers, matches.winners), -1.0)
+    np.add.at(matrix, (matches.winners, matches.losers), -1.0)
+    return matrix
+
+
+def apply_laplacian(matches, x, shift=0.0):
+    n = matches.team_count
+    return ((matches.games + shift) * x
+            - np.bincount(matches.losers, weights=x[matches.winners], minlength=n)
+            - np.bincount(matches.winners, weights=x[matches.losers], minlength=n))
+
+
+# Jacobi-preconditioned conjugate gradients for (L + shift I) x = b. With shift=0 the
+# system is singular, but b sums to zero over every connected group of teams, so the
+# iterates stay in L's range and converge to the minimum-norm solution.
+def conjugate_gradient(matches, b, shift=0.0, tolerance=CG_TOLERANCE, max_iterations=None):
+    diagonal = matches.games + shift
+    inverse = np.divide(1.0, diagonal, out=np.zeros_like(diagonal), where=diagonal > 0)
+    x = np.zeros_like(b)
+    r = b.copy()
+    z = inverse * r
+    p = z.copy()
+    rz = r @ z
+    limit = tolerance * max(np.linalg.norm(b), 1.0)
+    for _ in range(max_iterations or 10 * len(b)):
+        if np.linalg.norm(r) <= limit:
+            break
+        q = apply_laplacian(matches, p, shift)
+        alpha = rz / (p @ q)
+        x += alpha * p
+        r -= alpha * q
+        z = inverse * r
+        rz, previous = r @ z, rz
+        p = z + (rz / previous) * p
+    return x
+
+
+def massey(matches):
+    n = matches.team_count
+    if n == 0:
+        return np.zeros(0)
+    margins = (np.bincount(matches.winners, weights=matches.margins, minlength=n)
+               - np.bincount(matches.losers, weights=matches.margins, minlength=n))
+    if n <= DENSE_MAX_TEAMS:
+        # Replacing one equation by sum(r) = 0 makes the system regular for a connected season
+        matrix = laplacian(matches)
+        matrix[-1, :] = 1.0
+        margins[-1] = 0.0
+        try:
+            return np.linalg.solve(matrix, margins)
+        except np.linalg.LinAlgError:
+            return np.linalg.lstsq(laplacian(matches), margins, rcond=None)[0]
+    ratings = conjugate_gradient(matches, margins)
+    return ratings - ratings.mean()
+
+
+def colley(matches):
+    n = matches.team_count
+    if n == 0:
+        return np.zeros(0)
+    decided = ~matches.draws
+    balance = (np.bincount(matches.winners, weights=decided, minlength=n)
+               - np.bincount(matches.losers, weights=decided, minlength=n))
+    b = 1.0 + balance / 2.0
+    if n <= DENSE_MAX_TEAMS:
+        return np.linalg.solve(laplacian(matches, shift=2.0), b)
+    return conjugate_gradient(matches, b, shift=2.0)
+
+
+RATINGS = {"elo": elo, "massey": massey, "colley": colley}
+
+
+class RatingEngine:
+    def __init__(self, conn, versions=None):
+        self.conn = conn
+        self.versions = versions or ScopeVersions()
+        self._matches = {}
+        self._results = {}
+        self._lock = threading.Lock()
+        self._stats = {method: {"solves": 0, "cached": 0} for method in METHODS}
+
+    # Same contract as LocalRankingEngine: callers may run the edge query themselves and
+    # pass (stamp, records) as loaded
+    def edge_statement(self, league_id, season):
+        return "rating_edges", {"leagueID": int(league_id), "season": season}
+
+    def stamp(self, league_id, season):
+        return self.versions.stamp(season_scope(league_id, season))
+
+    # Whether rank() would have to query the season's matches
+    def needs_load(self, league_id, season, method):
+        scope = season_scope(league_id, season)
+        with self._lock:
+            result = self._results.get((int(league_id), season, method))
+            matches = self._matches.get((int(league_id), season))
+        return not any(entry is not None and self.versions.fresh(scope, entry[0]) for entry in (result, matches))
+
+    # Returns the season's matches and the stamp taken before they were loaded
+    def load(self, league_id, season, loaded=None):
+        key = (int(league_id), season)
+        scope = season_scope(*key)
+        with self._lock:
+            entry = self._matches.get(key)
+        if entry is not None and self.versions.fresh(scope, entry[0]):
+            return entry
+
+        if loaded is None:
+            stamp = self.versions.stamp(scope)
+            records = self.conn.run(*self.edge_statement(*key))
+        else:
+            stamp, records = loaded
+        entry = (stamp, SeasonMatches.from_records(records))
+        with self._lock:
+            self._matches[key] = entry
+        return entry
+
+    def rank(self, league_id, season, method, loaded=None):
+        if method not in RATINGS:
+            raise ValueError(f"Unknown rating method: {method}")
+        key = (int(league_id), season, method)
+        scope = season_scope(league_id, season)
+        with self._lock:
+            entry = self._results.get(key)
+        if entry is not None and self.versions.fresh(scope, entry[0]):
+            with self._lock:
+                self._stats[method]["cached"] += 1
+            return entry[1]
+
+        with RANKING_SECONDS.time(backend=method, phase="load"):
+            stamp, matches = self.load(league_id, season, loaded)
+        with RANKING_SECONDS.time(backend=method, phase="solve"):
+            ratings = RATINGS[method](matches)
+        order = np.argsort(-ratings, kind="stable")
+        results = [{"Team": matches.team_names[i], "score": float(ratings[i])} for i in order]
+
+        with self._lock:
+            self._results[key] = (stamp, results)
+            self._stats[method]["solves"] += 1
+        return results
+
+    def invalidate(self, league_id, season):
+        with self._lock:
+            self._matches.pop((int(league_id), season), None)
+            for method in METHODS:
+                self._results.pop((int(league_id), season, method), None)
+
+    def stats(self):
+        with self._lock:
+            return {method: dict(counts) for method, counts in self._stats.items()}
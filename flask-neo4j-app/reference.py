@@ -0,0 +1,192 @@
+# Snapshot of the reference data behind /leagues, /seasons and /teams as Arrow IPC files,
+# memory-mapped by the API (and downloaded by the Streamlit client) so these routes need
+# no database call. manifest.json is written last and carries the snapshot version;
+# readers reload whenever it changes.
+#
+#   python reference.py export snapshot/
+import argparse
+import json
+import os
+import threading
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+MANIFEST = "manifest.json"
+
+SCHEMAS = {
+    "leagues": pa.schema([("id", pa.int64()), ("name", pa.string())]),
+    "teams": pa.schema([("team_api_id", pa.int64()), ("team_long_name", pa.string()),
+                        ("team_short_name", pa.string())]),
+    # Same membership as /seasons and /teams: seasons and (losing) teams of the league's beat edges
+    "league_seasons": pa.schema([("leagueID", pa.int64()), ("season", pa.string())]),
+    "league_teams": pa.schema([("leagueID", pa.int64()), ("team_api_id", pa.int64())]),
+}
+
+STATEMENTS = {
+    "leagues": "leagues",
+    "teams": "teams_all",
+    "league_seasons": "league_seasons",
+    "league_teams": "league_teams",
+}
+
+
+def table_path(directory, name):
+    return os.path.join(directory, f"{name}.arrow")
+
+
+def write_atomic(path, write):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def export(conn, directory):
+    os.makedirs(directory, exist_ok=True)
+    tables = {name: pa.Table.from_pylist(conn.run(STATEMENTS[name]), schema=schema)
+              for name, schema in SCHEMAS.items()}
+
+    for name, table in tables.items():
+        def write(tmp, table=table):
+            with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        write_atomic(table_path(directory, name), write)
+
+    manifest = {"version": time.time_ns(), "tables": {name: table.num_rows for name, table in tables.items()}}
+
+    def write_manifest(tmp):
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+    write_atomic(os.path.join(directory, MANIFEST), write_manifest)
+    return manifest
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# Read side. Tables are memory-mapped, and the per-league lookups filter the mapped
+# columns with pyarrow compute rather than building Python indexes.
+class ReferenceSnapshot:
+    def __init__(self, directory):
+        self.directory = directory
+        self.version = None
+        self._tables = {}
+        self._stale = set()
+        self._manifest_mtime = None
+        self._lock = threading.Lock()
+
+    # League ids changed since the snapshot was written are served from the database
+    # until the rebuilt snapshot is loaded
+    def mark_stale(self, league_id):
+        with self._lock:
+            self._stale.add(int(league_id))
+
+    def available(self, league_id=None):
+        self._reload_if_changed()
+        with self._lock:
+            if not self._tables:
+                return False
+            return league_id is None or int(league_id) not in self._stale
+
+    def leagues(self):
+        return self._table("leagues").to_pylist()
+
+    def seasons(self, league_id):
+        mapping = self._table("league_seasons")
+        seasons = mapping.filter(pc.equal(mapping["leagueID"], int(league_id)))["season"]
+        return sorted(seasons.to_pylist())
+
+    def teams(self, league_id):
+        mapping = self._table("league_teams")
+        team_ids = mapping.filter(pc.equal(mapping["leagueID"], int(league_id)))["team_api_id"]
+        teams = self._table("teams")
+        teams = teams.filter(pc.is_in(teams["team_api_id"], value_set=team_ids.combine_chunks()))
+        rows = [
+            {"id": row["team_api_id"], "team_long_name": row["team_long_name"],
+             "team_short_name": row["team_short_name"]}
+            for row in teams.to_pylist()
+        ]
+        return sorted(rows, key=lambda row: row["team_long_name"] or "")
+
+    def _table(self, name):
+        with self._lock:
+            return self._tables[name]
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.stat(os.path.join(self.directory, MANIFEST)).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._manifest_mtime:
+            return
+
+        manifest = read_manifest(self.directory)
+        if manifest is None:
+            return
+        tables = {}
+        try:
+            for name in SCHEMAS:
+                with pa.memory_map(table_path(self.directory, name)) as source:
+                    tables[name] = pa.ipc.open_file(source).read_all()
+        except (OSError, pa.ArrowInvalid):
+            return
+
+        with self._lock:
+            self._tables = tables
+            self.version = manifest["version"]
+            self._manifest_mtime = mtime
+            self._stale.clear()
+
+
+# Re-exports the snapshot in the background after match writes. Requests arriving while
+# an export is pending are coalesced into it.
+class SnapshotRebuilder:
+    def __init__(self, conn, directory, delay=1.0):
+        self.conn = conn
+        self.directory = directory
+        self.delay = delay
+        self.rebuilds = 0
+        self.last_error = None
+        self._pending = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def request(self):
+        self._pending.set()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            self._pending.wait()
+            time.sleep(self.delay)
+            self._pending.clear()
+            try:
+                export(self.conn, self.directory)
+                self.rebuilds += 1
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+
+
+if __name__ == "__main__":
+    from db import connect
+
+    parser = argparse.ArgumentParser(description="Export the reference-data snapshot")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("directory")
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        print(json.dumps(export(conn, args.directory), indent=2))
+    finally:
+        conn.close()
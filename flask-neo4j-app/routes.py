@@ -0,0 +1,187 @@
+# Request handling shared by app.py (Flask) and asgi_app.py (Starlette): parameter
+# validation, the cache scope of each endpoint, the response bodies built from query
+# results and the invalidation run after a match write. The apps only differ in how
+# they read the request, reach Neo4j (sync or async driver) and build the response.
+#
+# Parameters are read from a werkzeug MultiDict (Flask's request.args, or the ASGI
+# query string wrapped in one), so a value that does not convert counts as missing.
+import config
+from cache import GLOBAL_SCOPE, league_scope, season_scope
+from ratings import METHODS as RATING_METHODS
+
+
+# Invalid query parameters or body; both apps answer 400 with {"error": message}
+class RequestError(ValueError):
+    pass
+
+
+def require(condition, message):
+    if not condition:
+        raise RequestError(message)
+
+
+# Cache scopes (ResponseCache.key)
+
+def season_of(args):
+    return season_scope(args['leagueID'], args['season'])
+
+
+def league_of(args):
+    return league_scope(args['leagueID'])
+
+
+def global_of(args):
+    return GLOBAL_SCOPE
+
+
+# Parameters
+
+def ranking_args(args):
+    league_id = args.get('leagueID', type=int)
+    season = args.get('season')
+    # Optional filters: the top N ranks (ties included) and/or one team by name
+    top = args.get('top', type=int)
+    team = args.get('team') or None
+    # Rating model: PageRank (the configured RANKING_BACKEND) or one of ratings.py
+    method = args.get('method', 'pagerank')
+    require(league_id and season, "Both 'leagueID' and 'season' parameters are required.")
+    require('top' not in args or (top is not None and top >= 1), "top must be a positive integer")
+    require(method == 'pagerank' or method in RATING_METHODS,
+            "method must be one of " + ", ".join(["pagerank"] + RATING_METHODS))
+    return league_id, season, top, team, method
+
+
+def league_arg(args):
+    league_id = args.get('leagueID', type=int)
+    require(league_id, "Missing leagueID parameter")
+    return league_id
+
+
+def head_to_head_args(args):
+    team1_id = args.get('team1_id', type=int)
+    team2_id = args.get('team2_id', type=int)
+    league_id = args.get('leagueID', type=int)
+    require(team1_id and team2_id and league_id, "'team1_id', 'team2_id' and 'leagueID' parameters are required.")
+    return league_id, team1_id, team2_id
+
+
+def matrix_args(args):
+    league_id = league_arg(args)
+    fmt = args.get('format', 'json')
+    require(fmt in ("json", "arrow"), "format must be 'json' or 'arrow'")
+    return league_id, args.get('season') or None, fmt
+
+
+def trend_args(args):
+    league_id = args.get('leagueID', type=int)
+    team_id = args.get('teamID', type=int)
+    require(league_id and team_id, "Both 'leagueID' and 'teamID' parameters are required.")
+    return league_id, team_id
+
+
+def match_id_arg(args, message="Missing matchID parameter"):
+    match_id = args.get('matchID', type=int)
+    require(match_id, message)
+    return match_id
+
+
+def matches_args(args):
+    league_id = args.get('leagueID', type=int)
+    season = args.get('season')
+    limit = args.get('limit', type=int)
+    after = args.get('after', type=int) or 0
+    require(league_id and season, "Both 'leagueID' and 'season' parameters are required.")
+    require('limit' not in args or (limit is not None and 0 < limit <= config.MAX_PAGE_SIZE),
+            f"limit must be between 1 and {config.MAX_PAGE_SIZE}")
+    return league_id, season, limit, after
+
+
+def bulk_args(args, fmt):
+    fmt = args.get('format') or fmt
+    chunk_size = args.get('chunk_size', type=int)
+    if chunk_size is None:
+        chunk_size = config.BULK_CHUNK_SIZE
+    require(fmt in ("csv", "jsonl"), "format must be 'csv' or 'jsonl'")
+    require(chunk_size >= 1, "chunk_size must be positive")
+    return fmt, chunk_size
+
+
+# ?wait= of /write_queue/jobs/<id>, at most 30 seconds
+def wait_arg(args):
+    return min(max(args.get('wait', default=0, type=float), 0), 30)
+
+
+# Registry parameters of an /add_match or /update_match body
+def match_payload(data):
+    fields = ["matchID", "winner", "loser", "winner_goals", "loser_goals", "leagueID", "season"]
+    require(data is not None and all(data.get(field) is not None for field in fields), "All fields are required")
+    return {
+        "matchID": data["matchID"],
+        "winner": data["winner"],
+        "loser": data["loser"],
+        "winnerGoals": data["winner_goals"],
+        "loserGoals": data["loser_goals"],
+        "season": data["season"],
+        "leagueID": data["leagueID"]
+    }
+
+
+# Response bodies
+
+def leagues_body(records):
+    return [{"id": league["id"], "name": league["name"]} for league in records]
+
+
+def seasons_body(records):
+    return [record["season"] for record in records]
+
+
+def trend_body(records):
+    return [
+        {
+            "season": record["season"],
+            "wins": record["wins"],
+            "losses": record["losses"],
+            "goals_for": record["goals_for"],
+            "goals_against": record["goals_against"]
+        }
+        for record in records
+    ]
+
+
+# One page of /matches?limit=; the query fetched one extra row to tell whether another follows
+def page_body(results, limit):
+    page = results[:limit]
+    return {"matches": page, "next_after": page[-1]["match_id"] if len(results) > limit else None}
+
+
+# Distinct (leagueID, season) pairs touched by a write, without the None of a missing match
+def changed_scopes(scopes):
+    return {(int(league_id), season) for league_id, season in scopes
+            if league_id is not None and season is not None}
+
+
+# Drops every piece of worker state derived from a league/season after one of its
+# matches changes
+class Invalidation:
+    def __init__(self, ranking_engine, rating_engine, matrix_cache, response_cache, flights,
+                 reference_snapshot=None, snapshot_rebuilder=None):
+        self.ranking_engine = ranking_engine
+        self.rating_engine = rating_engine
+        self.matrix_cache = matrix_cache
+        self.response_cache = response_cache
+        self.flights = flights
+        self.reference_snapshot = reference_snapshot
+        self.snapshot_rebuilder = snapshot_rebuilder
+
+    def match_changed(self, league_id, season):
+        if league_id is None or season is None:
+            return
+        self.ranking_engine.invalidate(league_id, season)
+        self.rating_engine.invalidate(league_id, season)
+        self.matrix_cache.invalidate(league_id, season)
+        self.response_cache.bump(league_id, season)
+        self.flights.forget()
+        if self.reference_snapshot:
+            self.reference_snapshot.mark_stale(league_id)
+            self.snapshot_rebuilder.request()
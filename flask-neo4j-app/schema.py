@@ -0,0 +1,138 @@
+import argparse
+import logging
+
+import config
+import match_model
+
+# Indexes the endpoint queries are written against. Relationship property indexes only
+# help when predicates compare the raw property, so queries must not wrap them in
+# toInteger(); the migration below makes leagueID and match_id integers everywhere.
+BEAT_INDEXES = {
+    "beat_match_id": "CREATE INDEX beat_match_id IF NOT EXISTS FOR ()-[r:beat]-() ON (r.match_id)",
+    "beat_league_season": "CREATE INDEX beat_league_season IF NOT EXISTS FOR ()-[r:beat]-() ON (r.leagueID, r.season)",
+    "beat_league": "CREATE INDEX beat_league IF NOT EXISTS FOR ()-[r:beat]-() ON (r.leagueID)",
+    "beat_winner": "CREATE INDEX beat_winner IF NOT EXISTS FOR ()-[r:beat]-() ON (r.winner)",
+    "beat_loser": "CREATE INDEX beat_loser IF NOT EXISTS FOR ()-[r:beat]-() ON (r.loser)",
+}
+
+INDEXES = dict(
+    match_model.INDEXES if config.DATA_MODEL == "match_nodes" else BEAT_INDEXES,
+    team_api_id="CREATE INDEX team_api_id IF NOT EXISTS FOR (t:Team) ON (t.team_api_id)",
+    team_short_name="CREATE INDEX team_short_name IF NOT EXISTS FOR (t:Team) ON (t.team_short_name)",
+    league_id="CREATE INDEX league_id IF NOT EXISTS FOR (l:League) ON (l.id)",
+    team_season_stats="CREATE INDEX team_season_stats IF NOT EXISTS FOR (s:TeamSeasonStats) ON (s.team_api_id, s.leagueID, s.season)",
+    ranking_result="CREATE INDEX ranking_result IF NOT EXISTS FOR (s:RankingResult) ON (s.leagueID, s.season)",
+)
+
+logger = logging.getLogger("neo4j_app.schema")
+
+# add_match used to write leagueID as a string while the imported data used integers.
+# Runs as an auto-commit query so CALL ... IN TRANSACTIONS can batch the rewrite.
+NORMALIZE_QUERY = """
+MATCH ()-[r:beat]->()
+WHERE NOT r.leagueID IS :: INTEGER OR NOT r.match_id IS :: INTEGER
+CALL {
+    WITH r
+    SET r.leagueID = toInteger(r.leagueID), r.match_id = toInteger(r.match_id)
+} IN TRANSACTIONS OF $batchSize ROWS
+RETURN count(r) AS updated
+"""
+
+COUNT_UNTYPED_QUERY = """
+MATCH ()-[r:beat]->()
+WHERE NOT r.leagueID IS :: INTEGER OR NOT r.match_id IS :: INTEGER
+RETURN count(r) AS untyped
+"""
+
+
+def normalize_properties(conn, batch_size=10000):
+    result = conn.query(NORMALIZE_QUERY, {"batchSize": batch_size})
+    return result[0]["updated"] if result else 0
+
+
+# beat relationships whose leagueID or match_id is still a string; the integer
+# comparisons in the endpoint queries silently skip them
+def untyped_relationships(conn):
+    if config.DATA_MODEL != "beat":
+        return 0
+    result = conn.query(COUNT_UNTYPED_QUERY)
+    return result[0]["untyped"] if result else 0
+
+
+def create_indexes(conn):
+    for statement in INDEXES.values():
+        conn.query(statement)
+    conn.query("CALL db.awaitIndexes(300)")
+
+
+# Names of the expected indexes that are missing or not yet ONLINE
+def missing_indexes(conn):
+    online = {
+        record["name"]
+        for record in conn.query("SHOW INDEXES YIELD name, state WHERE state = 'ONLINE' RETURN name")
+    }
+    return [name for name in INDEXES if name not in online]
+
+
+def migrate(conn):
+    updated = normalize_properties(conn)
+    create_indexes(conn)
+    return updated
+
+
+# Startup check used by app.py and asgi_app.py; mode is "warn", "create", "fail" or "off".
+# "create" migrates untyped relationships and creates missing indexes, "fail" raises instead
+# of starting against a schema the endpoint queries would return empty results for.
+def check_schema(conn, mode="warn"):
+    if mode == "off":
+        return []
+    try:
+        untyped = untyped_relationships(conn)
+        if untyped and mode == "create":
+            logger.warning("Normalizing %d untyped beat relationships", untyped)
+            normalize_properties(conn)
+            untyped = untyped_relationships(conn)
+        missing = missing_indexes(conn)
+        if missing and mode == "create":
+            create_indexes(conn)
+            missing = missing_indexes(conn)
+    except Exception as e:
+        if mode == "fail":
+            raise
+        logger.warning("Schema check failed: %s", e)
+        return None
+
+    problems = []
+    if untyped:
+        problems.append(f"{untyped} beat relationships with a non-integer leagueID or match_id")
+    if missing:
+        problems.append(f"missing Neo4j indexes: {', '.join(missing)}")
+    if problems:
+        message = f"{'; '.join(problems)}. Run `python schema.py migrate`."
+        if mode == "fail":
+            raise RuntimeError(f"Schema check failed: {message}")
+        logger.warning(message)
+    return missing
+
+
+if __name__ == "__main__":
+    from db import connect
+
+    parser = argparse.ArgumentParser(description="Normalize beat properties and manage indexes")
+    parser.add_argument("command", choices=["migrate", "indexes", "check"])
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        if args.command == "migrate":
+            print(f"Normalized {migrate(conn)} beat relationships; indexes created")
+        elif args.command == "indexes":
+            create_indexes(conn)
+            print("Indexes created")
+        else:
+            untyped = untyped_relationships(conn)
+            missing = missing_indexes(conn)
+            print(f"Untyped beat relationships: {untyped}")
+            print(f"Missing indexes: {', '.join(missing) if missing else 'none'}")
+    finally:
+        conn.close()
@@ -0,0 +1,207 @@
+# Request coalescing for expensive computations (/ranking, /team_trend). Concurrent calls
+# with the same key share one in-flight computation instead of each running it:
+#
+#   in a worker    followers wait for the leader's call and get its result (or exception)
+#   across workers the leader holds an flock on <lock_dir>/<key hash>.lock while it computes
+#                  and leaves the JSON result next to it; a worker that had to wait for the
+#                  lock uses that result if it was finished after the worker arrived and
+#                  started after the worker's last match write, and computes (still holding
+#                  the lock) otherwise
+#
+# Serializing identical computations across gunicorn workers also keeps them from racing
+# to create the same GDS projection. The lock files only coordinate workers on one host.
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import SINGLE_FLIGHT_CALLS
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, lock_dir="", enabled=True):
+        self.lock_dir = lock_dir
+        self.enabled = enabled
+        self._flights = {}
+        self._async_flights = {}
+        self._lock = threading.Lock()
+        # Wall-clock time of the last forget(), compared with the start time published with
+        # another worker's result (the lock files are per host, so the clocks agree)
+        self._last_write = 0.0
+        self._stats = {"leaders": 0, "coalesced": 0, "worker_waits": 0, "worker_shared": 0}
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    # Run fn() once for all concurrent calls with this key (a tuple of JSON values, the
+    # name of the computation first)
+    def do(self, key, fn):
+        if not self.enabled:
+            return fn()
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+
+        if not leader:
+            self._count(key, "coalesced")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self._across_workers(key, fn)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+
+    # asyncio counterpart of do(); fn returns an awaitable. The cross-worker lock is
+    # waited for in a thread so the event loop keeps serving other requests.
+    async def do_async(self, key, fn):
+        if not self.enabled:
+            return await fn()
+        flight = self._async_flights.get(key)
+        if flight is not None:
+            self._count(key, "coalesced")
+            return await asyncio.shield(flight)
+
+        flight = self._async_flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await self._across_workers_async(key, fn)
+            flight.set_result(value)
+            return value
+        except BaseException as e:
+            flight.set_exception(e)
+            # Retrieved here so a flight without followers does not log "never retrieved"
+            flight.exception()
+            raise
+        finally:
+            if self._async_flights.get(key) is flight:
+                del self._async_flights[key]
+
+    # Calls arriving after a match write must not share a computation started before it,
+    # in this worker or in another one
+    def forget(self):
+        with self._lock:
+            self._flights.clear()
+            self._last_write = time.time()
+        self._async_flights.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._flights) + len(self._async_flights),
+                        lock_dir=self.lock_dir or None)
+
+    def _across_workers(self, key, fn):
+        self._count(key, "leader")
+        if not self.lock_dir:
+            return fn()
+        arrived = time.time()
+        with self._worker_lock(key) as waited:
+            return self._compute_locked(key, fn, arrived, waited)
+
+    async def _across_workers_async(self, key, fn):
+        self._count(key, "leader")
+        if not self.lock_dir:
+            return await fn()
+        arrived = time.time()
+        handle, waited = await asyncio.to_thread(self._acquire, key)
+        try:
+            shared = self._shared_result(key, arrived) if waited else None
+            if shared is not None:
+                return shared["value"]
+            started = time.time()
+            value = await fn()
+            self._publish(key, value, started)
+            return value
+        finally:
+            handle.close()
+
+    def _compute_locked(self, key, fn, arrived, waited):
+        shared = self._shared_result(key, arrived) if waited else None
+        if shared is not None:
+            return shared["value"]
+        started = time.time()
+        value = fn()
+        self._publish(key, value, started)
+        return value
+
+    def _path(self, key, suffix):
+        digest = hashlib.sha1(json.dumps(key).encode()).hexdigest()
+        return os.path.join(self.lock_dir, f"{digest}{suffix}")
+
+    # Exclusive flock on the key's lock file; closing the handle releases it. Returns the
+    # handle and whether another worker held the lock when we arrived.
+    def _acquire(self, key):
+        handle = open(self._path(key, ".lock"), "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return handle, False
+        except BlockingIOError:
+            self._count(key, "worker_wait")
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            return handle, True
+        except BaseException:
+            handle.close()
+            raise
+
+    @contextmanager
+    def _worker_lock(self, key):
+        handle, waited = self._acquire(key)
+        try:
+            yield waited
+        finally:
+            handle.close()
+
+    def _shared_result(self, key, arrived):
+        try:
+            with open(self._path(key, ".json")) as f:
+                shared = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if shared.get("finished", 0) < arrived:
+            return None
+        # The leader may have read the data before a match write this worker handled since
+        with self._lock:
+            if shared.get("started", 0) <= self._last_write:
+                return None
+        self._count(key, "worker_shared")
+        return shared
+
+    def _publish(self, key, value, started):
+        path = self._path(key, ".json")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({"key": key, "started": started, "finished": time.time(), "value": value}, f)
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError):
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def _count(self, key, outcome):
+        SINGLE_FLIGHT_CALLS.inc(flight=key[0], outcome=outcome)
+        name = {"leader": "leaders", "coalesced": "coalesced", "worker_wait": "worker_waits",
+                "worker_shared": "worker_shared"}[outcome]
+        with self._lock:
+            self._stats[name] += 1
@@ -0,0 +1,79 @@
+# Chunked JSON array / NDJSON bodies built from a lazy record iterator, so a large result
+# is never held in memory as a whole. The WSGI/ASGI server only pulls the next chunk once
+# the previous one was written to the client, and the driver only fetches the next batch
+# of records (fetch size) once the current one is consumed.
+import itertools
+import json
+
+NDJSON = "application/x-ndjson"
+
+
+def wants_ndjson(fmt, accept):
+    return fmt == "ndjson" or (fmt is None and NDJSON in (accept or ""))
+
+
+def json_array(records):
+    yield "["
+    for i, record in enumerate(records):
+        yield ("," if i else "") + json.dumps(record)
+    yield "]"
+
+
+def ndjson(records):
+    for record in records:
+        yield json.dumps(record) + "\n"
+
+
+def body(records, as_ndjson=False):
+    return (ndjson if as_ndjson else json_array)(records)
+
+
+def mimetype(as_ndjson=False):
+    return NDJSON if as_ndjson else "application/json"
+
+
+# Pull the first record before the response starts, so a failing query still turns into
+# an error status instead of a truncated body
+def prime(records):
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        return iter(())
+    return itertools.chain([first], records)
+
+
+async def aprime(records):
+    records = records.__aiter__()
+    try:
+        first = await records.__anext__()
+    except StopAsyncIteration:
+        return empty()
+
+    async def chained():
+        yield first
+        async for record in records:
+            yield record
+    return chained()
+
+
+async def empty():
+    return
+    yield
+
+
+async def ajson_array(records):
+    yield "["
+    first = True
+    async for record in records:
+        yield ("" if first else ",") + json.dumps(record)
+        first = False
+    yield "]"
+
+
+async def andjson(records):
+    async for record in records:
+        yield json.dumps(record) + "\n"
+
+
+def abody(records, as_ndjson=False):
+    return (andjson if as_ndjson else ajson_array)(records)
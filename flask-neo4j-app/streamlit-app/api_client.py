@@ -0,0 +1,146 @@
+# HTTP client for the dashboard. Streamlit reruns the whole script on every widget
+# interaction, so requests go through one pooled keep-alive session (no new TLS handshake
+# per call) and GET responses are cached per endpoint with Streamlit's cache. Match writes
+# clear the caches. Leagues, seasons and teams come from the local reference snapshot, or
+# from a cached GET while the API has none.
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from reference_snapshot import LocalSnapshot
+
+# Backend Flask API URL
+BASE_URL = os.environ.get("API_BASE_URL", "https://cs6400-neo4j-soccer.onrender.com")
+
+# (connect, read) timeouts in seconds; the Render host may need a while to wake up
+TIMEOUT = (3.05, float(os.environ.get("API_READ_TIMEOUT", "30")))
+
+REFERENCE_ROUTES = {"/leagues", "/seasons", "/teams"}
+
+# Seconds before a match write shows up in the client's reference snapshot: the API's
+# re-export delay plus the export itself
+SNAPSHOT_REBUILD_WAIT = 3.0
+
+
+class ApiResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+# Raised inside the cached fetches so error responses are not cached
+class ApiError(Exception):
+    def __init__(self, response):
+        super().__init__(response.status_code)
+        self.response = response
+
+
+@st.cache_resource
+def session():
+    session = requests.Session()
+    retry = Retry(connect=2, read=0, backoff_factor=0.3, allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=16, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@st.cache_resource
+def reference_data():
+    return LocalSnapshot(BASE_URL, session=session(), timeout=TIMEOUT)
+
+
+def request(method, path, params=None, payload=None):
+    try:
+        response = session().request(method, f"{BASE_URL}{path}", params=params, json=payload, timeout=TIMEOUT)
+    except requests.RequestException as e:
+        return ApiResponse(503, {"error": str(e)})
+    try:
+        data = response.json()
+    except ValueError:
+        data = {"error": response.text}
+    return ApiResponse(response.status_code, data)
+
+
+def fetch(path, params):
+    response = request("GET", path, params)
+    if response.status_code != 200:
+        raise ApiError(response)
+    return response
+
+
+# One cache per freshness class; each is keyed by path and parameters
+@st.cache_data(ttl=300, show_spinner=False)
+def get_analysis(path, params):
+    return fetch(path, params)
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_match_data(path, params):
+    return fetch(path, params)
+
+
+# REFERENCE_ROUTES when the API serves no snapshot
+@st.cache_data(ttl=300, show_spinner=False)
+def get_reference(path, params):
+    return fetch(path, params)
+
+
+CACHES = {
+    "/ranking": get_analysis,
+    "/head_to_head": get_analysis,
+    "/team_trend": get_analysis,
+    "/matches": get_match_data,
+    "/match_stats": get_match_data,
+    "/views/rankings": get_analysis,
+    "/views/head_to_head": get_analysis,
+    "/views/team_trend": get_analysis,
+    "/views/match_editor": get_match_data,
+    "/leagues": get_reference,
+    "/seasons": get_reference,
+    "/teams": get_reference,
+}
+
+
+def get(path, **params):
+    params = {name: value for name, value in params.items() if value is not None}
+    if path in REFERENCE_ROUTES:
+        response = reference_data().get(path, params.get("leagueID"))
+        if response is not None:
+            return response
+    try:
+        return CACHES[path](path, params)
+    except ApiError as e:
+        return e.response
+
+
+# Independent GETs in parallel over the shared session, e.g.
+#   seasons, teams = get_many(("/seasons", {"leagueID": 1}), ("/teams", {"leagueID": 1}))
+def get_many(*calls):
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        return list(pool.map(lambda call: get(call[0], **call[1]), calls))
+
+
+def invalidate():
+    for cache in (get_analysis, get_match_data, get_reference):
+        cache.clear()
+    reference_data().expire(SNAPSHOT_REBUILD_WAIT)
+
+
+def put(path, payload):
+    response = request("PUT", path, payload=payload)
+    invalidate()
+    return response
+
+
+def delete(path, **params):
+    response = request("DELETE", path, params=params)
+    invalidate()
+    return response
@@ -1,10 +1,8 @@
 import streamlit as st
-import requests
 import pandas as pd
 import plotly.graph_objects as go
 
-# Backend Flask API URL
-BASE_URL = "https://cs6400-neo4j-soccer.onrender.com"  # Change if Flask runs on another host/port
+import api_client as api
 
 st.title("Soccer Data Viewer")
 
@@ -24,146 +22,109 @@ elif tab == "Data Management":
     )
 
 
+# Each page below loads all of its data with one /views/* call for the current selection.
+# Selections live in st.session_state under the widget keys; the view's selection is
+# written back first, since the API falls back to the first option for an unknown one
+# (e.g. a team of the previously selected league).
+def view_select(container, label, options, selected, key, format_func=str):
+    st.session_state[key] = selected
+    return container.selectbox(label, options, format_func=format_func, key=key)
+
+
 if selected_feature == "Team Rankings Viewer":
     st.header("Team Rankings")
-    leagues_response = requests.get(f"{BASE_URL}/leagues")
-    if leagues_response.status_code == 200:
-        leagues = leagues_response.json()
-        selected_league_seasons = selected_league_seasons = st.sidebar.selectbox(
-            "Select League",
-            options=leagues,
-            format_func=lambda league: league["name"],
-        )
+    view_response = api.get(
+        "/views/rankings",
+        leagueID=st.session_state.get("rankings_league"),
+        season=st.session_state.get("rankings_season"),
+    )
+    if view_response.status_code == 200:
+        view = view_response.json()
+        league_names = {league["id"]: league["name"] for league in view["leagues"]}
+        league_id = view_select(st.sidebar, "Select League", list(league_names), view["leagueID"],
+                                "rankings_league", league_names.get)
+        selected_season = view_select(st.sidebar, "Select Season", view["seasons"], view["season"],
+                                      "rankings_season")
+
+        # Main Rankings Table
+        if selected_season:
+            st.subheader(f"Rankings for League {league_id} ({league_names[league_id]}) - Season {selected_season}")
+            st.table(view["ranking"])
     else:
-        st.error("Error fetching leagues from the backend.")
-
-    if leagues_response.status_code == 200 and selected_league_seasons:
-        
-        league_id = selected_league_seasons["id"]
-        league_name = selected_league_seasons["name"]
-        seasons_response = requests.get(f"{BASE_URL}/seasons?leagueID={league_id}")
-        if seasons_response.status_code == 200:
-            seasons = seasons_response.json()
-            selected_season = st.sidebar.selectbox("Select Season", seasons)
-        else:
-            st.error("Error fetching seasons for the selected league.")
-
-    # Main Rankings Table
-    if leagues_response.status_code == 200 and seasons_response.status_code == 200 and selected_season:
-        rankings_response = requests.get(f"{BASE_URL}/ranking?leagueID={league_id}&season={selected_season}")
-        if rankings_response.status_code == 200:
-            rankings = rankings_response.json()
-            st.subheader(f"Rankings for League {league_id} ({league_name}) - Season {selected_season}")
-            st.table(rankings)
-        else:
-            st.error("Error fetching rankings for the selected filters.")
+        st.error("Error fetching rankings from the backend.")
 
 elif selected_feature == "Head-to-Head":
     st.header("Head-to-Head Team Comparison")
 
-    # Fetch leagues
-    leagues_response = requests.get(f"{BASE_URL}/leagues")
-    if leagues_response.status_code == 200:
-        leagues = leagues_response.json()
-        selected_league = st.sidebar.selectbox(
-            "Select League",
-            options=leagues,
-            format_func=lambda league: league["name"],  # Display only the name
-        )
-    else:
-        st.error("Error fetching leagues from the backend.")
-
-    # Fetch teams dynamically based on the selected league
-    if leagues_response.status_code == 200 and selected_league:
-        league_id = selected_league["id"]
-        teams_response = requests.get(f"{BASE_URL}/teams?leagueID={league_id}")
-        if teams_response.status_code == 200:
-            teams = teams_response.json()
-            # Dropdown for Team 1
-            team1 = st.selectbox(
-                "Select Team 1",
-                teams,
-                format_func=lambda x: x["team_long_name"]
-            )
+    view_response = api.get(
+        "/views/head_to_head",
+        leagueID=st.session_state.get("h2h_league"),
+        team1_id=st.session_state.get("h2h_team1"),
+        team2_id=st.session_state.get("h2h_team2"),
+    )
+    if view_response.status_code == 200:
+        view = view_response.json()
+        league_names = {league["id"]: league["name"] for league in view["leagues"]}
+        team_names = {team["id"]: team["team_long_name"] for team in view["teams"]}
+        view_select(st.sidebar, "Select League", list(league_names), view["leagueID"],
+                    "h2h_league", league_names.get)
 
-            # Filter the list for Team 2 to exclude the selected Team 1
-            filtered_teams = [team for team in teams if team["id"] != team1["id"]]
+        # Dropdown for Team 1
+        team1 = view_select(st, "Select Team 1", list(team_names), view["team1_id"], "h2h_team1", team_names.get)
 
-            # Dropdown for Team 2
-            team2 = st.selectbox(
-                "Select Team 2",
-                filtered_teams,
-                format_func=lambda x: x["team_long_name"]
-            )
-        else:
-            st.error("Error fetching teams for the selected league.")
+        # Dropdown for Team 2, excluding the selected Team 1
+        team2 = view_select(st, "Select Team 2", [team for team in team_names if team != team1],
+                            view["team2_id"], "h2h_team2", team_names.get)
 
         # Compare teams if both are selected
         if team1 and team2:
-            response = requests.get(f"{BASE_URL}/head_to_head?team1_id={team1['id']}&team2_id={team2['id']}&leagueID={league_id}")
-            if response.status_code == 200:
-                stats = response.json()
-                if not stats:
-                    st.warning(f"No matches played between {team1['team_long_name']} and {team2['team_long_name']} yet.")
-                else:
-                    team1_name = team1['team_long_name']
-                    team2_name = team2['team_long_name']
-
-                    total_matches = stats['team1_wins'] + stats['team2_wins'] + stats['ties']
-
-                    st.subheader(f"Head-to-Head: {team1_name} vs {team2_name}")
-
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.metric(label=f"{team1_name} Wins", value=stats['team1_wins'])
-                    with col2:
-                        st.metric(label="Ties", value=stats['ties'])
-                    with col3:
-                        st.metric(label=f"{team2_name} Wins", value=stats['team2_wins'])
-
-                    st.write(f"Total Matches Played: {total_matches}")
+            stats = view["head_to_head"]
+            team1_name = team_names[team1]
+            team2_name = team_names[team2]
+            if not stats:
+                st.warning(f"No matches played between {team1_name} and {team2_name} yet.")
             else:
-                st.error("Error fetching head-to-head comparison.")
-
-elif selected_feature == "Team Trend Viewer":
-    st.header("Team Performance Trend")
+                total_matches = stats['team1_wins'] + stats['team2_wins'] + stats['ties']
 
-    # Fetch leagues
-    leagues_response = requests.get(f"{BASE_URL}/leagues")
-    if leagues_response.status_code == 200:
-        leagues = leagues_response.json()
-        selected_league = st.sidebar.selectbox(
-            "Select League",
-            options=leagues,
-            format_func=lambda league: league["name"],  # Display only the name
-        )
-    else:
-        st.error("Error fetching leagues from the backend.")
+                st.subheader(f"Head-to-Head: {team1_name} vs {team2_name}")
 
-    # Fetch teams dynamically based on the selected league
-    if leagues_response.status_code == 200 and selected_league:
-        league_id = selected_league["id"]
-        teams_response = requests.get(f"{BASE_URL}/teams?leagueID={league_id}")
-        if teams_response.status_code == 200:
-            teams = teams_response.json()
-            selected_team = st.sidebar.selectbox(
-                "Select Team",
-                options=teams,
-                format_func=lambda x: x["team_long_name"]
-            )
-        else:
-            st.error("Error fetching teams for the selected league.")
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric(label=f"{team1_name} Wins", value=stats['team1_wins'])
+                with col2:
+                    st.metric(label="Ties", value=stats['ties'])
+                with col3:
+                    st.metric(label=f"{team2_name} Wins", value=stats['team2_wins'])
 
-    # Fetch and plot team trends
-    if selected_team:
-        team_id = selected_team["id"]
-        trend_response = requests.get(f"{BASE_URL}/team_trend?leagueID={league_id}&teamID={team_id}")
-        if trend_response.status_code == 200:
-            trend_data = trend_response.json()
+                st.write(f"Total Matches Played: {total_matches}")
+    else:
+        st.error("Error fetching head-to-head comparison.")
 
-            trend_df = pd.DataFrame(trend_data)
+elif selected_feature == "Team Trend Viewer":
+    st.header("Team Performance Trend")
 
-            st.subheader(f"Performance Trends for {selected_team['team_long_name']}")
+    view_response = api.get(
+        "/views/team_trend",
+        leagueID=st.session_state.get("trend_league"),
+        teamID=st.session_state.get("trend_team"),
+    )
+    if view_response.status_code == 200:
+        view = view_response.json()
+        league_names = {league["id"]: league["name"] for league in view["leagues"]}
+        team_names = {team["id"]: team["team_long_name"] for team in view["teams"]}
+        view_select(st.sidebar, "Select League", list(league_names), view["leagueID"],
+                    "trend_league", league_names.get)
+        team_id = view_select(st.sidebar, "Select Team", list(team_names), view["teamID"],
+                              "trend_team", team_names.get)
+
+        # Plot team trends
+        if team_id and not view["trend"]:
+            st.warning("No data found for the specified team and league.")
+        elif team_id:
+            team_name = team_names[team_id]
+            trend_df = pd.DataFrame(view["trend"])
+
+            st.subheader(f"Performance Trends for {team_name}")
 
             fig = go.Figure()
 
@@ -185,7 +146,7 @@ elif selected_feature == "Team Trend Viewer":
             ))
 
             fig.update_layout(
-                title=f"Performance Trends: {selected_team['team_long_name']}",
+                title=f"Performance Trends: {team_name}",
                 xaxis_title="Season",
                 yaxis_title="Count",
                 legend_title="Metrics",
@@ -195,99 +156,75 @@ elif selected_feature == "Team Trend Viewer":
             )
 
             st.plotly_chart(fig)
-        else:
-            st.error("Error fetching performance trends.")
+    else:
+        st.error("Error fetching performance trends.")
 
 elif selected_feature == "Update Match":
     st.header("Update Match Details")
 
-    # Fetch leagues
-    leagues_response = requests.get(f"{BASE_URL}/leagues")
-    if leagues_response.status_code == 200:
-        leagues = leagues_response.json()
-        selected_league = st.sidebar.selectbox(
-            "Select League",
-            options=leagues,
-            format_func=lambda league: league["name"],
-        )
+    view_response = api.get(
+        "/views/match_editor",
+        leagueID=st.session_state.get("editor_league"),
+        season=st.session_state.get("editor_season"),
+        matchID=st.session_state.get("editor_match"),
+    )
+    if view_response.status_code == 200:
+        view = view_response.json()
+        league_names = {league["id"]: league["name"] for league in view["leagues"]}
+        league_id = view_select(st.sidebar, "Select League", list(league_names), view["leagueID"],
+                                "editor_league", league_names.get)
+        selected_season = view_select(st.sidebar, "Select Season", view["seasons"], view["season"],
+                                      "editor_season")
+        match_id = view_select(st.sidebar, "Select Match ID", [match["match_id"] for match in view["matches"]],
+                               view["matchID"], "editor_match")
+
+        match_stats = view["match_stats"]
+        if match_id and match_stats:
+            # Display current match stats
+            st.subheader("Current Match Details")
+            winner = st.text_input("Winner", match_stats["winner"], disabled=True)
+            loser = st.text_input("Loser", match_stats["loser"], disabled=True)
+            winner_goals = st.number_input("Winner Goals", value=match_stats["winner_goals"], min_value=0)
+            loser_goals = st.number_input("Loser Goals", value=match_stats["loser_goals"], min_value=0)
+
+            col1, col2 = st.columns(2)
+
+            # Update match details
+            with col1:
+                if st.button("Submit Updates"):
+                    update_payload = {
+                        "matchID": match_id,
+                        "winner": winner,
+                        "loser": loser,
+                        "winner_goals": winner_goals,
+                        "loser_goals": loser_goals,
+                        "leagueID": league_id,
+                        "season": selected_season
+                    }
+                    update_response = api.put("/update_match", update_payload)
+                    if update_response.status_code == 200:
+                        st.success("Match details updated successfully.")
+                    else:
+                        st.error("Error updating match details.")
+
+            with col2:
+                if st.button("Delete Match"):
+                    delete_response = api.delete("/delete_match", matchID=match_id)
+                    if delete_response.status_code == 200:
+                        st.success("Match deleted successfully.")
+                    else:
+                        st.error(f"Error deleting match: {delete_response.json().get('error')}")
+        elif match_id:
+            st.error("Error fetching match stats.")
     else:
-        st.error("Error fetching leagues from the backend.")
-
-    if selected_league:
-        league_id = selected_league["id"]
-
-        # Fetch seasons for the league
-        seasons_response = requests.get(f"{BASE_URL}/seasons?leagueID={league_id}")
-        if seasons_response.status_code == 200:
-            seasons = seasons_response.json()
-            selected_season = st.sidebar.selectbox("Select Season", seasons)
-        else:
-            st.error("Error fetching seasons.")
-
-        if selected_season:
-            # Fetch match IDs for the league and season
-            match_response = requests.get(f"{BASE_URL}/matches?leagueID={league_id}&season={selected_season}")
-            if match_response.status_code == 200:
-                matches = match_response.json()
-                selected_match = st.sidebar.selectbox(
-                    "Select Match ID",
-                    matches,
-                    format_func=lambda x: f"{x['match_id']}"
-                )
-            else:
-                st.error("Error fetching matches.")
-
-            if selected_match:
-                match_id = selected_match["match_id"]
-
-                # Fetch match stats for the selected match
-                match_stats_response = requests.get(f"{BASE_URL}/match_stats?matchID={match_id}")
-                if match_stats_response.status_code == 200:
-                    match_stats = match_stats_response.json()
-
-                    # Display current match stats
-                    st.subheader("Current Match Details")
-                    winner = st.text_input("Winner", match_stats["winner"], disabled=True)
-                    loser = st.text_input("Loser", match_stats["loser"], disabled=True)
-                    winner_goals = st.number_input("Winner Goals", value=match_stats["winner_goals"], min_value=0)
-                    loser_goals = st.number_input("Loser Goals", value=match_stats["loser_goals"], min_value=0)
-
-                    col1, col2 = st.columns(2)
-
-                    # Update match details
-                    with col1:
-                        if st.button("Submit Updates"):
-                            update_payload = {
-                                "matchID": match_id,
-                                "winner": winner,
-                                "loser": loser,
-                                "winner_goals": winner_goals,
-                                "loser_goals": loser_goals,
-                                "leagueID": league_id,
-                                "season": selected_season
-                            }
-                            update_response = requests.put(f"{BASE_URL}/update_match", json=update_payload)
-                            if update_response.status_code == 200:
-                                st.success("Match details updated successfully.")
-                            else:
-                                st.error("Error updating match details.")
-                    
-                    with col2:
-                        if st.button("Delete Match"):
-                            delete_response = requests.delete(f"{BASE_URL}/delete_match?matchID={match_id}")
-                            if delete_response.status_code == 200:
-                                st.success("Match deleted successfully.")
-                            else:
-                                st.error(f"Error deleting match: {delete_response.json().get('error')}")
-                else:
-                    st.error("Error fetching match stats.")
+        st.error("Error fetching matches.")
 
 
 elif selected_feature == "Add Match":
     st.header("Add Match")
 
     # Fetch leagues
-    leagues_response = requests.get(f"{BASE_URL}/leagues")
+    leagues_response = api.get("/leagues")
     if leagues_response.status_code == 200:
         leagues = leagues_response.json()
         selected_league = st.selectbox(
@@ -301,7 +238,10 @@ elif selected_feature == "Add Match":
     # Fetch seasons dynamically based on the selected league
     if leagues_response.status_code == 200 and selected_league:
         league_id = selected_league["id"]
-        seasons_response = requests.get(f"{BASE_URL}/seasons?leagueID={league_id}")
+        # Seasons and teams only depend on the league, so fetch both at once
+        seasons_response, teams_response = api.get_many(
+            ("/seasons", {"leagueID": league_id}), ("/teams", {"leagueID": league_id})
+        )
         if seasons_response.status_code == 200:
             seasons = seasons_response.json()
             selected_season = st.selectbox("Select Season", seasons)
@@ -310,7 +250,6 @@ elif selected_feature == "Add Match":
 
     # Fetch teams dynamically based on the selected league and season
     if selected_season:
-        teams_response = requests.get(f"{BASE_URL}/teams?leagueID={league_id}")
         if teams_response.status_code == 200:
             teams = teams_response.json()
 
@@ -350,7 +289,7 @@ elif selected_feature == "Add Match":
                 "leagueID": league_id,
                 "season": selected_season
             }
-            add_response = requests.put(f"{BASE_URL}/add_match", json=add_payload)
+            add_response = api.put("/add_match", add_payload)
             if add_response.status_code == 200:
                 st.success("Match added successfully.")
             else:
@@ -0,0 +1,133 @@
+# Local copy of the API's reference-data snapshot (GET /reference/snapshot), so the
+# league/season/team pickers read memory-mapped Arrow files instead of calling the API on
+# every rerun. The copy is refreshed when the API's snapshot version changes, checked at
+# most every REFERENCE_REFRESH_SECONDS. Without a snapshot on the API, get() returns None
+# and the caller uses the plain routes. Each process keeps its copies in its own
+# subdirectory, so it never deletes files another Streamlit process has mapped.
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import requests
+
+TABLES = ["leagues", "teams", "league_seasons", "league_teams"]
+
+CACHE_DIR = os.environ.get("REFERENCE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "soccer_reference"))
+REFRESH_SECONDS = float(os.environ.get("REFERENCE_REFRESH_SECONDS", "60"))
+
+
+# Stand-in for a requests.Response from the snapshot, for the callers' status checks
+class SnapshotResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class LocalSnapshot:
+    def __init__(self, base_url, directory=CACHE_DIR, refresh_seconds=REFRESH_SECONDS, session=None, timeout=30):
+        self.base_url = base_url
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.root = directory
+        self.directory = os.path.join(directory, f"pid{os.getpid()}")
+        self.refresh_seconds = refresh_seconds
+        self.version = None
+        self._tables = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, route, league_id=None):
+        tables = self._current()
+        if tables is None:
+            return None
+        if route == "/leagues":
+            return SnapshotResponse(tables["leagues"].to_pylist())
+        if route == "/seasons":
+            return SnapshotResponse(self._seasons(tables, league_id))
+        if route == "/teams":
+            return SnapshotResponse(self._teams(tables, league_id))
+        raise ValueError(f"Not a reference-data route: {route}")
+
+    # Check the API's version again after `delay` seconds instead of the refresh interval,
+    # e.g. once a match write had time to trigger the re-export
+    def expire(self, delay=0.0):
+        with self._lock:
+            self._checked = time.monotonic() - self.refresh_seconds + delay
+
+    def _seasons(self, tables, league_id):
+        mapping = tables["league_seasons"]
+        return sorted(mapping.filter(pc.equal(mapping["leagueID"], int(league_id)))["season"].to_pylist())
+
+    def _teams(self, tables, league_id):
+        mapping = tables["league_teams"]
+        team_ids = mapping.filter(pc.equal(mapping["leagueID"], int(league_id)))["team_api_id"]
+        teams = tables["teams"]
+        teams = teams.filter(pc.is_in(teams["team_api_id"], value_set=team_ids.combine_chunks()))
+        rows = [{"id": row["team_api_id"], "team_long_name": row["team_long_name"],
+                 "team_short_name": row["team_short_name"]} for row in teams.to_pylist()]
+        return sorted(rows, key=lambda row: row["team_long_name"] or "")
+
+    def _current(self):
+        with self._lock:
+            if time.monotonic() - self._checked >= self.refresh_seconds:
+                self._checked = time.monotonic()
+                try:
+                    self._refresh()
+                except (requests.RequestException, OSError, pa.ArrowInvalid, ValueError):
+                    # Keep serving the copy we have; without one, fall back to the API
+                    pass
+            return self._tables
+
+    def _refresh(self):
+        response = self.session.get(f"{self.base_url}/reference/snapshot", timeout=self.timeout)
+        if response.status_code != 200:
+            self._tables = None
+            return
+        version = response.json()["version"]
+        if version == self.version:
+            return
+
+        directory = os.path.join(self.directory, str(version))
+        if not os.path.exists(os.path.join(directory, "manifest.json")):
+            os.makedirs(directory, exist_ok=True)
+            for name in TABLES:
+                table = self.session.get(f"{self.base_url}/reference/snapshot/{name}", timeout=self.timeout)
+                table.raise_for_status()
+                with open(os.path.join(directory, f"{name}.arrow"), "wb") as f:
+                    f.write(table.content)
+            with open(os.path.join(directory, "manifest.json"), "w") as f:
+                json.dump(response.json(), f)
+
+        tables = {}
+        for name in TABLES:
+            with pa.memory_map(os.path.join(directory, f"{name}.arrow")) as source:
+                tables[name] = pa.ipc.open_file(source).read_all()
+        self._tables = tables
+        self.version = version
+
+        # Our older copies are no longer read (mapped files stay valid after unlinking)
+        for entry in os.listdir(self.directory):
+            if entry != str(version):
+                shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+        self._remove_exited()
+
+    # Copies left behind by processes that have exited
+    def _remove_exited(self):
+        for entry in os.listdir(self.root):
+            if not entry.startswith("pid") or not entry[3:].isdigit():
+                continue
+            try:
+                os.kill(int(entry[3:]), 0)
+            except ProcessLookupError:
+                shutil.rmtree(os.path.join(self.root, entry), ignore_errors=True)
+            except OSError:
+                pass
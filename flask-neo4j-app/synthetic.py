@@ -0,0 +1,138 @@
+# Synthetic stand-in for the European Soccer Database the Aura instance was loaded from:
+# leagues with a double round robin per season, three teams relegated and replaced
+# every season, and Poisson-distributed goals with a home advantage.
+#
+#   python synthetic.py --leagues 11 --seasons 8 --teams 20 > matches.jsonl
+import argparse
+import json
+import string
+
+import numpy as np
+
+# League ids and names of the original dataset, used for the first leagues generated
+LEAGUES = [
+    (1, "Belgium Jupiler League"),
+    (1729, "England Premier League"),
+    (4769, "France Ligue 1"),
+    (7809, "Germany 1. Bundesliga"),
+    (10257, "Italy Serie A"),
+    (13274, "Netherlands Eredivisie"),
+    (15722, "Poland Ekstraklasa"),
+    (17642, "Portugal Liga ZON Sagres"),
+    (19694, "Scotland Premier League"),
+    (21518, "Spain LIGA BBVA"),
+    (24558, "Switzerland Super League"),
+]
+
+FIRST_SEASON = 2008
+RELEGATED = 3
+HOME_GOALS = 1.45
+AWAY_GOALS = 1.15
+
+
+def short_name(index):
+    letters = string.ascii_uppercase
+    return letters[index // 676 % 26] + letters[index // 26 % 26] + letters[index % 26]
+
+
+def season_name(year):
+    return f"{year}/{year + 1}"
+
+
+# Generated leagues, teams and matches as plain rows. Matches use the /add_match fields.
+class Dataset:
+    def __init__(self):
+        self.leagues = []
+        self.teams = []
+        self.matches = []
+
+
+def generate(leagues=11, seasons=8, teams=20, seed=0):
+    rng = np.random.default_rng(seed)
+    dataset = Dataset()
+    match_id = 1
+    team_index = 0
+
+    for number in range(leagues):
+        league_id, name = LEAGUES[number] if number < len(LEAGUES) else (30000 + number, f"Synthetic League {number + 1}")
+        dataset.leagues.append({"id": league_id, "name": name})
+
+        # Enough teams for every season's promotions
+        pool = []
+        for _ in range(teams + RELEGATED * max(seasons - 1, 0)):
+            short = short_name(team_index)
+            pool.append({
+                "team_api_id": 10000 + team_index,
+                "team_long_name": f"{name.split()[0]} {short} Club",
+                "team_short_name": short,
+            })
+            team_index += 1
+        dataset.teams.extend(pool)
+        strength = rng.normal(0.0, 0.3, len(pool))
+
+        playing = list(range(teams))
+        waiting = list(range(teams, len(pool)))
+        for year in range(FIRST_SEASON, FIRST_SEASON + seasons):
+            points = dict.fromkeys(playing, 0)
+            for home in playing:
+                for away in playing:
+                    if home == away:
+                        continue
+                    diff = strength[home] - strength[away]
+                    home_goals = int(rng.poisson(HOME_GOALS * np.exp(diff)))
+                    away_goals = int(rng.poisson(AWAY_GOALS * np.exp(-diff)))
+                    dataset.matches.append(match_row(match_id, league_id, season_name(year),
+                                                     pool[home], pool[away], home_goals, away_goals))
+                    match_id += 1
+                    if home_goals > away_goals:
+                        points[home] += 3
+                    elif home_goals < away_goals:
+                        points[away] += 3
+                    else:
+                        points[home] += 1
+                        points[away] += 1
+
+            # Bottom of the table makes way for the teams that waited longest
+            relegated = sorted(playing, key=lambda team: points[team])[:min(RELEGATED, len(waiting))]
+            promoted = waiting[:len(relegated)]
+            playing = [team for team in playing if team not in relegated] + promoted
+            waiting = waiting[len(relegated):] + relegated
+
+    return dataset
+
+
+# Winner and loser are short names; a draw is stored with winner = loser = "tie"
+def match_row(match_id, league_id, season, home, away, home_goals, away_goals):
+    if home_goals > away_goals:
+        winner, loser, winner_goals, loser_goals = home, away, home_goals, away_goals
+    elif away_goals > home_goals:
+        winner, loser, winner_goals, loser_goals = away, home, away_goals, home_goals
+    else:
+        winner = loser = None
+        winner_goals = loser_goals = home_goals
+    return {
+        "matchID": match_id,
+        "winner": winner["team_short_name"] if winner else "tie",
+        "loser": loser["team_short_name"] if loser else "tie",
+        "winner_goals": winner_goals,
+        "loser_goals": loser_goals,
+        "leagueID": league_id,
+        "season": season,
+        # Endpoints of the beat edge: the loser (away team on a draw) points to the winner
+        "source_id": (loser or away)["team_api_id"],
+        "target_id": (winner or home)["team_api_id"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic match set as JSON Lines")
+    parser.add_argument("--leagues", type=int, default=11)
+    parser.add_argument("--seasons", type=int, default=8)
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    dataset = generate(args.leagues, args.seasons, args.teams, args.seed)
+    for match in dataset.matches:
+        print(json.dumps({field: match[field] for field in
+                          ["matchID", "winner", "loser", "winner_goals", "loser_goals", "leagueID", "season"]}))
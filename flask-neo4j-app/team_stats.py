@@ -0,0 +1,62 @@
+# Maintenance for the TeamSeasonStats rows behind /team_trend.
+#
+#   python team_stats.py rebuild   # recompute every row from the beat edges; /team_trend
+#                                  # scans the edges until this has run once
+#   python team_stats.py check     # compare stored rows with the beat edges
+import argparse
+import json
+
+FIELDS = ["matches", "wins", "losses", "goals_for", "goals_against"]
+
+
+def key(row):
+    return (row["team_api_id"], row["leagueID"], row["season"])
+
+
+def rebuild(conn):
+    rows = conn.run("team_stats_from_edges")
+    conn.run_many([
+        ("team_stats_clear", None),
+        ("team_stats_load", {"rows": rows}),
+        ("team_stats_mark_built", None),
+    ])
+    return len(rows)
+
+
+# Rows whose stored totals differ from a fresh recomputation, including rows that are
+# missing on either side
+def check(conn):
+    expected = {key(row): row for row in conn.run("team_stats_from_edges")}
+    stored = {key(row): row for row in conn.run("team_stats_all")}
+
+    mismatches = []
+    for k in expected.keys() | stored.keys():
+        want, have = expected.get(k), stored.get(k)
+        if want is None or have is None or any(want[f] != have[f] for f in FIELDS):
+            mismatches.append({
+                "team_api_id": k[0],
+                "leagueID": k[1],
+                "season": k[2],
+                "expected": {f: want[f] for f in FIELDS} if want else None,
+                "stored": {f: have[f] for f in FIELDS} if have else None,
+            })
+    return mismatches
+
+
+if __name__ == "__main__":
+    from db import connect
+
+    parser = argparse.ArgumentParser(description="Rebuild or check the TeamSeasonStats rows")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        if args.command == "rebuild":
+            print(f"Rebuilt {rebuild(conn)} TeamSeasonStats rows")
+        else:
+            mismatches = check(conn)
+            print(json.dumps(mismatches, indent=2))
+            print(f"{len(mismatches)} inconsistent rows")
+    finally:
+        conn.close()
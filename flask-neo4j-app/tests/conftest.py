@@ -0,0 +1,149 @@
+# The suite runs on DB_BACKEND=memory over a small synthetic dataset, so it needs no
+# database or network. config.py reads the environment once, at import, so it is set
+# here before any application module is imported.
+import itertools
+import os
+import tempfile
+
+import pytest
+
+STATE_DIR = tempfile.mkdtemp(prefix="neo4j_app_tests_")
+
+os.environ.update({
+    "DB_BACKEND": "memory",
+    "SYNTHETIC_LEAGUES": "2",
+    "SYNTHETIC_SEASONS": "3",
+    "SYNTHETIC_TEAMS": "6",
+    "SYNTHETIC_SEED": "0",
+    "WARMUP_ENABLED": "0",
+    "WARMUP_STATS_FILE": os.path.join(STATE_DIR, "hot_seasons.json"),
+    "SINGLE_FLIGHT_LOCK_DIR": os.path.join(STATE_DIR, "flights"),
+    "WRITE_QUEUE_ENABLED": "0",
+    "WRITE_QUEUE_DIR": os.path.join(STATE_DIR, "write_queue"),
+    "REFERENCE_SNAPSHOT": "",
+    "ANALYTICS_PARQUET": "",
+    "CACHE_BACKEND": "memory",
+})
+
+# Match ids above every generated one; each test takes fresh ones since the dataset is
+# shared by the whole session
+_match_ids = itertools.count(9_000_000)
+
+
+class Reply:
+    def __init__(self, status_code, body, headers):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers
+
+
+# The Flask test client and the Starlette one behind the same calls
+class Api:
+    def __init__(self, name, client):
+        self.name = name
+        self.client = client
+
+    def request(self, method, path, json=None, headers=None, data=None):
+        kwargs = {"headers": headers or {}}
+        if json is not None:
+            kwargs["json"] = json
+        if data is not None:
+            kwargs["data" if self.name == "flask" else "content"] = data
+        response = self.client.open(path, method=method, **kwargs) if self.name == "flask" \
+            else self.client.request(method, path, **kwargs)
+        try:
+            body = response.get_json() if self.name == "flask" else response.json()
+        except ValueError:
+            body = None
+        return Reply(response.status_code, body, response.headers)
+
+    def get(self, path, headers=None):
+        return self.request("GET", path, headers=headers)
+
+    def put(self, path, json):
+        return self.request("PUT", path, json=json)
+
+    def post(self, path, data, headers=None):
+        return self.request("POST", path, data=data, headers=headers)
+
+    def delete(self, path):
+        return self.request("DELETE", path)
+
+
+@pytest.fixture(scope="session")
+def flask_module():
+    import app
+    return app
+
+
+@pytest.fixture(scope="session")
+def asgi_module():
+    import asgi_app
+    return asgi_app
+
+
+@pytest.fixture(scope="session")
+def asgi_client(asgi_module):
+    from starlette.testclient import TestClient
+    with TestClient(asgi_module.app) as client:
+        yield client
+
+
+@pytest.fixture
+def client(flask_module):
+    return Api("flask", flask_module.app.test_client())
+
+
+@pytest.fixture
+def asgi(asgi_client):
+    return Api("asgi", asgi_client)
+
+
+@pytest.fixture(params=["flask", "asgi"])
+def api(request, flask_module):
+    if request.param == "flask":
+        return Api("flask", flask_module.app.test_client())
+    return Api("asgi", request.getfixturevalue("asgi_client"))
+
+
+@pytest.fixture(scope="session")
+def graph():
+    import memory_db
+    return memory_db.shared_graph()
+
+
+@pytest.fixture(scope="session")
+def conn(graph):
+    import memory_db
+    return memory_db.MemoryConnection(graph)
+
+
+# A league with its latest season and two of that season's teams
+@pytest.fixture(scope="session")
+def season(graph):
+    league_id = next(iter(graph.leagues))
+    name = max(season for league, season in graph.edges_by_season if league == league_id)
+    edge = graph.season_edges(league_id, name)[0]
+    home, away = graph.teams[edge["target_id"]], graph.teams[edge["source_id"]]
+    return {"leagueID": league_id, "season": name, "home": home, "away": away}
+
+
+@pytest.fixture
+def new_match_id():
+    return lambda: next(_match_ids)
+
+
+# /add_match and /update_match body for a match of the season fixture, home team winning
+@pytest.fixture
+def match_body(season):
+    def body(match_id, winner=None, loser=None, winner_goals=2, loser_goals=1):
+        return {
+            "matchID": match_id,
+            "winner": winner or season["home"]["team_short_name"],
+            "loser": loser or season["away"]["team_short_name"],
+            "winner_goals": winner_goals,
+            "loser_goals": loser_goals,
+            "leagueID": season["leagueID"],
+            "season": season["season"],
+        }
+    return body
@@ -0,0 +1,85 @@
+# Response cache: version bumps on match writes and conditional GETs
+import time
+
+from cache import NOT_MODIFIED, MemoryBackend, ResponseCache, ScopeVersions, season_scope
+
+
+def test_scope_versions_follow_bumps():
+    backend = MemoryBackend()
+    versions = ScopeVersions(backend)
+    cache = ResponseCache(backend)
+    stamp = versions.stamp(season_scope(1, "2015/2016"))
+    assert versions.fresh(season_scope(1, "2015/2016"), stamp)
+
+    cache.bump(1, "2014/2015")
+    assert versions.fresh(season_scope(1, "2015/2016"), stamp)
+    cache.bump(1, "2015/2016")
+    assert not versions.fresh(season_scope(1, "2015/2016"), stamp)
+
+
+def test_scope_versions_expire():
+    versions = ScopeVersions(ttl=0.01)
+    stamp = versions.stamp("scope")
+    time.sleep(0.02)
+    assert not versions.fresh("scope", stamp)
+
+
+def test_not_modified_needs_a_live_entry():
+    cache = ResponseCache(MemoryBackend(ttl=0.05))
+    assert cache.lookup("key", etag_matched=True) is None
+    cache.store("key", "[]")
+    assert cache.lookup("key", etag_matched=True) is NOT_MODIFIED
+    assert cache.lookup("key") == "[]"
+    time.sleep(0.06)
+    assert cache.lookup("key", etag_matched=True) is None
+
+
+def test_conditional_get_and_bump(api, season, new_match_id, match_body):
+    path = f"/ranking?leagueID={season['leagueID']}&season={season['season']}"
+    first = api.get(path)
+    etag = first.headers["ETag"]
+
+    cached = api.get(path)
+    assert cached.body == first.body and cached.headers["ETag"] == etag
+    assert api.get(path, headers={"If-None-Match": etag}).status_code == 304
+
+    other_league = next(league for league in api.get("/leagues").body if league["id"] != season["leagueID"])
+    other_path = f"/seasons?leagueID={other_league['id']}"
+    other_etag = api.get(other_path).headers["ETag"]
+
+    # A write in the season changes its ETag; other leagues keep theirs
+    assert api.put("/add_match", match_body(new_match_id())).status_code == 200
+    changed = api.get(path, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.body != first.body
+    assert api.get(other_path, headers={"If-None-Match": other_etag}).status_code == 304
+
+
+def test_cache_stats_count_lookups(client, season):
+    before = client.get("/cache/stats").body
+    path = f"/teams?leagueID={season['leagueID']}"
+    client.get(path)
+    client.get(path)
+    after = client.get("/cache/stats").body
+    assert after["hits"] + after["misses"] == before["hits"] + before["misses"] + 2
+    assert after["hits"] >= before["hits"] + 1
+
+
+def test_streamed_matches_answer_conditional_requests(api, season, new_match_id, match_body):
+    path = f"/matches?leagueID={season['leagueID']}&season={season['season']}"
+    first = api.get(path)
+    etag = first.headers["ETag"]
+    assert api.get(path, headers={"If-None-Match": etag}).status_code == 304
+
+    # Other representations of the list carry their own ETag
+    ndjson = api.get(path, headers={"Accept": "application/x-ndjson"})
+    assert ndjson.headers["ETag"] != etag
+
+    # The list itself is never stored: a plain request streams it again
+    again = api.get(path)
+    assert again.status_code == 200 and again.body == first.body
+
+    assert api.put("/add_match", match_body(new_match_id())).status_code == 200
+    changed = api.get(path, headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
@@ -0,0 +1,104 @@
+# Match writes and the TeamSeasonStats deltas applied with them
+import pytest
+
+import memory_db
+import mutations
+import team_stats
+from queries import QueryParameterError
+
+
+def stats_row(graph, team, season):
+    return dict(graph.stats.get((team["team_api_id"], season["leagueID"], season["season"])) or {})
+
+
+@pytest.fixture
+def totals(graph, season):
+    return lambda: (stats_row(graph, season["home"], season), stats_row(graph, season["away"], season))
+
+
+def test_add_applies_deltas(client, conn, season, totals, new_match_id, match_body):
+    (home, away) = totals()
+    assert client.put("/add_match", match_body(new_match_id(), winner_goals=3, loser_goals=1)).status_code == 200
+    (new_home, new_away) = totals()
+
+    assert new_home["matches"] == home["matches"] + 1
+    assert new_home["wins"] == home["wins"] + 1
+    assert new_home["goals_for"] == home["goals_for"] + 3
+    assert new_home["goals_against"] == home["goals_against"] + 1
+    assert new_away["losses"] == away["losses"] + 1
+    assert new_away["goals_for"] == away["goals_for"] + 1
+    assert team_stats.check(conn) == []
+
+
+def test_update_and_delete_revert_deltas(client, conn, season, totals, new_match_id, match_body):
+    before = totals()
+    match_id = new_match_id()
+    client.put("/add_match", match_body(match_id))
+
+    # The away team now wins 4-0: the old result is removed before the new one is added
+    swapped = match_body(match_id, winner=season["away"]["team_short_name"],
+                         loser=season["home"]["team_short_name"], winner_goals=4, loser_goals=0)
+    assert client.put("/update_match", swapped).status_code == 200
+    (home, away) = totals()
+    assert home["wins"] == before[0]["wins"]
+    assert home["losses"] == before[0]["losses"] + 1
+    assert away["goals_for"] == before[1]["goals_for"] + 4
+    assert team_stats.check(conn) == []
+
+    assert client.delete(f"/delete_match?matchID={match_id}").status_code == 200
+    assert totals() == before
+    assert team_stats.check(conn) == []
+
+
+def test_bad_value_writes_nothing(client, graph, totals, new_match_id, match_body):
+    before, edges = totals(), len(graph.edges)
+    assert client.put("/add_match", match_body(new_match_id(), loser_goals="one")).status_code == 400
+    with pytest.raises(QueryParameterError):
+        mutations.bind_match({"matchID": 1.5})
+    assert len(graph.edges) == edges
+    assert totals() == before
+
+
+# The memory backend undoes a transaction's writes when a later statement fails
+def test_failed_write_rolls_back(conn, graph, season, totals, new_match_id, monkeypatch):
+    before, edges = totals(), len(graph.edges)
+
+    def fail(graph, params):
+        raise RuntimeError("stats write failed")
+    monkeypatch.setitem(memory_db.HANDLERS, "team_stats_add", fail)
+
+    match = {"matchID": new_match_id(), "winner": season["home"]["team_short_name"],
+             "loser": season["away"]["team_short_name"], "winnerGoals": 1, "loserGoals": 0,
+             "season": season["season"], "leagueID": season["leagueID"]}
+    with pytest.raises(RuntimeError):
+        conn.run_many(mutations.add_statements(match))
+    assert len(graph.edges) == edges
+    assert totals() == before
+
+
+def test_match_errors():
+    matches = [
+        {"matchID": 1, "winner": "AAA", "loser": "AAB"},
+        {"matchID": 2, "winner": "AAA", "loser": "AAB"},
+        {"matchID": 2, "winner": "AAA", "loser": "AAB"},
+        {"matchID": 3, "winner": "ZZZ", "loser": "AAB"},
+    ]
+    results = [[{"team_short_name": "AAA"}, {"team_short_name": "AAB"}], [{"match_id": 1}]]
+    errors = [(match["matchID"], status) for match, _, status in mutations.match_errors(matches, results)]
+    assert errors == [(1, 409), (2, 409), (3, 400)]
+
+    replaced = mutations.match_errors(matches, results[:1], replace=True)
+    assert [(match["matchID"], status) for match, _, status in replaced] == [(3, 400)]
+
+
+def test_team_trend_waits_for_rebuild(graph, conn, season):
+    params = {"leagueID": season["leagueID"], "teamID": season["home"]["team_api_id"]}
+    assert conn.run("team_trend_stats", params)
+    graph.stats_built = False
+    try:
+        assert conn.run("team_trend_stats", params) == []
+        team_stats.rebuild(conn)
+        assert graph.stats_built
+        assert conn.run("team_trend_stats", params) == conn.run("team_trend", params)
+    finally:
+        graph.stats_built = True
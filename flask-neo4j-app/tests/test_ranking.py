@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from ranking import (CONVERGED_MAX_ITERATIONS, DAMPING_FACTOR, LocalRankingEngine, SeasonGraph, pagerank,
+                     power_iteration, ranked)
+
+
+def rows(*scores):
+    return [{"Team": f"T{i}", "score": score} for i, score in enumerate(scores)]
+
+
+def test_ranked_ties_share_a_rank():
+    assert [row["rank"] for row in ranked(rows(3.0, 2.0, 2.0, 1.0))] == [1, 2, 2, 4]
+    assert [row["rank"] for row in ranked(rows(1.0, 1.0 + 1e-12, 0.5))] == [1, 1, 3]
+    assert ranked([]) == []
+
+
+def test_ranked_filters():
+    results = rows(3.0, 2.0, 2.0, 1.0)
+    assert [row["Team"] for row in ranked(results, top=2)] == ["T0", "T1", "T2"]
+    assert ranked(results, team="t2") == [{"Team": "T2", "score": 2.0, "rank": 2}]
+    assert ranked(results, top=1, team="T3") == []
+
+
+def graph_of(edges, n, weights=None):
+    sources, targets = zip(*edges)
+    return SeasonGraph(list(range(n)), [f"T{i}" for i in range(n)], sources, targets,
+                       weights or [1.0] * len(edges))
+
+
+# Every node of a directed cycle keeps the same score: 1 - d^(k+1) after k iterations,
+# still short of the fixed point 1 after the default 20
+def test_pagerank_cycle():
+    scores, iterations = pagerank(graph_of([(0, 1), (1, 2), (2, 3), (3, 0)], 4))
+    assert iterations == 20
+    np.testing.assert_allclose(scores, 1 - DAMPING_FACTOR ** 21)
+
+
+# Leaves pointing at a dangling center: leaves 1 - d, center (1 - d)(1 + d * leaves)
+def test_pagerank_star():
+    scores, iterations = pagerank(graph_of([(1, 0), (2, 0)], 3))
+    np.testing.assert_allclose(scores, [0.15 * (1 + 0.85 * 2), 0.15, 0.15])
+    assert iterations == 2
+
+
+# The converged scores solve x = (1 - d) + d * P^T x, P being the row-normalized weights
+@pytest.mark.parametrize("weighted", [False, True])
+def test_pagerank_matches_linear_solve(conn, season, weighted):
+    graph = SeasonGraph.from_records(conn.run("ranking_edges", {"leagueID": season["leagueID"],
+                                                                "season": season["season"]}))
+    n = graph.node_count
+    weights = graph.weights if weighted else np.ones(graph.edge_count)
+    sources = np.repeat(np.arange(n), np.diff(graph.indptr))
+    transition = np.zeros((n, n))
+    np.add.at(transition, (sources, graph.indices), weights)
+    out = transition.sum(axis=1, keepdims=True)
+    transition = np.divide(transition, out, out=np.zeros_like(transition), where=out > 0)
+    expected = np.linalg.solve(np.eye(n) - DAMPING_FACTOR * transition.T, np.full(n, 1 - DAMPING_FACTOR))
+
+    scores, _ = pagerank(graph, weighted=weighted, max_iterations=CONVERGED_MAX_ITERATIONS, tolerance=1e-12)
+    np.testing.assert_allclose(scores, expected, rtol=1e-9)
+
+
+def test_local_engine_ranks_the_season(conn, season):
+    engine = LocalRankingEngine(conn)
+    results = engine.rank(season["leagueID"], season["season"])
+    graph = engine.load(season["leagueID"], season["season"])
+    scores, _ = pagerank(graph)
+
+    assert sorted(row["Team"] for row in results) == sorted(graph.team_names)
+    assert [row["score"] for row in results] == sorted(scores.tolist(), reverse=True)
+
+
+# One added match barely moves the fixed point: the warm start converges in fewer
+# iterations than a cold solve of the updated season and reaches the same scores
+def test_incremental_engine_warm_starts(conn, graph, season, new_match_id):
+    engine = LocalRankingEngine(conn, incremental=True)
+    engine.rank(season["leagueID"], season["season"])
+
+    edge = graph.season_edges(season["leagueID"], season["season"])[0]
+    match = {"matchID": new_match_id(), "winner": edge["winner"], "loser": edge["loser"], "winnerGoals": 1,
+             "loserGoals": 0, "season": season["season"], "leagueID": season["leagueID"]}
+    conn.run("match_create", match)
+    try:
+        engine.invalidate(season["leagueID"], season["season"])
+        results = engine.rank(season["leagueID"], season["season"])
+        last = engine.stats()["last"]
+        assert last["mode"] == "warm"
+
+        updated = engine.load(season["leagueID"], season["season"])
+        cold, cold_iterations, _ = power_iteration(updated, max_iterations=CONVERGED_MAX_ITERATIONS)
+        assert last["iterations"] < cold_iterations
+        expected = dict(zip(updated.team_names, cold.tolist()))
+        for row in results:
+            assert row["score"] == pytest.approx(expected[row["Team"]], abs=1e-6)
+    finally:
+        conn.run("match_delete", {"matchID": match["matchID"]})
@@ -0,0 +1,171 @@
+import json
+
+import pytest
+
+
+def test_reference_routes(api, season):
+    leagues = api.get("/leagues")
+    assert leagues.status_code == 200
+    assert season["leagueID"] in [league["id"] for league in leagues.body]
+
+    seasons = api.get(f"/seasons?leagueID={season['leagueID']}")
+    assert seasons.status_code == 200
+    assert season["season"] in seasons.body
+
+    teams = api.get(f"/teams?leagueID={season['leagueID']}")
+    assert teams.status_code == 200
+    assert season["home"]["team_short_name"] in [team["team_short_name"] for team in teams.body]
+
+    assert api.get("/seasons").status_code == 400
+
+
+@pytest.mark.parametrize("method", ["pagerank", "elo", "massey", "colley"])
+def test_ranking(api, season, method):
+    response = api.get(f"/ranking?leagueID={season['leagueID']}&season={season['season']}&method={method}")
+    assert response.status_code == 200
+    scores = [row["score"] for row in response.body]
+    assert scores == sorted(scores, reverse=True)
+    assert response.body[0]["rank"] == 1
+
+
+def test_ranking_filters(api, season):
+    path = f"/ranking?leagueID={season['leagueID']}&season={season['season']}"
+    top = api.get(path + "&top=1").body
+    assert top and all(row["rank"] == 1 for row in top)
+
+    team = season["home"]["team_long_name"]
+    assert [row["Team"] for row in api.get(f"{path}&team={team.upper()}").body] == [team]
+
+
+@pytest.mark.parametrize("path", [
+    "/ranking?leagueID=1",
+    "/ranking?leagueID=1&season=x&top=0",
+    "/ranking?leagueID=1&season=x&method=nope",
+])
+def test_ranking_rejects_bad_parameters(api, path):
+    assert api.get(path).status_code == 400
+
+
+def test_head_to_head_and_trend(api, season):
+    league_id, home, away = season["leagueID"], season["home"]["team_api_id"], season["away"]["team_api_id"]
+    pair = api.get(f"/head_to_head?leagueID={league_id}&team1_id={home}&team2_id={away}")
+    assert pair.status_code == 200
+
+    matrix = api.get(f"/head_to_head_matrix?leagueID={league_id}&season={season['season']}")
+    assert matrix.status_code == 200
+
+    trend = api.get(f"/team_trend?leagueID={league_id}&teamID={home}")
+    assert trend.status_code == 200
+    assert season["season"] in [row["season"] for row in trend.body]
+    assert api.get(f"/team_trend?leagueID={league_id}&teamID=1").status_code == 404
+
+
+def test_matches_stream_and_pages(api, season):
+    path = f"/matches?leagueID={season['leagueID']}&season={season['season']}"
+    streamed = api.get(path)
+    assert streamed.status_code == 200
+    match_ids = [row["match_id"] for row in streamed.body]
+    assert match_ids == sorted(match_ids)
+
+    paged, after = [], 0
+    while after is not None:
+        page = api.get(f"{path}&limit=7&after={after}").body
+        paged += [row["match_id"] for row in page["matches"]]
+        after = page["next_after"]
+    assert paged == match_ids
+
+    stats = api.get(f"/match_stats?matchID={match_ids[0]}")
+    assert stats.status_code == 200
+    assert api.get("/match_stats?matchID=1234567890").status_code == 404
+
+
+def test_views(api, season):
+    league_id, home, away = season["leagueID"], season["home"]["team_api_id"], season["away"]["team_api_id"]
+    for path in [
+        f"/views/rankings?leagueID={league_id}&season={season['season']}",
+        f"/views/head_to_head?leagueID={league_id}&team1_id={home}&team2_id={away}",
+        f"/views/team_trend?leagueID={league_id}&teamID={home}",
+        f"/views/match_editor?leagueID={league_id}&season={season['season']}",
+    ]:
+        assert api.get(path).status_code == 200, path
+
+
+# Both apps assemble the views from views.AsyncViewBuilder
+def test_views_agree_between_apps(client, asgi, season):
+    league_id, home = season["leagueID"], season["home"]["team_api_id"]
+    for path in [
+        f"/views/rankings?leagueID={league_id}&season={season['season']}",
+        f"/views/team_trend?leagueID={league_id}&teamID={home}",
+        "/views/match_editor?leagueID=1234567&season=nope",
+    ]:
+        flask_view, asgi_view = client.get(path).body, asgi.get(path).body
+        # Scores may differ in the last digits when one app's incremental engine warm-started
+        scores = [[row.pop("score") for row in view.get("ranking", [])] for view in (flask_view, asgi_view)]
+        assert flask_view == asgi_view, path
+        assert scores[0] == pytest.approx(scores[1], rel=1e-6)
+
+
+# The ASGI app loads the season through the async driver and leaves the sync connection
+# to GDS, batch runs and writes
+def test_asgi_ranking_reads_on_async_driver(asgi_module, asgi, season):
+    asgi_module.match_changed(season["leagueID"], season["season"])
+    before = asgi.get("/pool/stats").body
+    path = f"/ranking?leagueID={season['leagueID']}&season={season['season']}&method=massey"
+    assert asgi.get(path).status_code == 200
+    after = asgi.get("/pool/stats").body
+    assert after["async"]["acquisitions"] > before["async"]["acquisitions"]
+    assert after["ranking"]["acquisitions"] == before["ranking"]["acquisitions"]
+
+
+@pytest.mark.parametrize("path", [
+    "/ready", "/metrics", "/ranking/stats", "/ranking/batch", "/debug/queries", "/projections/stats",
+    "/pool/stats", "/cache/stats", "/flights/stats",
+])
+def test_status_routes(api, path):
+    assert api.get(path).status_code == 200
+
+
+def test_disabled_features(api):
+    assert api.get("/analytics/stats").status_code == 404
+    assert api.get("/reference/snapshot").status_code == 404
+    assert api.get("/write_queue/stats").status_code == 404
+
+
+def test_match_lifecycle(api, season, new_match_id, match_body):
+    match_id = new_match_id()
+    assert api.put("/add_match", match_body(match_id)).status_code == 200
+    assert api.get(f"/match_stats?matchID={match_id}").body["winner_goals"] == 2
+
+    assert api.put("/update_match", match_body(match_id, winner_goals=5)).status_code == 200
+    assert api.get(f"/match_stats?matchID={match_id}").body["winner_goals"] == 5
+
+    assert api.delete(f"/delete_match?matchID={match_id}").status_code == 200
+    assert api.get(f"/match_stats?matchID={match_id}").status_code == 404
+
+
+def test_match_writes_are_checked(api, season, new_match_id, match_body):
+    match_id = new_match_id()
+    assert api.put("/add_match", match_body(match_id)).status_code == 200
+    assert api.put("/add_match", match_body(match_id)).status_code == 409
+    assert api.put("/add_match", match_body(new_match_id(), winner="ZZZ")).status_code == 400
+    assert api.put("/add_match", match_body(new_match_id(), winner_goals=2.5)).status_code == 400
+    assert api.put("/add_match", {"matchID": new_match_id()}).status_code == 400
+
+    # An unknown team leaves the match as it was
+    assert api.put("/update_match", match_body(match_id, loser="ZZZ")).status_code == 400
+    assert api.get(f"/match_stats?matchID={match_id}").status_code == 200
+
+
+def test_bulk_load(api, season, new_match_id, match_body):
+    taken = new_match_id()
+    assert api.put("/add_match", match_body(taken)).status_code == 200
+    fresh = new_match_id()
+    rows = [match_body(fresh), match_body(fresh), match_body(taken), match_body(new_match_id(), winner="ZZZ"),
+            {"matchID": new_match_id()}]
+    body = "\n".join(json.dumps(row) for row in rows) + "\n"
+
+    response = api.post("/matches/bulk?chunk_size=2", body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.body["inserted"] == 1
+    assert sorted(error["line"] for error in response.body["errors"]) == [2, 3, 4, 5]
+    assert api.get(f"/match_stats?matchID={fresh}").status_code == 200
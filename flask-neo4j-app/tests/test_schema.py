@@ -0,0 +1,60 @@
+# Startup schema check against a scripted connection (the memory backend has no schema)
+import pytest
+
+import memory_db
+import schema
+
+
+class ScriptedConnection:
+    def __init__(self, untyped=0, online=None):
+        self.untyped = untyped
+        self.online = set(schema.INDEXES) if online is None else set(online)
+        self.queries = []
+
+    def query(self, text, params=None):
+        self.queries.append(text)
+        if text == schema.COUNT_UNTYPED_QUERY:
+            return [{"untyped": self.untyped}]
+        if text == schema.NORMALIZE_QUERY:
+            updated, self.untyped = self.untyped, 0
+            return [{"updated": updated}]
+        if text.startswith("SHOW INDEXES"):
+            return [{"name": name} for name in self.online]
+        if text.startswith("CREATE INDEX"):
+            self.online.add(text.split()[2])
+        return []
+
+
+@pytest.fixture(autouse=True)
+def beat_model(monkeypatch):
+    monkeypatch.setattr(schema.config, "DATA_MODEL", "beat")
+
+
+def test_warn_logs_untyped_relationships(caplog):
+    conn = ScriptedConnection(untyped=3)
+    assert schema.check_schema(conn, "warn") == []
+    assert "3 beat relationships" in caplog.text
+    assert schema.NORMALIZE_QUERY not in conn.queries
+
+
+def test_create_normalizes_and_creates_indexes():
+    conn = ScriptedConnection(untyped=3, online=[])
+    assert schema.check_schema(conn, "create") == []
+    assert conn.untyped == 0
+    assert conn.online >= set(schema.INDEXES)
+
+
+def test_fail_refuses_unmigrated_data():
+    with pytest.raises(RuntimeError, match="non-integer"):
+        schema.check_schema(ScriptedConnection(untyped=1), "fail")
+    with pytest.raises(RuntimeError, match="missing Neo4j indexes"):
+        schema.check_schema(ScriptedConnection(online=[]), "fail")
+    assert schema.check_schema(ScriptedConnection(), "fail") == []
+
+
+def test_memory_backend_rejects_raw_cypher(conn, caplog):
+    with pytest.raises(memory_db.UnsupportedQueryError):
+        conn.query(schema.COUNT_UNTYPED_QUERY)
+    # The startup check treats it like any unreachable schema: logged, not fatal
+    assert schema.check_schema(conn, "warn") is None
+    assert "in-memory backend" in caplog.text
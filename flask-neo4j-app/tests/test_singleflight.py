@@ -0,0 +1,50 @@
+# Cross-worker result sharing through the lock directory
+import threading
+import time
+
+from singleflight import SingleFlight
+
+
+def wait_behind(leader, waiter, key, compute):
+    # Holds the key's lock in the "leader" worker until the waiter is blocked on it
+    results = {}
+    entered, release = threading.Event(), threading.Event()
+
+    def lead():
+        def fn():
+            entered.set()
+            release.wait(5)
+            return "leader"
+        results["leader"] = leader.do(key, fn)
+
+    thread = threading.Thread(target=lead)
+    thread.start()
+    entered.wait(5)
+    waiting = threading.Thread(target=lambda: results.update(waiter=waiter.do(key, compute)))
+    waiting.start()
+    while waiter.stats()["in_flight"] == 0:
+        time.sleep(0.005)
+    time.sleep(0.05)
+    return results, release, [thread, waiting]
+
+
+def test_waiter_shares_result_of_other_worker(tmp_path):
+    leader, waiter = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))
+    results, release, threads = wait_behind(leader, waiter, ("ranking", 1), lambda: "waiter")
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == {"leader": "leader", "waiter": "leader"}
+    assert waiter.stats()["worker_shared"] == 1
+
+
+def test_waiter_rejects_result_started_before_its_write(tmp_path):
+    leader, waiter = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))
+    results, release, threads = wait_behind(leader, waiter, ("ranking", 1), lambda: "waiter")
+    # A match write handled by the waiting worker after the leader started computing
+    waiter.forget()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == {"leader": "leader", "waiter": "waiter"}
+    assert waiter.stats()["worker_shared"] == 0
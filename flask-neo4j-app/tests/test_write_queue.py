@@ -0,0 +1,114 @@
+import json
+import os
+
+import pytest
+
+from write_queue import WriteQueue
+
+
+@pytest.fixture
+def match(season):
+    def build(winner=None, winner_goals=2):
+        return {"winner": winner or season["home"]["team_short_name"], "loser": season["away"]["team_short_name"],
+                "winnerGoals": winner_goals, "loserGoals": 0, "season": season["season"],
+                "leagueID": season["leagueID"]}
+    return build
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make(conn, **options):
+        options = {"flush_delay": 0.01, "retry_delay": 0.01, **options}
+        queue = WriteQueue(conn, str(tmp_path), **options)
+        queues.append(queue)
+        return queue
+    return make
+
+
+# Fails every transaction that writes one of the given match ids
+class FailingConnection:
+    def __init__(self, conn, match_ids):
+        self.conn = conn
+        self.match_ids = set(match_ids)
+
+    def run(self, name, parameters=None):
+        return self.conn.run(name, parameters)
+
+    def run_many(self, statements):
+        for name, parameters in statements:
+            if name == "match_bulk_delete" and self.match_ids & set(parameters["matchIDs"]):
+                raise RuntimeError("write failed")
+        return self.conn.run_many(statements)
+
+
+def test_edits_are_written_and_coalesced(conn, graph, make_queue, match, new_match_id):
+    written = []
+    queue = make_queue(conn, on_written=lambda league_id, season: written.append((league_id, season)),
+                       flush_delay=0.2)
+    match_id = new_match_id()
+    first = queue.submit("add", match_id, match())
+    last = queue.submit("update", match_id, match(winner_goals=6))
+
+    assert queue.job(last["jobID"], wait=5)["status"] == "written"
+    assert queue.job(first["jobID"])["status"] == "written"
+    assert [edge["winner_goals"] for edge in graph.match_edges(match_id)] == [6]
+    assert queue.stats()["coalesced"] == 1
+    assert written
+
+    deleted = queue.submit("delete", match_id)
+    assert queue.job(deleted["jobID"], wait=5)["status"] == "written"
+    assert graph.match_edges(match_id) == []
+
+
+def test_unknown_team_fails_without_deleting(conn, graph, make_queue, match, season):
+    match_id = graph.season_edges(season["leagueID"], season["season"])[0]["match_id"]
+    queue = make_queue(conn)
+    job = queue.submit("update", match_id, match(winner="ZZZ"))
+
+    job = queue.job(job["jobID"], wait=5)
+    assert job["status"] == "failed"
+    assert "ZZZ" in job["error"]
+    assert graph.match_edges(match_id)
+
+
+def test_failing_match_gives_up_without_blocking(conn, graph, make_queue, match, new_match_id):
+    poison, other = new_match_id(), new_match_id()
+    queue = make_queue(FailingConnection(conn, [poison]), max_attempts=3)
+    failing = queue.submit("add", poison, match())
+    passing = queue.submit("add", other, match())
+
+    assert queue.job(passing["jobID"], wait=5)["status"] == "written"
+    failing = queue.job(failing["jobID"], wait=5)
+    assert failing["status"] == "failed"
+    assert failing["attempts"] == 3
+    assert graph.match_edges(other) and not graph.match_edges(poison)
+
+
+def test_on_written_errors_do_not_requeue(conn, make_queue, match, new_match_id):
+    def fail(league_id, season):
+        raise RuntimeError("invalidation failed")
+    queue = make_queue(conn, on_written=fail)
+    job = queue.submit("add", new_match_id(), match())
+
+    assert queue.job(job["jobID"], wait=5)["status"] == "written"
+    assert queue.stats()["retries"] == 0
+
+
+def test_journal_is_replayed(conn, graph, tmp_path, make_queue, match, new_match_id):
+    match_id, done_id = new_match_id(), new_match_id()
+    entries = [
+        {"type": "job", "job": {"jobID": "a", "matchID": match_id, "op": "add", "status": "queued"},
+         "match": dict(match(), matchID=match_id)},
+        {"type": "job", "job": {"jobID": "b", "matchID": done_id, "op": "add", "status": "queued"},
+         "match": dict(match(), matchID=done_id)},
+        {"type": "written", "jobIDs": ["b"]},
+    ]
+    with open(os.path.join(tmp_path, "journal-0.jsonl"), "w") as journal:
+        journal.write("".join(json.dumps(entry) + "\n" for entry in entries) + '{"type": "jo')
+
+    queue = make_queue(conn)
+    assert queue.stats()["replayed"] == 1
+    assert queue.job("a", wait=5)["status"] == "written"
+    assert graph.match_edges(match_id) and not graph.match_edges(done_id)
@@ -0,0 +1,206 @@
+# Dashboard views in one response: the options of every picker on a Streamlit page plus
+# the data for the current selection, so an interaction costs one round trip instead of
+# a chain of /leagues -> /seasons -> ... calls.
+#
+# A missing or unknown selection (e.g. a team of the previously selected league) falls
+# back to the first option, and the response carries the selection it used. Sub-queries
+# for the requested selection are started concurrently; a query whose selection turns out
+# to be invalid is redone for the fallback.
+#
+# The views are written once against an async connection (AsyncViewBuilder, used by
+# asgi_app.py on the AsyncDriver). ViewBuilder runs them for app.py with every sub-query
+# on its own thread pool.
+import asyncio
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+from ranking import ranked
+from routes import leagues_body, seasons_body, trend_body
+
+
+def pick(options, value, key="id"):
+    values = [option[key] if key else option for option in options]
+    if value in values:
+        return value
+    return values[0] if values else None
+
+
+# conn runs registry statements (await conn.run(name, params)); rank(league_id, season)
+# returns the engine's ranking and load_matrix(league_id) the league's HeadToHeadMatrix,
+# both awaitable
+class AsyncViewBuilder:
+    def __init__(self, conn, rank, load_matrix, reference_snapshot=None):
+        self.conn = conn
+        self.rank = rank
+        self.load_matrix = load_matrix
+        self.reference_snapshot = reference_snapshot
+
+    # Building blocks, each the payload of the matching single-purpose route
+
+    async def leagues(self):
+        if self.reference_snapshot and self.reference_snapshot.available():
+            return self.reference_snapshot.leagues()
+        return leagues_body(await self.conn.run("leagues"))
+
+    async def seasons(self, league_id):
+        if self.reference_snapshot and self.reference_snapshot.available(league_id):
+            return self.reference_snapshot.seasons(league_id)
+        return seasons_body(await self.conn.run("seasons", {"leagueID": league_id}))
+
+    async def teams(self, league_id):
+        if self.reference_snapshot and self.reference_snapshot.available(league_id):
+            return self.reference_snapshot.teams(league_id)
+        return await self.conn.run("teams", {"leagueID": league_id})
+
+    async def ranking(self, league_id, season):
+        return ranked(await self.rank(league_id, season))
+
+    async def head_to_head(self, league_id, team1_id, team2_id):
+        return (await self.load_matrix(league_id)).pair(team1_id, team2_id)
+
+    async def trend(self, league_id, team_id):
+        params = {"leagueID": league_id, "teamID": team_id}
+        return trend_body(await self.conn.run("team_trend_stats", params)
+                          or await self.conn.run("team_trend", params))
+
+    async def matches(self, league_id, season):
+        return await self.conn.run("matches", {"leagueID": league_id, "season": season})
+
+    async def match_stats(self, match_id):
+        results = await self.conn.run("match_stats", {"matchID": match_id})
+        return results[0] if results else None
+
+    # Views
+
+    async def rankings_view(self, league_id=None, season=None):
+        async with self._tasks() as start:
+            leagues = start(self.leagues)
+            seasons = start(self.seasons, league_id) if league_id else None
+            ranking = start(self.ranking, league_id, season) if league_id and season else None
+
+            leagues = await leagues
+            league = pick(leagues, league_id)
+            seasons = await self._result(seasons, league == league_id, self.seasons, league)
+            selected = pick(seasons or [], season, key=None)
+            ranking = await self._result(ranking, (league, selected) == (league_id, season),
+                                         self.ranking, league, selected) if selected else []
+        return {"leagueID": league, "season": selected, "leagues": leagues, "seasons": seasons or [],
+                "ranking": ranking}
+
+    async def head_to_head_view(self, league_id=None, team1_id=None, team2_id=None):
+        async with self._tasks() as start:
+            leagues = start(self.leagues)
+            teams = start(self.teams, league_id) if league_id else None
+            pair = (start(self.head_to_head, league_id, team1_id, team2_id)
+                    if league_id and team1_id and team2_id else None)
+
+            leagues = await leagues
+            league = pick(leagues, league_id)
+            teams = await self._result(teams, league == league_id, self.teams, league) or []
+            team1 = pick(teams, team1_id)
+            team2 = pick([team for team in teams if team["id"] != team1], team2_id)
+            pair = await self._result(pair, (league, team1, team2) == (league_id, team1_id, team2_id),
+                                      self.head_to_head, league, team1, team2) if team1 and team2 else {}
+        return {"leagueID": league, "team1_id": team1, "team2_id": team2, "leagues": leagues,
+                "teams": teams, "head_to_head": pair}
+
+    async def team_trend_view(self, league_id=None, team_id=None):
+        async with self._tasks() as start:
+            leagues = start(self.leagues)
+            teams = start(self.teams, league_id) if league_id else None
+            trend = start(self.trend, league_id, team_id) if league_id and team_id else None
+
+            leagues = await leagues
+            league = pick(leagues, league_id)
+            teams = await self._result(teams, league == league_id, self.teams, league) or []
+            team = pick(teams, team_id)
+            trend = await self._result(trend, (league, team) == (league_id, team_id),
+                                       self.trend, league, team) if team else []
+        return {"leagueID": league, "teamID": team, "leagues": leagues, "teams": teams, "trend": trend}
+
+    async def match_editor_view(self, league_id=None, season=None, match_id=None):
+        async with self._tasks() as start:
+            leagues = start(self.leagues)
+            seasons = start(self.seasons, league_id) if league_id else None
+            matches = start(self.matches, league_id, season) if league_id and season else None
+            stats = start(self.match_stats, match_id) if match_id else None
+
+            leagues = await leagues
+            league = pick(leagues, league_id)
+            seasons = await self._result(seasons, league == league_id, self.seasons, league) or []
+            selected = pick(seasons, season, key=None)
+            matches = await self._result(matches, (league, selected) == (league_id, season),
+                                         self.matches, league, selected) if selected else []
+            match = pick(matches, match_id, key="match_id")
+            stats = await self._result(stats, match == match_id, self.match_stats, match) if match else None
+        return {"leagueID": league, "season": selected, "matchID": match, "leagues": leagues,
+                "seasons": seasons, "matches": matches, "match_stats": stats}
+
+    # Yields start(fn, *args), which runs fn concurrently. Sub-queries the view did not
+    # wait for (a failed sibling, a selection that fell back) are cancelled on the way out.
+    @contextlib.asynccontextmanager
+    async def _tasks(self):
+        tasks = []
+
+        def start(fn, *args):
+            task = asyncio.ensure_future(fn(*args))
+            tasks.append(task)
+            return task
+
+        try:
+            yield start
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()
+
+    # The started query's result if its selection held, otherwise a query for the fallback
+    async def _result(self, task, valid, fn, *args):
+        if task is not None and valid:
+            return await task
+        if task is not None:
+            task.cancel()
+        if args[0] is None:
+            return None
+        return await fn(*args)
+
+
+# Sync connection calls as coroutines running on a thread pool
+class PooledConnection:
+    def __init__(self, conn, executor):
+        self.conn = conn
+        self.executor = executor
+
+    async def run(self, name, parameters=None):
+        return await in_pool(self.executor, self.conn.run, name, parameters)
+
+
+async def in_pool(executor, fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+# The views for app.py, on the sync connection and engines. Each call runs the view on
+# a short-lived event loop in the request thread; its sub-queries overlap on the pool.
+class ViewBuilder:
+    def __init__(self, conn, ranking_engine, matrix_cache, reference_snapshot=None, workers=4):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="views")
+        self.views = AsyncViewBuilder(
+            PooledConnection(conn, self.executor),
+            rank=lambda league_id, season: in_pool(self.executor, ranking_engine.rank, league_id, season),
+            load_matrix=lambda league_id: in_pool(self.executor, matrix_cache.load, conn, league_id),
+            reference_snapshot=reference_snapshot
+        )
+
+    def rankings_view(self, league_id=None, season=None):
+        return asyncio.run(self.views.rankings_view(league_id, season))
+
+    def head_to_head_view(self, league_id=None, team1_id=None, team2_id=None):
+        return asyncio.run(self.views.head_to_head_view(league_id, team1_id, team2_id))
+
+    def team_trend_view(self, league_id=None, team_id=None):
+        return asyncio.run(self.views.team_trend_view(league_id, team_id))
+
+    def match_editor_view(self, league_id=None, season=None, match_id=None):
+        return asyncio.run(self.views.match_editor_view(league_id, season, match_id))
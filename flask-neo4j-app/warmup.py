@@ -0,0 +1,157 @@
+# Warm-up run by each worker before it takes traffic (gunicorn.conf.py), or in the
+# background with WARMUP_MODE=background. Progress is served on /ready, which answers
+# 503 until the worker is warm.
+#
+# Steps: check connectivity, plan every registered statement with EXPLAIN so the first
+# real call hits the Neo4j plan cache, load the leagues/seasons/teams responses, and
+# optionally rank the most requested seasons (which builds their projections).
+import json
+import os
+import threading
+import time
+
+import queries
+
+
+# /ranking request counts per league/season, shared between workers and restarts through
+# a JSON file. Each worker adds its unsaved counts to the file on save; concurrent saves
+# may drop a few counts, which is fine for picking the seasons to warm.
+class HotSeasons:
+    def __init__(self, path, save_every=100):
+        self.path = path
+        self.save_every = save_every
+        self._pending = {}
+        self._hits = 0
+        self._lock = threading.Lock()
+
+    def hit(self, league_id, season):
+        key = f"{int(league_id)}|{season}"
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + 1
+            self._hits += 1
+            due = self._hits % self.save_every == 0
+        if due:
+            self.save()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        counts = self.load()
+        for key, count in pending.items():
+            counts[key] = counts.get(key, 0) + count
+        tmp = f"{self.path}.{os.getpid()}"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(counts, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def top(self, n):
+        counts = self.load()
+        with self._lock:
+            for key, count in self._pending.items():
+                counts[key] = counts.get(key, 0) + count
+        ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:n]
+        return [(int(key.split("|", 1)[0]), key.split("|", 1)[1]) for key, _ in ranked]
+
+
+class WarmUp:
+    STEPS = ["connectivity", "query_plans", "reference_data", "rankings"]
+
+    # fetch(path) performs a GET against the app itself so responses land in the response
+    # cache and the ranking engine exactly as for a client request
+    def __init__(self, conn, fetch, hot_seasons=None, rankings=0):
+        self.conn = conn
+        self.fetch = fetch
+        self.hot_seasons = hot_seasons
+        self.rankings = rankings
+        self._status = {"state": "pending", "steps": {}}
+        self._lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        self._set(state="running", started=time.time())
+        for step in self.STEPS:
+            start = time.perf_counter()
+            self._step(step, state="running")
+            try:
+                detail = getattr(self, f"_{step}")()
+            except Exception as e:
+                self._step(step, state="failed", error=str(e), seconds=time.perf_counter() - start)
+                # Without a database there is nothing to warm, and the worker is not ready
+                if step == "connectivity":
+                    self._set(state="failed", finished=time.time())
+                    return
+                continue
+            self._step(step, state="done", detail=detail, seconds=time.perf_counter() - start)
+        self._set(state="ready", finished=time.time())
+
+    @property
+    def ready(self):
+        return self.status()["state"] == "ready"
+
+    def status(self):
+        with self._lock:
+            status = dict(self._status, steps={k: dict(v) for k, v in self._status["steps"].items()})
+        done = sum(1 for step in status["steps"].values() if step["state"] in ("done", "failed"))
+        status["progress"] = done / len(self.STEPS)
+        return status
+
+    def _set(self, **values):
+        with self._lock:
+            self._status.update(values)
+
+    def _step(self, step, **values):
+        with self._lock:
+            self._status["steps"].setdefault(step, {}).update(values)
+
+    def _connectivity(self):
+        self.conn.verify_connectivity()
+        return "ok"
+
+    def _query_plans(self):
+        failed = []
+        for name in queries.QUERIES:
+            try:
+                self.conn.explain(name)
+            except Exception:
+                failed.append(name)
+        return {"planned": len(queries.QUERIES) - len(failed), "failed": failed}
+
+    def _reference_data(self):
+        leagues = self._get("/leagues")
+        for league in leagues:
+            self._get(f"/seasons?leagueID={league['id']}")
+            self._get(f"/teams?leagueID={league['id']}")
+        return {"leagues": len(leagues)}
+
+    # Most requested seasons first; without request history, the latest season of each league
+    def _rankings(self):
+        if not self.rankings:
+            return {"seasons": 0}
+        seasons = self.hot_seasons.top(self.rankings) if self.hot_seasons else []
+        if not seasons:
+            seasons = [(row["leagueID"], row["season"]) for row in self.conn.run("league_seasons")]
+            latest = {league_id: season for league_id, season in seasons}
+            seasons = list(latest.items())[:self.rankings]
+        for league_id, season in seasons:
+            self._get(f"/ranking?leagueID={league_id}&season={season}")
+        return {"seasons": len(seasons)}
+
+    def _get(self, path):
+        response = self.fetch(path)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} returned {response.status_code}")
+        return response.get_json()
@@ -0,0 +1,260 @@
+# Write-behind queue for the match mutations (WRITE_QUEUE_ENABLED, ?async=1 on
+# /update_match, /add_match and /delete_match). An edit is journaled and answered with a
+# job id right away; a background thread writes the queued matches in grouped UNWIND
+# transactions (mutations.replace_statements).
+#
+# Every queued edit sets the final state of its match: an update or add replaces the
+# match (delete every edge with the id, then create the new one), a delete removes it.
+# Edits to a match id that is still queued therefore coalesce into the last one, and
+# replaying the journal after a crash is idempotent.
+#
+# A match whose team does not exist fails without being touched. When a batch fails, its
+# matches are retried one at a time, so a match that keeps failing only holds up the queue
+# until it has been tried max_attempts times, and is then marked failed.
+#
+# Journal: <WRITE_QUEUE_DIR>/journal-<n>.jsonl, one per worker, claimed with an flock so
+# a restarted worker picks up the file (and the unwritten jobs) of the one it replaces.
+# "job" lines are appended and fsynced before the job id is returned; a "written" line
+# lists the jobs finished by each flush, failed ones included, and the file is emptied
+# whenever nothing is queued.
+import fcntl
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import mutations
+import queries
+
+# Finished jobs kept for the status endpoint
+MAX_FINISHED_JOBS = 10000
+
+logger = logging.getLogger("neo4j_app.write_queue")
+
+
+class WriteQueue:
+    def __init__(self, conn, directory, on_written=None, flush_delay=0.2, batch_size=500,
+                 retry_delay=5.0, max_attempts=5):
+        self.conn = conn
+        self.directory = directory
+        self.on_written = on_written
+        self.flush_delay = flush_delay
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        # match id -> {"match": row or None, "jobs": [job ids], "attempts": failed flushes}
+        self._pending = OrderedDict()
+        self._suspect = set()  # matches of a failed batch, flushed alone until written
+        self._jobs = OrderedDict()
+        self._cond = threading.Condition()
+        self._stats = {"submitted": 0, "coalesced": 0, "flushes": 0, "written": 0, "failed": 0,
+                       "retries": 0, "last_error": None, "replayed": 0}
+        os.makedirs(directory, exist_ok=True)
+        self._journal, self.journal_path = self._claim_journal()
+        self._replay()
+        self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        self._thread.start()
+
+    # Queue an edit: op is "add", "update" or "delete", match the match_create parameters
+    # (None for a delete). Raises QueryParameterError before anything is queued if a value
+    # has the wrong type.
+    def submit(self, op, match_id, match=None):
+        if op == "delete":
+            match_id = queries.get("match_delete").bind({"matchID": match_id})["matchID"]
+        else:
+            match = queries.get("match_create").bind(dict(match, matchID=match_id))
+            match_id = match["matchID"]
+        job = {"jobID": uuid.uuid4().hex, "matchID": match_id, "op": op, "status": "queued",
+               "submitted": time.time()}
+        with self._cond:
+            self._write_journal({"type": "job", "job": job, "match": match})
+            self._enqueue(job, match)
+            self._stats["submitted"] += 1
+            self._cond.notify_all()
+        return dict(job)
+
+    def job(self, job_id, wait=0):
+        deadline = time.monotonic() + wait
+        with self._cond:
+            while True:
+                job = self._jobs.get(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job["status"] != "queued" or remaining <= 0:
+                    return dict(job) if job else None
+                self._cond.wait(remaining)
+
+    def stats(self):
+        with self._cond:
+            statuses = {}
+            for job in self._jobs.values():
+                statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+            return dict(self._stats, pending_matches=len(self._pending), jobs=statuses,
+                        journal=self.journal_path)
+
+    def _claim_journal(self):
+        for n in itertools.count():
+            path = os.path.join(self.directory, f"journal-{n}.jsonl")
+            journal = open(path, "a+")
+            try:
+                fcntl.flock(journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return journal, path
+            except BlockingIOError:
+                journal.close()
+
+    def _replay(self):
+        self._journal.seek(0)
+        jobs, written = [], set()
+        for line in self._journal:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash was never confirmed
+            if entry["type"] == "job":
+                jobs.append(entry)
+            elif entry["type"] == "written":
+                written.update(entry["jobIDs"])
+
+        for entry in jobs:
+            if entry["job"]["jobID"] not in written:
+                self._enqueue(entry["job"], entry["match"])
+                self._stats["replayed"] += 1
+        self._compact()
+
+    # Rewrites the journal with only the jobs still queued
+    def _compact(self):
+        self._journal.seek(0)
+        self._journal.truncate()
+        for match_id, entry in self._pending.items():
+            for job_id in entry["jobs"]:
+                self._write_journal({"type": "job", "job": self._jobs[job_id], "match": entry["match"]},
+                                    sync=False)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def _write_journal(self, entry, sync=True):
+        self._journal.write(json.dumps(entry) + "\n")
+        if sync:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+    def _enqueue(self, job, match):
+        self._jobs[job["jobID"]] = job
+        entry = self._pending.pop(job["matchID"], None)
+        if entry is not None:
+            self._stats["coalesced"] += 1
+        jobs = (entry["jobs"] if entry else []) + [job["jobID"]]
+        self._pending[job["matchID"]] = {"match": match, "jobs": jobs, "attempts": 0}
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # Let a burst of edits arrive (and coalesce) before writing
+            time.sleep(self.flush_delay)
+            with self._cond:
+                size = 1 if next(iter(self._pending)) in self._suspect else self.batch_size
+                batch = [self._pending.popitem(last=False) for _ in range(min(size, len(self._pending)))]
+            try:
+                scopes = self._flush(batch)
+            except Exception as e:
+                self._requeue(batch, e)
+                time.sleep(self.retry_delay)
+                continue
+            self._written(scopes)
+
+    # Writes a batch; returns the (leagueID, season) scopes it changed
+    def _flush(self, batch):
+        rows = [dict(entry["match"], line=i) for i, (_, entry) in enumerate(batch) if entry["match"] is not None]
+        # Replacing a match with one whose team does not exist would only delete it
+        errors = {}
+        if rows:
+            checks = self.conn.run_many(mutations.check_statements(rows, replace=True))
+            for match, message, _ in mutations.match_errors(rows, checks, replace=True):
+                errors[match["line"]] = message
+        match_ids = [match_id for i, (match_id, _) in enumerate(batch) if i not in errors]
+        rows = [row for row in rows if row["line"] not in errors]
+
+        created, scopes = set(), set()
+        if match_ids:
+            results = self.conn.run_many(mutations.replace_statements(match_ids, rows))
+            created = {record["line"] for record in results[2]}
+            scopes.update(mutations.deleted_scopes(results))
+            scopes.update((row["leagueID"], row["season"]) for row in rows if row["line"] in created)
+        with self._cond:
+            for i, (match_id, entry) in enumerate(batch):
+                if i in errors:
+                    self._finish(match_id, entry, errors[i])
+                elif entry["match"] is not None and i not in created:
+                    self._finish(match_id, entry, "unknown winner or loser team")
+                else:
+                    self._finish(match_id, entry)
+            self._stats["flushes"] += 1
+            self._stats["last_error"] = None
+            self._journal_finished(batch)
+        return scopes
+
+    # Marks the jobs of a flushed entry written, or failed with error
+    def _finish(self, match_id, entry, error=None):
+        now = time.time()
+        for job_id in entry["jobs"]:
+            job = self._jobs[job_id]
+            job.update(status="failed" if error else "written", finished=now)
+            if error:
+                job["error"] = error
+        self._stats["failed" if error else "written"] += len(entry["jobs"])
+        self._suspect.discard(match_id)
+
+    def _journal_finished(self, batch):
+        if self._pending:
+            job_ids = [job_id for _, entry in batch for job_id in entry["jobs"]]
+            self._write_journal({"type": "written", "jobIDs": job_ids})
+        else:
+            self._compact()
+        self._forget_finished()
+        self._cond.notify_all()
+
+    # The jobs are finished and journaled by now, so a failing callback must not requeue them
+    def _written(self, scopes):
+        if not self.on_written:
+            return
+        for league_id, season in scopes:
+            try:
+                self.on_written(league_id, season)
+            except Exception:
+                logger.exception("on_written failed for league %s season %s", league_id, season)
+
+    # A failed flush goes back to the front of the queue, to be retried one match at a time;
+    # edits that arrived for the same matches meanwhile still win. A match that failed
+    # max_attempts times on its own is marked failed instead.
+    def _requeue(self, batch, error):
+        with self._cond:
+            self._stats["retries"] += 1
+            self._stats["last_error"] = str(error)
+            for _, entry in batch:
+                entry["attempts"] += 1
+                for job_id in entry["jobs"]:
+                    self._jobs[job_id]["attempts"] = self._jobs[job_id].get("attempts", 0) + 1
+
+            match_id, entry = batch[0]
+            if len(batch) == 1 and entry["attempts"] >= self.max_attempts and match_id not in self._pending:
+                self._finish(match_id, entry, f"gave up after {entry['attempts']} attempts: {error}")
+                self._journal_finished(batch)
+                return
+
+            for match_id, entry in reversed(batch):
+                newer = self._pending.pop(match_id, None)
+                if newer is not None:
+                    entry = {"match": newer["match"], "jobs": entry["jobs"] + newer["jobs"], "attempts": 0}
+                self._pending[match_id] = entry
+                self._pending.move_to_end(match_id, last=False)
+                self._suspect.add(match_id)
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] != "queued"]
+        for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self._jobs[job_id]